@@ -0,0 +1,111 @@
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Hashable, Optional
+
+if TYPE_CHECKING:
+    from agents import Agent
+
+# Upper bounds for the pool: number of prepared agents and total size of their instructions
+AGENT_POOL_MAX_ENTRIES = int(os.getenv("AGENT_POOL_MAX_ENTRIES", "2048"))
+AGENT_POOL_MAX_BYTES = int(os.getenv("AGENT_POOL_MAX_BYTES", str(16 * 1024 * 1024)))
+# Seconds a pooled task agent is used without re-reading its rows (edits made by other workers
+# show up after at most this long; this worker's own edits invalidate the entry at once)
+AGENT_POOL_REVALIDATE_SECONDS = float(os.getenv("AGENT_POOL_REVALIDATE_SECONDS", "5"))
+
+
+@dataclass(frozen=True)
+class PreparedAgent:
+    """A ready-to-run SDK Agent plus the data needed to answer without touching the DB."""
+    version: Hashable           # version of the rows the instructions were rendered from
+    owner_id: Optional[int]     # user allowed to use this agent (None = anyone)
+    agent_id: Optional[int]     # DB Agent row (None for the app guide)
+    agent_name: str
+    instructions: str
+    agent: "Agent"
+    checked_at: float = 0.0     # time.monotonic() when `version` was last compared with the rows
+
+    @property
+    def size(self) -> int:
+        return len(self.instructions.encode())
+
+
+class AgentPool:
+    """
+    Keyed registry of prepared agents with LRU eviction.
+
+    Entries are dropped when either AGENT_POOL_MAX_ENTRIES or AGENT_POOL_MAX_BYTES
+    (sum of rendered instruction sizes) is exceeded. Writers that change the data an
+    entry was rendered from call invalidate() for that key; since that only reaches their
+    own worker, readers also compare an entry's `version` with the source rows once it is
+    older than AGENT_POOL_REVALIDATE_SECONDS.
+    """
+
+    def __init__(self, max_entries: int = AGENT_POOL_MAX_ENTRIES, max_bytes: int = AGENT_POOL_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, PreparedAgent]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[PreparedAgent]:
+        with self._lock:
+            prepared = self._entries.get(key)
+            if prepared is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return prepared
+
+    def put(self, key: Hashable, prepared: PreparedAgent) -> None:
+        if self.max_entries <= 0 or prepared.size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._entries[key] = prepared
+            self._bytes += prepared.size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Shared pool for the whole worker; task agents are keyed by task id
+agent_pool = AgentPool()
+
+
+def task_agent_key(task_id: int):
+    return ("task", task_id)
+
+
+def app_guide_key(user_name: str):
+    return ("app-guide", user_name)
+
+
+def invalidate_task_agent(task_id: int) -> None:
+    agent_pool.invalidate(task_agent_key(task_id))
@@ -0,0 +1,321 @@
+"""
+Pluggable transports for the OpenAI-compatible model client (LLM_BACKEND in task_agent):
+
+- "openai": the real API at LLM_BASE_URL (default).
+- "fake": an in-process, deterministic chat completions endpoint with configurable latency
+  and token rate. No network or API key is needed.
+- "record": calls the real API and writes every completion to LLM_RECORDINGS_DIR.
+- "replay": answers from those recordings (same request body -> same file), with the
+  recorded timing scaled by LLM_REPLAY_SPEED. Unknown requests get a 404.
+
+Each backend is an httpx transport under the normal AsyncOpenAI client, so the agents SDK,
+streaming and usage accounting run exactly as they do against the real API.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import AsyncIterator, List, Optional
+
+try:
+    # openai >= 3 is built on the httpx2 fork; its transports must come from the same package
+    import httpx2 as httpx
+except ImportError:
+    import httpx
+
+# Seconds before the first token of a fake reply
+LLM_FAKE_LATENCY = float(os.getenv("LLM_FAKE_LATENCY", "0.3"))
+# Output tokens per second of a fake reply (one word = one token)
+LLM_FAKE_TOKENS_PER_SECOND = float(os.getenv("LLM_FAKE_TOKENS_PER_SECOND", "200"))
+# Words in a fake reply
+LLM_FAKE_REPLY_WORDS = int(os.getenv("LLM_FAKE_REPLY_WORDS", "40"))
+# Where "record" writes and "replay" reads completions (one JSON file per request)
+LLM_RECORDINGS_DIR = os.getenv("LLM_RECORDINGS_DIR", "llm_recordings")
+# Replay timing: 1.0 = as recorded, 2.0 = twice as fast, 0 = no delays
+LLM_REPLAY_SPEED = float(os.getenv("LLM_REPLAY_SPEED", "1.0"))
+
+_FILLER = ["lorem", "ipsum", "dolor", "sit", "amet"]
+
+
+def _last_user_message(body: dict) -> str:
+    for message in reversed(body.get("messages", [])):
+        if message.get("role") == "user":
+            content = message.get("content")
+            if isinstance(content, list):
+                return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+            return content or ""
+    return ""
+
+
+def _sse(payload) -> bytes:
+    data = payload if isinstance(payload, str) else json.dumps(payload)
+    return f"data: {data}\n\n".encode()
+
+
+class FakeLLM:
+    """
+    Deterministic OpenAI-compatible chat completions: the reply depends only on the last
+    user message. A reply takes `latency` seconds plus one `1 / tokens_per_second` step
+    per word, streamed or not, and reports token usage like the real API.
+    """
+
+    def __init__(self, latency: float = LLM_FAKE_LATENCY, tokens_per_second: float = LLM_FAKE_TOKENS_PER_SECOND,
+                 reply_words: int = LLM_FAKE_REPLY_WORDS):
+        self.latency = latency
+        self.token_interval = 1 / tokens_per_second if tokens_per_second > 0 else 0.0
+        self.reply_words = reply_words
+        self.requests = 0
+
+    def _words(self, body: dict) -> List[str]:
+        words = f"Fake reply to: {_last_user_message(body)[:80]}".split()
+        while len(words) < self.reply_words:
+            words.append(_FILLER[len(words) % len(_FILLER)])
+        return words
+
+    def _usage(self, body: dict, words: List[str]) -> dict:
+        # Roughly 4 characters per token, like the app's own estimate
+        prompt_tokens = sum(len(json.dumps(m.get("content", ""))) for m in body.get("messages", [])) // 4 + 1
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(words),
+            "total_tokens": prompt_tokens + len(words),
+        }
+
+    async def completion(self, body: dict) -> dict:
+        """A non-streamed chat.completion object, returned after the full reply time."""
+        self.requests += 1
+        words = self._words(body)
+        await asyncio.sleep(self.latency + self.token_interval * len(words))
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake-model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": " ".join(words)},
+                "finish_reason": "stop",
+            }],
+            "usage": self._usage(body, words),
+        }
+
+    async def stream(self, body: dict) -> AsyncIterator[bytes]:
+        """Server-sent chat.completion.chunk events, one word per chunk, ending with [DONE]."""
+        self.requests += 1
+        words = self._words(body)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = body.get("model", "fake-model")
+
+        def chunk(delta: dict, finish_reason=None, usage=None) -> bytes:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            if usage is not None:
+                payload["usage"] = usage
+            return _sse(payload)
+
+        await asyncio.sleep(self.latency)
+        yield chunk({"role": "assistant", "content": ""})
+        for i, word in enumerate(words):
+            yield chunk({"content": word if i == 0 else " " + word})
+            await asyncio.sleep(self.token_interval)
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+        yield chunk({}, "stop", self._usage(body, words) if include_usage else None)
+        yield _sse("[DONE]")
+
+
+class _IteratorStream(httpx.AsyncByteStream):
+    def __init__(self, iterator: AsyncIterator[bytes]):
+        self._iterator = iterator
+
+    async def __aiter__(self):
+        async for part in self._iterator:
+            yield part
+
+    async def aclose(self):
+        close = getattr(self._iterator, "aclose", None)
+        if close is not None:
+            await close()
+
+
+def _decoded_headers(response: httpx.Response) -> dict:
+    # The body handed on is already decompressed, so its encoding and length headers no longer apply
+    return {k: v for k, v in response.headers.items() if k.lower() not in ("content-encoding", "content-length")}
+
+
+def _json_response(status_code: int, payload: dict, request: httpx.Request) -> httpx.Response:
+    return httpx.Response(status_code, json=payload, request=request)
+
+
+class FakeLLMTransport(httpx.AsyncBaseTransport):
+    """Serves POST .../chat/completions and GET .../models from a FakeLLM, in process."""
+
+    def __init__(self, fake: Optional[FakeLLM] = None):
+        self.fake = fake or FakeLLM()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path.rstrip("/")
+        if request.method == "POST" and path.endswith("/chat/completions"):
+            body = json.loads(await request.aread())
+            if body.get("stream"):
+                return httpx.Response(
+                    200, headers={"content-type": "text/event-stream"},
+                    stream=_IteratorStream(self.fake.stream(body)), request=request
+                )
+            return _json_response(200, await self.fake.completion(body), request)
+        if request.method == "GET" and path.endswith("/models"):
+            return _json_response(200, {"object": "list", "data": [{"id": "fake-model", "object": "model"}]}, request)
+        return _json_response(404, {"error": {"message": f"Fake LLM has no {request.method} {path}"}}, request)
+
+
+def recording_key(body: bytes) -> str:
+    """Identifies a request by its canonical JSON body (model, messages, tools, stream...)."""
+    try:
+        canonical = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        canonical = body.decode(errors="replace")
+    return hashlib.sha256(canonical.encode()).hexdigest()[:32]
+
+
+def _recording_path(directory: str, key: str) -> str:
+    return os.path.join(directory, f"{key}.json")
+
+
+def load_recordings(directory: str) -> dict:
+    """Every recording in `directory` by key; empty when the directory doesn't exist."""
+    if not os.path.isdir(directory):
+        return {}
+    recordings = {}
+    for name in os.listdir(directory):
+        if name.endswith(".json"):
+            with open(os.path.join(directory, name)) as f:
+                recordings[name[:-len(".json")]] = json.load(f)
+    return recordings
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """
+    Forwards to the real API and saves each successful response with its timing: the body
+    of plain responses, or every streamed chunk with its offset from the request start.
+    """
+
+    def __init__(self, directory: str = LLM_RECORDINGS_DIR, upstream: Optional[httpx.AsyncBaseTransport] = None):
+        self.directory = directory
+        self.upstream = upstream or httpx.AsyncHTTPTransport()
+        os.makedirs(directory, exist_ok=True)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        start = time.perf_counter()
+        response = await self.upstream.handle_async_request(request)
+        if request.method != "POST" or response.status_code != 200:
+            return response
+        key = recording_key(body)
+        recording = {
+            "request": json.loads(body),
+            "status_code": response.status_code,
+            "content_type": response.headers.get("content-type", "application/json"),
+        }
+        if "text/event-stream" not in recording["content_type"]:
+            content = await response.aread()
+            recording["elapsed"] = time.perf_counter() - start
+            recording["body"] = content.decode()
+            await asyncio.to_thread(self._save, key, recording)
+            return httpx.Response(
+                response.status_code, headers=_decoded_headers(response), content=content, request=request
+            )
+
+        async def chunks():
+            recorded = []
+            complete = False
+            try:
+                async for part in response.aiter_bytes():
+                    recorded.append([time.perf_counter() - start, part.decode()])
+                    yield part
+                complete = True
+            finally:
+                await response.aclose()
+                # The client may close the stream right after [DONE] instead of reading to the end
+                if complete or (recorded and "[DONE]" in recorded[-1][1]):
+                    recording["chunks"] = recorded
+                    await asyncio.to_thread(self._save, key, recording)
+
+        return httpx.Response(
+            response.status_code, headers=_decoded_headers(response), stream=_IteratorStream(chunks()), request=request
+        )
+
+    def _save(self, key: str, recording: dict) -> None:
+        # Runs in a worker thread, so two saves of the same request can overlap
+        path = _recording_path(self.directory, key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(recording, f)
+        os.replace(tmp_path, path)
+        print(f"[DEBUG] Recorded LLM response {key}")
+
+    async def aclose(self) -> None:
+        await self.upstream.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    Answers from RecordingTransport files, sleeping the recorded delays divided by `speed`.
+    The files are read once, when the transport is created.
+    """
+
+    def __init__(self, directory: str = LLM_RECORDINGS_DIR, speed: float = LLM_REPLAY_SPEED):
+        self.directory = directory
+        self.speed = speed
+        self.recordings = load_recordings(directory)
+        print(f"[DEBUG] Loaded {len(self.recordings)} LLM recordings from {directory}")
+
+    def _delay(self, seconds: float) -> float:
+        return seconds / self.speed if self.speed > 0 else 0.0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = recording_key(await request.aread())
+        recording = self.recordings.get(key)
+        if recording is None:
+            print(f"[DEBUG] No LLM recording {key} in {self.directory}")
+            return _json_response(404, {"error": {"message": f"No recording {key} in {self.directory}"}}, request)
+
+        headers = {"content-type": recording["content_type"]}
+        if "chunks" not in recording:
+            await asyncio.sleep(self._delay(recording.get("elapsed", 0.0)))
+            return httpx.Response(recording["status_code"], headers=headers, content=recording["body"].encode(), request=request)
+
+        async def chunks():
+            start = time.perf_counter()
+            for offset, part in recording["chunks"]:
+                wait = self._delay(offset) - (time.perf_counter() - start)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                yield part.encode()
+
+        return httpx.Response(recording["status_code"], headers=headers, stream=_IteratorStream(chunks()), request=request)
+
+
+def create_transport(backend: str, options: Optional[dict] = None) -> Optional[httpx.AsyncBaseTransport]:
+    """
+    The transport for an LLM_BACKEND value; None means the client's default (real API).
+    `options` may override fake_latency, fake_tokens_per_second and recordings_dir.
+    """
+    options = options or {}
+    if backend == "openai":
+        return None
+    if backend == "fake":
+        return FakeLLMTransport(FakeLLM(
+            latency=float(options.get("fake_latency", LLM_FAKE_LATENCY)),
+            tokens_per_second=float(options.get("fake_tokens_per_second", LLM_FAKE_TOKENS_PER_SECOND)),
+        ))
+    if backend == "record":
+        return RecordingTransport(options.get("recordings_dir", LLM_RECORDINGS_DIR))
+    if backend == "replay":
+        return ReplayTransport(options.get("recordings_dir", LLM_RECORDINGS_DIR))
+    raise ValueError(f"Unknown LLM_BACKEND {backend!r}; expected openai, fake, record or replay")
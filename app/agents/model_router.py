@@ -0,0 +1,469 @@
+"""
+Routes agent model calls over several OpenAI-compatible backends (e.g. Gemini first, a
+local vLLM / ollama server as the fallback), configured with LLM_ROUTES:
+
+    LLM_ROUTES='[
+      {"name": "gemini", "base_url": "https://generativelanguage.googleapis.com/v1beta/openai/",
+       "model": "gemini-3-flash-preview", "api_key_env": "GEMINI_API_KEY"},
+      {"name": "local", "base_url": "http://localhost:11434/v1", "model": "llama3.1",
+       "api_key": "ollama", "latency_bias": 2.0, "max_concurrency": 8}
+    ]'
+
+Without LLM_ROUTES there is one backend built from LLM_BASE_URL / LLM_MODEL / LLM_BACKEND.
+
+- Selection: the available backend with the lowest expected latency (moving average, scaled
+  up by how busy it is, plus its `latency_bias` in seconds, plus LLM_BACKEND_ERROR_PENALTY_SECONDS
+  times its recent error rate) goes first. A call cancelled after losing a hedge race only
+  ever raises the loser's average: its true latency is unknown, just known to be longer.
+- Failover: a backend that fails before producing output is skipped and the next one tried.
+- Hedging: when the first backend has not answered (or, for streams, sent its first event)
+  within its recent p95 latency, the next backend is asked too; the first to answer wins
+  and the other call is cancelled.
+- Circuit breaker per backend: LLM_BREAKER_FAILURES consecutive failures take it out of
+  rotation for LLM_BREAKER_COOLDOWN_SECONDS, after which a single probe call decides.
+- Concurrency limit per backend (`max_concurrency`); hedges only go to backends with room.
+"""
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Any, AsyncIterator, List, Optional
+
+from agents.models.interface import Model
+
+from app.utils.metrics import registry
+
+# JSON list of backends (see above); unset = a single backend from the LLM_* settings
+LLM_ROUTES = os.getenv("LLM_ROUTES")
+# Ask a second backend when the first is slower than its recent p95
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Latency quantile after which a hedge is sent
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+# Hedge delay (seconds) while a backend has fewer than LLM_HEDGE_MIN_SAMPLES latencies recorded
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "5"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+# Never hedge sooner than this, whatever the p95 says
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.25"))
+# Consecutive failures that open a backend's circuit, and how long it then stays out
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+# Default in-flight limit per backend
+LLM_BACKEND_MAX_CONCURRENCY = int(os.getenv("LLM_BACKEND_MAX_CONCURRENCY", "64"))
+# Seconds added to a backend's expected latency at a 100% recent error rate
+LLM_BACKEND_ERROR_PENALTY_SECONDS = float(os.getenv("LLM_BACKEND_ERROR_PENALTY_SECONDS", "10"))
+
+# Latencies kept per backend and mode for the hedge quantile
+_WINDOW = 200
+# Weight of the newest latency in the moving average
+_EWMA_ALPHA = 0.2
+
+backend_requests = registry.counter(
+    "llm_backend_requests_total",
+    "Model calls per backend by mode (run/stream) and outcome (ok, error, cancelled = lost a hedge race)",
+    ("backend", "mode", "outcome"),
+)
+backend_latency = registry.histogram(
+    "llm_backend_latency_seconds",
+    "Per backend: whole response time (run) or time to the first stream event (stream)",
+    ("backend", "mode"),
+)
+hedges = registry.counter(
+    "llm_hedges_total", "Hedged calls by mode and which call answered first", ("mode", "winner")
+)
+failovers = registry.counter(
+    "llm_failovers_total", "Calls moved to another backend after a failure", ("backend",)
+)
+
+
+class CircuitBreaker:
+    """Closed -> open after `failures` consecutive errors -> half-open (one probe) after `cooldown`."""
+
+    def __init__(self, failures: int = LLM_BREAKER_FAILURES, cooldown: float = LLM_BREAKER_COOLDOWN_SECONDS):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def available(self) -> bool:
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self._probing)
+
+    def try_reserve(self) -> bool:
+        """
+        Checks availability and, when half-open, makes the caller the one probe in the same
+        step, so callers that pick the backend before the probe starts cannot all pass.
+        """
+        state = self.state
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return state == "closed"
+
+    def on_success(self) -> None:
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def on_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self._probing or self.consecutive_failures >= self.failures:
+            if self.opened_at is None or self._probing:
+                print(f"[DEBUG] Circuit opened after {self.consecutive_failures} consecutive failures")
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def on_cancel(self) -> None:
+        # A cancelled probe proves nothing either way
+        self._probing = False
+
+
+class LatencyWindow:
+    def __init__(self):
+        self.samples = deque(maxlen=_WINDOW)
+        self.average: Optional[float] = None
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.average = seconds if self.average is None else self.average + _EWMA_ALPHA * (seconds - self.average)
+
+    def add_lower_bound(self, seconds: float) -> None:
+        """The call would have taken at least `seconds`: may raise the average, never lowers it."""
+        if self.average is None or seconds > self.average:
+            self.average = seconds if self.average is None else self.average + _EWMA_ALPHA * (seconds - self.average)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self.samples) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class Backend:
+    def __init__(self, name: str, model: Model, max_concurrency: int = LLM_BACKEND_MAX_CONCURRENCY,
+                 latency_bias: float = 0.0, client: Any = None):
+        self.name = name
+        self.model = model
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.latency_bias = latency_bias
+        self.breaker = CircuitBreaker()
+        self.latency = {"run": LatencyWindow(), "stream": LatencyWindow()}
+        self.in_flight = 0
+        # Moving average of call failures (1) and successes (0)
+        self.error_rate = 0.0
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    def has_room(self) -> bool:
+        return self.in_flight < self.max_concurrency
+
+    def score(self, mode: str) -> float:
+        """Expected latency in seconds; unmeasured backends count as fast so they get tried."""
+        average = self.latency[mode].average or 0.0
+        return (average * (1 + self.in_flight / self.max_concurrency) + self.latency_bias
+                + LLM_BACKEND_ERROR_PENALTY_SECONDS * self.error_rate)
+
+    def record_result(self, failed: bool) -> None:
+        self.error_rate += _EWMA_ALPHA * (float(failed) - self.error_rate)
+
+    def hedge_delay(self, mode: str) -> float:
+        p = self.latency[mode].quantile(LLM_HEDGE_QUANTILE)
+        return max(p if p is not None else LLM_HEDGE_DEFAULT_DELAY, LLM_HEDGE_MIN_DELAY)
+
+    def stats(self) -> dict:
+        return {
+            "state": self.breaker.state,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "error_rate": round(self.error_rate, 3),
+            "p95": {mode: window.quantile(0.95) for mode, window in self.latency.items()},
+        }
+
+
+def _is_request_error(error: Exception) -> bool:
+    # The request itself is invalid (bad input, too long...): another backend would refuse it too
+    return getattr(error, "status_code", None) in (400, 413, 422)
+
+
+class NoBackendAvailable(RuntimeError):
+    pass
+
+
+class RoutedModel(Model):
+    """agents SDK Model that spreads calls over several backends (see module docstring)."""
+
+    def __init__(self, backends: List[Backend]):
+        if not backends:
+            raise ValueError("RoutedModel needs at least one backend")
+        self.backends = backends
+
+    def _candidates(self, mode: str, exclude=()) -> List[Backend]:
+        available = [b for b in self.backends if b not in exclude and b.breaker.available()]
+        return sorted(available, key=lambda b: b.score(mode))
+
+    def _pick(self, mode: str, exclude=(), need_room: bool = False) -> Optional[Backend]:
+        candidates = self._candidates(mode, exclude)
+        with_room = [b for b in candidates if b.has_room()]
+        if not with_room and not need_room:
+            # Everyone is busy: queue on the best one
+            with_room = candidates
+        for backend in with_room:
+            if backend.breaker.try_reserve():
+                return backend
+        return None
+
+    async def _acquire(self, backend: Backend) -> None:
+        try:
+            await backend._slots.acquire()
+        except asyncio.CancelledError:
+            # Never started: give up the probe reservation made by _pick
+            backend.breaker.on_cancel()
+            raise
+        backend.in_flight += 1
+
+    def _release(self, backend: Backend) -> None:
+        backend.in_flight -= 1
+        backend._slots.release()
+
+    def _record(self, backend: Backend, mode: str, outcome: str, elapsed: Optional[float] = None,
+                error: Optional[BaseException] = None) -> None:
+        backend_requests.inc(backend.name, mode, outcome)
+        if outcome == "ok":
+            backend.breaker.on_success()
+            backend.record_result(failed=False)
+            backend.latency[mode].add(elapsed)
+            backend_latency.observe(elapsed, backend.name, mode)
+        elif outcome == "cancelled":
+            backend.breaker.on_cancel()
+            if elapsed is not None:
+                # Lost a hedge race: it would have taken at least this long, which should
+                # count against it when choosing the next backend (but is not a real latency)
+                backend.latency[mode].add_lower_bound(elapsed)
+        elif error is not None and _is_request_error(error):
+            backend.breaker.on_success()
+        else:
+            backend.breaker.on_failure()
+            backend.record_result(failed=True)
+            print(f"[DEBUG] LLM backend {backend.name} failed ({mode}): {type(error).__name__}: {error}")
+
+    # --- Non-streamed calls -------------------------------------------------------------------
+
+    async def _call(self, backend: Backend, args, kwargs):
+        await self._acquire(backend)
+        start = time.perf_counter()
+        try:
+            response = await backend.model.get_response(*args, **kwargs)
+        except asyncio.CancelledError:
+            self._record(backend, "run", "cancelled", time.perf_counter() - start)
+            raise
+        except Exception as e:
+            self._record(backend, "run", "error", error=e)
+            raise
+        finally:
+            self._release(backend)
+        self._record(backend, "run", "ok", time.perf_counter() - start)
+        return response
+
+    async def get_response(self, *args, **kwargs):
+        tried: List[Backend] = []
+        last_error: Optional[Exception] = None
+        while True:
+            primary = self._pick("run", exclude=tried)
+            if primary is None:
+                raise last_error or NoBackendAvailable("No LLM backend is available (all circuits open)")
+            tried.append(primary)
+            try:
+                return await self._hedged_call(primary, tried, args, kwargs)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if _is_request_error(e):
+                    raise
+                last_error = e
+                failovers.inc(primary.name)
+
+    async def _hedged_call(self, primary: Backend, tried: List[Backend], args, kwargs):
+        tasks = [asyncio.ensure_future(self._call(primary, args, kwargs))]
+        try:
+            if LLM_HEDGE_ENABLED:
+                done, _ = await asyncio.wait(tasks, timeout=primary.hedge_delay("run"))
+                secondary = None if done else self._pick("run", exclude=tried, need_room=True)
+                if secondary is not None:
+                    tried.append(secondary)
+                    print(f"[DEBUG] Hedging LLM call from {primary.name} to {secondary.name}")
+                    tasks.append(asyncio.ensure_future(self._call(secondary, args, kwargs)))
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if len(tasks) > 1:
+                            hedges.inc("run", "primary" if task is tasks[0] else "hedge")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # The slower call is cancelled (and recorded as such)
+            for task in tasks:
+                task.cancel()
+
+    # --- Streamed calls -----------------------------------------------------------------------
+    # Each candidate stream is consumed by its own task (the SDK's tracing context must stay in
+    # the task that started the stream) and handed over through a small queue.
+
+    async def _pump(self, backend: Backend, args, kwargs, queue: asyncio.Queue) -> None:
+        await self._acquire(backend)
+        start = time.perf_counter()
+        started = False
+        events = backend.model.stream_response(*args, **kwargs)
+        try:
+            async for event in events:
+                if not started:
+                    started = True
+                    self._record(backend, "stream", "ok", time.perf_counter() - start)
+                await queue.put(("event", event))
+            if not started:
+                self._record(backend, "stream", "ok", time.perf_counter() - start)
+            await queue.put(("end", None))
+        except asyncio.CancelledError:
+            if not started:
+                self._record(backend, "stream", "cancelled", time.perf_counter() - start)
+            raise
+        except Exception as e:
+            if not started:
+                self._record(backend, "stream", "error", error=e)
+            elif not _is_request_error(e):
+                # Broke off after the first event (the call already counted as ok): still
+                # a failure for the breaker and the error rate
+                backend.breaker.on_failure()
+                backend.record_result(failed=True)
+                print(f"[DEBUG] LLM backend {backend.name} failed mid-stream: {type(e).__name__}: {e}")
+            await queue.put(("error", e))
+        finally:
+            await _close(events)
+            self._release(backend)
+
+    def _start_pump(self, backend: Backend, args, kwargs):
+        queue = asyncio.Queue(maxsize=32)
+        return asyncio.ensure_future(self._pump(backend, args, kwargs, queue)), queue
+
+    async def _race_first_event(self, primary: Backend, tried: List[Backend], args, kwargs):
+        """
+        Like _hedged_call, for the first event of a stream. Returns (pump task, queue, first
+        item); the losing stream is cancelled.
+        """
+        pumps = [(primary, *self._start_pump(primary, args, kwargs))]
+        firsts = {asyncio.ensure_future(pumps[0][2].get()): 0}
+        winner = None
+        try:
+            if LLM_HEDGE_ENABLED:
+                done, _ = await asyncio.wait(set(firsts), timeout=primary.hedge_delay("stream"))
+                secondary = None if done else self._pick("stream", exclude=tried, need_room=True)
+                if secondary is not None:
+                    tried.append(secondary)
+                    print(f"[DEBUG] Hedging LLM stream from {primary.name} to {secondary.name}")
+                    pumps.append((secondary, *self._start_pump(secondary, args, kwargs)))
+                    firsts[asyncio.ensure_future(pumps[1][2].get())] = 1
+            pending = set(firsts)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for get in done:
+                    kind, value = get.result()
+                    if kind == "error":
+                        error = value
+                        continue
+                    winner = firsts[get]
+                    if len(pumps) > 1:
+                        hedges.inc("stream", "primary" if winner == 0 else "hedge")
+                    _, task, queue = pumps[winner]
+                    return task, queue, (kind, value)
+            raise error
+        finally:
+            for get in firsts:
+                get.cancel()
+            for i, (_, task, _) in enumerate(pumps):
+                if i != winner:
+                    task.cancel()
+
+    async def stream_response(self, *args, **kwargs) -> AsyncIterator[Any]:
+        tried: List[Backend] = []
+        last_error: Optional[Exception] = None
+        while True:
+            primary = self._pick("stream", exclude=tried)
+            if primary is None:
+                raise last_error or NoBackendAvailable("No LLM backend is available (all circuits open)")
+            tried.append(primary)
+            try:
+                task, queue, item = await self._race_first_event(primary, tried, args, kwargs)
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if _is_request_error(e):
+                    raise
+                last_error = e
+                failovers.inc(primary.name)
+
+        # Committed to one backend: the rest of the stream comes from it, errors included
+        try:
+            while True:
+                kind, value = item
+                if kind == "end":
+                    return
+                if kind == "error":
+                    raise value
+                yield value
+                item = await queue.get()
+        finally:
+            task.cancel()
+
+    async def close(self) -> None:
+        for backend in self.backends:
+            await backend.model.close()
+
+    def stats(self) -> dict:
+        return {backend.name: backend.stats() for backend in self.backends}
+
+
+async def _close(events) -> None:
+    close = getattr(events, "aclose", None)
+    if close is not None:
+        try:
+            await close()
+        except Exception:
+            pass
+
+
+def load_route_configs(default: dict) -> List[dict]:
+    """
+    LLM_ROUTES as a list of backend dicts, or [default] when unset. Each route needs
+    base_url and model; its key comes from api_key or the variable named by api_key_env
+    (local servers usually accept any key).
+    """
+    if not LLM_ROUTES:
+        return [default]
+    routes = json.loads(LLM_ROUTES)
+    if not isinstance(routes, list) or not routes:
+        raise ValueError("LLM_ROUTES must be a non-empty JSON list of backends")
+    configs = []
+    for i, route in enumerate(routes):
+        missing = [key for key in ("base_url", "model") if key not in route]
+        if missing:
+            raise ValueError(f"LLM_ROUTES entry {i} is missing {', '.join(missing)}")
+        config = {"name": f"backend{i}", "transport": default["transport"], **route}
+        api_key_env = route.get("api_key_env")
+        config["api_key"] = os.getenv(api_key_env) if api_key_env else route.get("api_key", "unused")
+        configs.append(config)
+    return configs
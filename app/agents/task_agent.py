@@ -1,25 +1,143 @@
 import os
+import asyncio
+import threading
+import time
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
-from agents import Agent, Runner, set_tracing_disabled, OpenAIChatCompletionsModel
-from openai import AsyncOpenAI
 from datetime import datetime
+from app.utils.fair_queue import FairQueue
+from app.utils.metrics import registry, timed
 
-load_dotenv()
+if TYPE_CHECKING:
+    from agents import Agent
+    from openai import AsyncOpenAI
+    from app.agents.model_router import Backend, RoutedModel
 
-set_tracing_disabled(True)
+load_dotenv()
 
-set_tracing_disabled(True)
+# The agents SDK and the OpenAI client take most of the app's import time, so they are
+# imported and built on first use (get_model) instead of when this module is imported.
+# Under a preloading server, warm_up() does it once in the parent before workers fork.
+# OpenAI-compatible endpoint and model used by every agent
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://generativelanguage.googleapis.com/v1beta/openai/")
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-3-flash-preview")
+LLM_API_KEY = os.getenv("LLM_API_KEY") or os.getenv("GEMINI_API_KEY")
+# openai (the real API), fake (in-process, offline), record or replay; see llm_backends.py
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai").lower()
 
-provider = AsyncOpenAI(
-    api_key = os.getenv("GEMINI_API_KEY"),
-    base_url = "https://generativelanguage.googleapis.com/v1beta/openai/"
+llm_requests = registry.counter(
+    "llm_requests_total", "Agent runs by mode (run/stream) and outcome", ("mode", "outcome")
+)
+llm_duration = registry.histogram(
+    "llm_request_duration_seconds", "Upstream LLM time per agent run, excluding the wait for a slot", ("mode",)
 )
-model = OpenAIChatCompletionsModel(
-    model= "gemini-3-flash-preview",
-    openai_client = provider
+llm_first_token = registry.histogram(
+    "llm_time_to_first_token_seconds", "Time from starting a streamed run to its first text delta"
 )
+llm_tokens = registry.counter(
+    "llm_tokens_total", "Tokens reported by the model API", ("mode", "type")
+)
+
+_provider: "AsyncOpenAI | None" = None
+_model: "RoutedModel | None" = None
+_model_lock = threading.Lock()
+
+
+def _build_backend(config: dict) -> "Backend":
+    from agents import OpenAIChatCompletionsModel
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    from app.agents.llm_backends import create_transport
+    from app.agents.model_router import Backend, LLM_BACKEND_MAX_CONCURRENCY
+
+    transport_name = config["transport"].lower()
+    transport = create_transport(transport_name, config)
+    options = {"timeout": float(config["timeout"])} if "timeout" in config else {}
+    client = AsyncOpenAI(
+        # The fake and replay backends never reach the API, so they need no key
+        api_key = config.get("api_key") or ("offline" if transport_name in ("fake", "replay") else None),
+        base_url = config["base_url"],
+        max_retries = int(config["max_retries"]),
+        http_client = DefaultAsyncHttpxClient(transport=transport) if transport is not None else None,
+        **options
+    )
+    model = OpenAIChatCompletionsModel(model=config["model"], openai_client=client)
+    return Backend(
+        config["name"],
+        model,
+        max_concurrency=int(config.get("max_concurrency", LLM_BACKEND_MAX_CONCURRENCY)),
+        latency_bias=float(config.get("latency_bias", 0)),
+        client=client,
+    )
+
+
+def get_model() -> "RoutedModel":
+    """
+    The model every agent uses: a RoutedModel over the LLM_ROUTES backends (or the single
+    LLM_BASE_URL one) with failover, hedging and circuit breakers; see model_router.py.
+    """
+    global _provider, _model
+    if _model is not None:
+        return _model
+    with _model_lock:
+        if _model is None:
+            from agents import set_tracing_disabled
+            from app.agents.model_router import RoutedModel, load_route_configs
+
+            set_tracing_disabled(True)
+            configs = load_route_configs({
+                "name": "primary",
+                "base_url": LLM_BASE_URL,
+                "model": LLM_MODEL,
+                "api_key": LLM_API_KEY,
+                "transport": LLM_BACKEND,
+            })
+            backends = []
+            for config in configs:
+                # With several backends, failing over beats the client's own retries
+                config.setdefault("max_retries", 2 if len(configs) == 1 else 0)
+                backends.append(_build_backend(config))
+            _provider = backends[0].client
+            _model = RoutedModel(backends)
+            print(f"[DEBUG] LLM backends: {', '.join(b.name for b in backends)}")
+        return _model
 
 
+def get_provider() -> "AsyncOpenAI":
+    get_model()
+    return _provider
+
+
+def router_stats() -> dict:
+    """Per-backend health (circuit state, in-flight calls, p95); empty until the model is built."""
+    return _model.stats() if _model is not None else {}
+
+
+def warm_up() -> None:
+    """Imports the agents SDK and builds the model client ahead of the first chat."""
+    get_model()
+    from openai.types.responses import ResponseTextDeltaEvent  # noqa: F401
+
+
+def __getattr__(name):
+    # `provider` and `model` used to be module globals
+    if name == "model":
+        return get_model()
+    if name == "provider":
+        return get_provider()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Upper bound (seconds) for a single agent run, including time spent waiting for a slot
+AGENT_TIMEOUT_SECONDS = float(os.getenv("AGENT_TIMEOUT_SECONDS", "60"))
+# How many agent runs may be in flight at once in this worker
+AGENT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", "200"))
+# Longest a chat waits for a slot before getting 429 + Retry-After
+AGENT_QUEUE_MAX_WAIT_SECONDS = float(os.getenv("AGENT_QUEUE_MAX_WAIT_SECONDS", "10"))
+# How many chats may wait for a slot at once; more get 429 straight away
+AGENT_QUEUE_MAX_LENGTH = int(os.getenv("AGENT_QUEUE_MAX_LENGTH", "500"))
+
+# Slots are shared fairly between users: one user's burst queues behind everyone else's next request
+agent_queue = FairQueue(AGENT_MAX_CONCURRENCY, AGENT_QUEUE_MAX_WAIT_SECONDS, AGENT_QUEUE_MAX_LENGTH)
+
 
 def get_task_agent(*, agent_name: str, purpose: str, task_title: str, task_description: str | None, user_name: str):
     instructions = f"""
@@ -111,15 +229,145 @@ def run_agent_sync(agent_instructions: str, message: str) -> str:
     print(f"[DEBUG] Running agent with message: '{message}'")
     # GEMINI_API_KEY already configured globally via provider
 
+    from agents import Runner
+
     try:
-        agent = Agent(
-            name="Task Agent",
-            instructions=agent_instructions,
-            model=model
-        )
+        agent = build_agent(agent_instructions)
         result = Runner.run_sync(agent, message)
         print(f"[DEBUG] Agent response: {result.final_output[:200]}...")
         return result.final_output
     except Exception as e:
         print(f"[ERROR] Agent run failed: {str(e)}")
         return f"Agent error: {str(e)}. Check server logs."
+
+
+def build_agent(agent_instructions: str) -> "Agent":
+    """Creates the SDK Agent object for a set of instructions (see agent_pool for reuse)."""
+    from agents import Agent
+
+    return Agent(
+        name="Task Agent",
+        instructions=agent_instructions,
+        model=get_model()
+    )
+
+
+def _as_agent(agent_or_instructions: "Agent | str") -> "Agent":
+    if isinstance(agent_or_instructions, str):
+        return build_agent(agent_or_instructions)
+    return agent_or_instructions
+
+
+def _last_user_text(message: str | list) -> str:
+    # Runner input is either the plain message or a list of input items ending with it
+    if isinstance(message, list):
+        return message[-1]["content"] if message else ""
+    return message
+
+
+def _record_usage(mode: str, result) -> None:
+    # Usage is summed over every model request of the run (tool calls make several)
+    usage = getattr(getattr(result, "context_wrapper", None), "usage", None)
+    if usage is None:
+        return
+    llm_tokens.inc(mode, "input", amount=usage.input_tokens or 0)
+    llm_tokens.inc(mode, "output", amount=usage.output_tokens or 0)
+
+
+async def _run_with_slot(agent: "Agent", message: str | list, user_key):
+    from agents import Runner
+
+    with timed("llm.slot_wait"):
+        acquired_at = await agent_queue.acquire(user_key)
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        result = await Runner.run(agent, message)
+        outcome = "ok"
+        _record_usage("run", result)
+        return result
+    except asyncio.CancelledError:
+        # wait_for cancels the run when AGENT_TIMEOUT_SECONDS is exceeded
+        outcome = "cancelled"
+        raise
+    finally:
+        agent_queue.release(acquired_at)
+        llm_duration.observe(time.perf_counter() - start, "run")
+        llm_requests.inc("run", outcome)
+
+
+async def run_agent_async(agent_instructions: "Agent | str", message: str | list, timeout: float | None = None,
+                          user_key=None) -> str:
+    """
+    Non-blocking counterpart of run_agent_sync for the async chat endpoints.
+
+    Waits for a slot in agent_queue (fair between `user_key`s) and awaits the model on the
+    event loop, so no threadpool worker is held while the LLM is generating. Raises
+    QueueRejected (429) when no slot frees up in time, asyncio.TimeoutError when the run takes
+    longer than `timeout` (defaults to AGENT_TIMEOUT_SECONDS); other failures are raised to
+    the caller as well.
+    `agent_instructions` may also be an already prepared Agent (see agent_pool), and
+    `message` a list of input items carrying conversation history.
+    """
+    print(f"[DEBUG] Running agent (async) with message: '{_last_user_text(message)}'")
+    agent = _as_agent(agent_instructions)
+    result = await asyncio.wait_for(
+        _run_with_slot(agent, message, user_key),
+        timeout=timeout or AGENT_TIMEOUT_SECONDS
+    )
+    print(f"[DEBUG] Agent response: {result.final_output[:200]}...")
+    return result.final_output
+
+
+async def stream_agent_async(agent_instructions: "Agent | str", message: str | list, timeout: float | None = None,
+                             user_key=None):
+    """
+    Streaming variant of run_agent_async: yields text deltas as the model produces them.
+
+    Holds an agent_queue slot for the lifetime of the stream. The timeout applies to the whole
+    stream; asyncio.TimeoutError is raised when it is exceeded. If the consumer stops
+    iterating early (e.g. the client disconnected) the underlying run is cancelled.
+    """
+    from agents import Runner
+    from openai.types.responses import ResponseTextDeltaEvent
+
+    print(f"[DEBUG] Streaming agent with message: '{_last_user_text(message)}'")
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + (timeout or AGENT_TIMEOUT_SECONDS)
+    agent = _as_agent(agent_instructions)
+
+    with timed("llm.slot_wait"):
+        acquired_at = await agent_queue.acquire(user_key, max_wait=deadline - loop.time())
+    result = None
+    start = time.perf_counter()
+    first_token = True
+    outcome = "error"
+    try:
+        result = Runner.run_streamed(agent, message)
+        events = result.stream_events().__aiter__()
+        while True:
+            try:
+                event = await asyncio.wait_for(events.__anext__(), timeout=max(deadline - loop.time(), 0))
+            except StopAsyncIteration:
+                break
+            if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+                if event.data.delta:
+                    if first_token:
+                        llm_first_token.observe(time.perf_counter() - start)
+                        first_token = False
+                    yield event.data.delta
+        outcome = "ok"
+        _record_usage("stream", result)
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        raise
+    except (asyncio.CancelledError, GeneratorExit):
+        # Timed out or the client went away
+        outcome = "cancelled"
+        raise
+    finally:
+        if result is not None and not result.is_complete:
+            result.cancel()
+        agent_queue.release(acquired_at)
+        llm_duration.observe(time.perf_counter() - start, "stream")
+        llm_requests.inc("stream", outcome)
@@ -1,17 +1,26 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.services import agent_services
 from app.models.user import User
 from app.schemas.agent_schema import  AgentChatRequest
 
-# def assign_agent_controller(db: Session, task_id: int, user: User, agent_data: AgentCreate):
+# def assign_agent_controller(db: AsyncSession, task_id: int, user: User, agent_data: AgentCreate):
 #     return agent_services.assign_agent_to_task(db, task_id, user, agent_data)
 
-# def get_agent_controller(db: Session, task_id: int, user: User):
+# def get_agent_controller(db: AsyncSession, task_id: int, user: User):
 #     return agent_services.get_agent_by_task(db, task_id, user)
 
-def chat_agent_controller(db: Session, task_id: int, user: User, chat_data: AgentChatRequest):
-    return agent_services.chat_with_agent(db, task_id, user, chat_data.message)
+async def chat_agent_controller(db: AsyncSession, task_id: int, user: User, chat_data: AgentChatRequest):
+    return await agent_services.chat_with_agent(db, task_id, user, chat_data.message)
 
-def chat_app_guide_controller(user: User, chat_data: AgentChatRequest):
+async def chat_app_guide_controller(user: User, chat_data: AgentChatRequest):
     """Handle General Purpose Agent chat - no DB needed, no task context"""
-    return agent_services.chat_with_app_guide(user, chat_data.message)
+    return await agent_services.chat_with_app_guide(user, chat_data.message)
+
+async def stream_agent_controller(db: AsyncSession, task_id: int, user: User, chat_data: AgentChatRequest):
+    return await agent_services.stream_chat_with_agent(db, task_id, user, chat_data.message)
+
+def stream_app_guide_controller(user: User, chat_data: AgentChatRequest):
+    return agent_services.stream_chat_with_app_guide(user, chat_data.message)
+
+async def chat_history_controller(db: AsyncSession, task_id: int, user: User, before_id: int | None, limit: int):
+    return await agent_services.get_chat_history(db, task_id, user, before_id, limit)
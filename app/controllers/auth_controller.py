@@ -1,10 +1,10 @@
 from sqlalchemy.orm import Session
 from starlette.background import BackgroundTasks
-from app.services import auth_services
+from app.services import auth_services, rate_limit_services
 
-def signup_controller(db: Session, user_data, background_tasks: BackgroundTasks):
+async def signup_controller(db: Session, user_data, background_tasks: BackgroundTasks):
     # user_data is the UserSchema object from the router
-    return auth_services.signup_user(
+    return await auth_services.signup_user(
         db,
         user_data.email,
         user_data.username,
@@ -14,14 +14,25 @@ def signup_controller(db: Session, user_data, background_tasks: BackgroundTasks)
         background_tasks
     )
 
-def login_controller(db: Session, email: str, password: str):
-    user = auth_services.authenticate_user(db, email, password)
+async def login_controller(db: Session, email: str, password: str, client_ip: str | None = None):
+    # Locked-out emails and IPs get 429 before the user lookup and bcrypt; the attempt is
+    # reserved up front so a concurrent burst can't outrun the failure count
+    rate_limit_services.begin_login_attempt(email, client_ip)
+    try:
+        user = await auth_services.authenticate_user(db, email, password)
+    except BaseException:
+        # Unverified email, hashing pool busy, client gone: release the attempt without counting it
+        rate_limit_services.end_login_attempt(email, client_ip, failed=False)
+        raise
+    rate_limit_services.end_login_attempt(email, client_ip, failed=user is None)
     if not user:
         return None
+    rate_limit_services.record_login_success(email)
 
     # Create JWT tokens
-    access_token = auth_services.create_access_token(data={"sub": user.email})
-    refresh_token = auth_services.create_refresh_token(data={"sub": user.email})
+    claims = auth_services.token_claims(user)
+    access_token = auth_services.create_access_token(data=claims)
+    refresh_token = auth_services.create_refresh_token(data=claims)
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
@@ -55,14 +66,14 @@ def logout_controller(db: Session):
 
     return auth_services.logout_service(db)
 
-def change_password_controller(db: Session, user, password_data):
-    return auth_services.change_password_service(
+async def change_password_controller(db: Session, user, password_data):
+    return await auth_services.change_password_service(
         db,
         user,
         password_data.old_password,
         password_data.new_password
     )
 
-def reset_password_controller(db: Session, reset_token: str, new_password: str):
+async def reset_password_controller(db: Session, reset_token: str, new_password: str):
     # \"\"\"Controller for password reset endpoint - delegates to service.\"\"\"
-    return auth_services.reset_password_service(db, reset_token, new_password)
+    return await auth_services.reset_password_service(db, reset_token, new_password)
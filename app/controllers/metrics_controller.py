@@ -0,0 +1,6 @@
+from typing import Optional
+from app.services import metrics_services
+
+def metrics_controller(authorization: Optional[str]) -> str:
+    metrics_services.check_metrics_access(authorization)
+    return metrics_services.render_metrics()
@@ -1,20 +1,38 @@
+from fastapi import WebSocket, WebSocketDisconnect, status
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
-from app.services import task_services
+from app.services import task_services, task_feed_services, task_search_services
 from app.models.user import User
-from app.schemas.task_schema import TaskCreate, TaskUpdate, TaskStatusUpdate, TaskTypeUpdate
-from app.models.task import Task
+from app.schemas.task_schema import (
+    TaskCreate,
+    TaskUpdate,
+    TaskStatusUpdate,
+    TaskTypeUpdate,
+    TaskBulkCreate,
+    TaskBulkStatusUpdate,
+    TaskBulkDelete
+)
 
 
 def create_task_controller(db: Session, user: User, task_data: TaskCreate):
     return task_services.create_task(db, user, task_data)
 
-def get_tasks_controller(db: Session, current_user: User, skip: int = 0, limit: int = 100):
+def get_tasks_controller(db: Session, current_user: User, skip: int = 0, limit: int = 100, cursor: str = None,
+                         status_filter=None, task_type: str = None, fields: list = None):
     # Only fetch tasks belonging to the current logged-in user
-    return db.query(Task)\
-             .filter(Task.user_id == current_user.id)\
-             .offset(skip)\
-             .limit(limit)\
-             .all()
+    return task_services.list_tasks(
+        db,
+        current_user,
+        limit=limit,
+        cursor=cursor,
+        skip=skip,
+        status_filter=status_filter,
+        task_type=task_type,
+        fields=fields
+    )
+
+def search_tasks_controller(db: Session, user: User, query: str, limit: int = 20, offset: int = 0):
+    return task_search_services.search_tasks(db, user, query, limit, offset)
 
 def get_task_controller(db: Session, user: User, task_id: int):
     return task_services.get_task_by_id(db, user, task_id)
@@ -31,5 +49,36 @@ def update_task_type_controller(db: Session, user: User, task_id: int, type_data
 def delete_task_controller(db: Session, user: User, task_id: int):
     return task_services.delete_task(db, user, task_id)
 
+def get_task_version_controller(db: Session, user: User):
+    return task_services.get_task_version(db, user)
+
 def get_task_summary_controller(db: Session, user: User):
     return task_services.get_task_summary(db, user)
+
+def bulk_create_tasks_controller(db: Session, user: User, bulk_data: TaskBulkCreate):
+    return task_services.bulk_create_tasks(db, user, bulk_data)
+
+def bulk_update_task_status_controller(db: Session, user: User, bulk_data: TaskBulkStatusUpdate):
+    return task_services.bulk_update_task_status(db, user, bulk_data)
+
+def bulk_delete_tasks_controller(db: Session, user: User, bulk_data: TaskBulkDelete):
+    return task_services.bulk_delete_tasks(db, user, bulk_data)
+
+
+def task_changes_controller(user: User, since: int | None):
+    return task_feed_services.task_change_frames(user.id, since)
+
+async def task_changes_websocket_controller(websocket: WebSocket, user: User, since: int | None):
+    await websocket.accept()
+    frames = task_feed_services.task_change_frames(user.id, since)
+    try:
+        async for frame in frames:
+            await websocket.send_json(jsonable_encoder(frame))
+            if frame["type"] == "overflow":
+                # Tell the client to reconnect (with ?since=) instead of buffering for it
+                await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                return
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await frames.aclose()
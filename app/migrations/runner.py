@@ -0,0 +1,260 @@
+import contextlib
+import os
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Optional
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from config.db import Base
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock for SQLite files
+    fcntl = None
+
+# Apply pending migrations on startup; when off, the app refuses to start until `python migrate.py` ran
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "true").lower() in ("1", "true", "yes")
+# Seconds a worker waits for another process that is running the migrations
+MIGRATION_LOCK_TIMEOUT = float(os.getenv("MIGRATION_LOCK_TIMEOUT", "300"))
+# Rows per transaction in data backfills
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "1000"))
+
+# Arbitrary constant identifying this app's Postgres advisory lock
+_PG_LOCK_KEY = 7_424_311
+
+# Kept out of Base.metadata so create_all() and the models never touch it
+_version_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    _version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    upgrade: Callable[["MigrationContext"], None]
+
+
+class MigrationContext:
+    """
+    Operations available to a migration. Every operation checks the live schema first and
+    is skipped if already applied, so a migration interrupted halfway can simply be re-run
+    (databases created by older releases may also have some of the changes already).
+    Each operation commits on its own; nothing holds a long transaction or table lock.
+    With dry_run, the SQL is printed instead of executed.
+    """
+
+    def __init__(self, conn: Connection, dry_run: bool = False):
+        self.conn = conn
+        self.dry_run = dry_run
+        self.dialect = conn.dialect.name
+
+    def _inspector(self):
+        return inspect(self.conn)
+
+    def _run(self, statement, params: Optional[dict] = None) -> None:
+        if self.dry_run:
+            compiled = statement.compile(dialect=self.conn.dialect) if not isinstance(statement, str) else statement
+            print(f"    {str(compiled).strip()};")
+            return
+        self.conn.execute(text(statement) if isinstance(statement, str) else statement, params or {})
+        self.conn.commit()
+
+    def has_table(self, table_name: str) -> bool:
+        return self._inspector().has_table(table_name)
+
+    def create_table(self, table_name: str) -> None:
+        """Creates a model's table, with its indexes, as currently declared."""
+        if self.has_table(table_name):
+            return
+        table = Base.metadata.tables[table_name]
+        print(f"[DB] Creating table {table_name}")
+        self._run(CreateTable(table))
+        for index in table.indexes:
+            self._run(CreateIndex(index))
+
+    def add_column(self, table_name: str, column_name: str) -> None:
+        """Adds a model column to an existing table. It must be nullable or have a server_default."""
+        if self.dry_run and not self.has_table(table_name):
+            return  # created with all its columns earlier in this dry run
+        if column_name in {c["name"] for c in self._inspector().get_columns(table_name)}:
+            return
+        column = Base.metadata.tables[table_name].columns[column_name]
+        ddl = f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column.type.compile(dialect=self.conn.dialect)}"
+        if column.server_default is not None:
+            ddl += f" DEFAULT {column.server_default.arg}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+        print(f"[DB] Adding column {table_name}.{column_name}")
+        self._run(ddl)
+
+    def set_not_null(self, table_name: str, column_name: str) -> None:
+        """
+        Adds NOT NULL to an existing column; backfill its NULLs first. SQLite can't change a
+        column's constraints in place, so there the step is skipped: new databases get the
+        constraint from the model and existing ones rely on the backfill and the model default.
+        """
+        if self.dry_run and not self.has_table(table_name):
+            return
+        column = next(c for c in self._inspector().get_columns(table_name) if c["name"] == column_name)
+        if not column["nullable"]:
+            return
+        if self.dialect == "sqlite":
+            print(f"[DB] SQLite can't add NOT NULL to {table_name}.{column_name} in place; skipped")
+            return
+        print(f"[DB] Making {table_name}.{column_name} NOT NULL")
+        self._run(f"ALTER TABLE {table_name} ALTER COLUMN {column_name} SET NOT NULL")
+
+    def create_index(self, table_name: str, index_name: str) -> None:
+        """Creates a model index. On Postgres it is built CONCURRENTLY, without blocking writes."""
+        if self.dry_run and not self.has_table(table_name):
+            return
+        if index_name in {i["name"] for i in self._inspector().get_indexes(table_name)}:
+            return
+        index = next(i for i in Base.metadata.tables[table_name].indexes if i.name == index_name)
+        print(f"[DB] Creating index {index_name}")
+        ddl = str(CreateIndex(index).compile(dialect=self.conn.dialect))
+        if self.dialect == "postgresql" and not self.dry_run:
+            # CREATE INDEX CONCURRENTLY can't run inside a transaction block
+            ddl = re.sub(r"^(\s*CREATE (UNIQUE )?INDEX)", r"\1 CONCURRENTLY", ddl, count=1)
+            self._run_autocommit(ddl)
+            return
+        self._run(ddl)
+
+    def _run_autocommit(self, ddl: str) -> None:
+        # On its own AUTOCOMMIT connection: changing the isolation level of self.conn in place
+        # would leave it in a transaction that forbids switching back. self.conn is committed
+        # first so the DDL does not wait on it.
+        self.conn.commit()
+        with self.conn.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as autocommit:
+            autocommit.execute(text(ddl))
+
+    def execute(self, sql: str, params: Optional[dict] = None) -> None:
+        self._run(sql, params)
+
+    def backfill(self, description: str, next_batch: Callable[[Connection, int], int]) -> None:
+        """
+        Runs `next_batch(conn, MIGRATION_BATCH_SIZE)` in its own transaction until it returns 0.
+        next_batch must only pick rows that still need the change, so the loop (and a re-run)
+        ends when everything is done.
+        """
+        print(f"[DB] Backfilling {description}")
+        if self.dry_run:
+            print("    (data backfill, skipped in dry run)")
+            return
+        total = 0
+        while True:
+            done = next_batch(self.conn, MIGRATION_BATCH_SIZE)
+            self.conn.commit()
+            total += done
+            if done == 0:
+                break
+        print(f"[DB] Backfilled {total} rows for {description}")
+
+
+def _applied_versions(conn: Connection) -> set:
+    if not inspect(conn).has_table("schema_version"):
+        return set()
+    return set(conn.execute(select(schema_version.c.version)).scalars())
+
+
+def current_version(bind: Engine) -> int:
+    """Highest applied migration version (0 for a database that predates migrations). One query."""
+    with bind.connect() as conn:
+        try:
+            return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+        except DBAPIError:
+            # No schema_version table yet
+            return 0
+
+
+@contextlib.contextmanager
+def migration_lock(bind: Engine):
+    """
+    Cross-process lock so workers booting together don't run the same DDL concurrently:
+    a Postgres advisory lock, or an flock() on a file next to an SQLite database.
+    """
+    url = bind.url
+    if bind.dialect.name == "postgresql":
+        with bind.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _PG_LOCK_KEY})
+            # Session-level lock: it outlives this transaction
+            conn.commit()
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _PG_LOCK_KEY})
+                conn.commit()
+    elif bind.dialect.name == "sqlite" and url.database not in (None, "", ":memory:") and fcntl is not None:
+        path = url.database.removeprefix("file:").split("?")[0] + ".migrate.lock"
+        with open(path, "a") as lock_file:
+            deadline = time.monotonic() + MIGRATION_LOCK_TIMEOUT
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"Timed out waiting for the migration lock {path}")
+                    time.sleep(0.1)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    else:
+        yield
+
+
+def migrate(bind: Engine, migrations: list, target: Optional[int] = None, dry_run: bool = False) -> list:
+    """
+    Applies the pending migrations in version order, up to `target` (default: all).
+    Returns the migrations that were applied (or would be, with dry_run).
+    """
+    with migration_lock(bind):
+        with bind.connect() as conn:
+            if not dry_run:
+                _version_metadata.create_all(conn)
+                conn.commit()
+            applied = _applied_versions(conn)
+            pending = [
+                m for m in sorted(migrations, key=lambda m: m.version)
+                if m.version not in applied and (target is None or m.version <= target)
+            ]
+            context = MigrationContext(conn, dry_run=dry_run)
+            for migration in pending:
+                print(f"[DB] {'Would apply' if dry_run else 'Applying'} migration {migration.version:04d} {migration.name}")
+                migration.upgrade(context)
+                if not dry_run:
+                    conn.execute(schema_version.insert().values(
+                        version=migration.version, name=migration.name, applied_at=datetime.utcnow()
+                    ))
+                    conn.commit()
+            return pending
+
+
+def ensure_schema(bind: Engine, migrations: list) -> None:
+    """
+    Startup check: one query when the schema is current. Otherwise applies the pending
+    migrations (DB_AUTO_MIGRATE) under the migration lock, so of several workers booting
+    together one does the work and the others find nothing left to do.
+    """
+    latest = max(m.version for m in migrations)
+    version = current_version(bind)
+    if version >= latest:
+        return
+    if not DB_AUTO_MIGRATE:
+        raise RuntimeError(
+            f"Database schema is at version {version}, this code needs {latest}. Run `python migrate.py`."
+        )
+    migrate(bind, migrations)
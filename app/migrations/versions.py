@@ -0,0 +1,179 @@
+"""
+Ordered schema migrations. Append new ones at the end with the next version number and
+never edit one that has shipped; `python migrate.py --dry-run` shows what would run.
+
+Operations are idempotent (see MigrationContext), because databases created before the
+migration table existed already have some of these changes.
+"""
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert, select, text, update
+from sqlalchemy.exc import OperationalError
+
+# Every model must be imported so its table is in Base.metadata
+from app.models import user, task, agent, conversation, task_counter, email_outbox  # noqa: F401
+from app.models.conversation import Conversation, Message
+from app.models.task import Task, TaskStatus
+from app.models.task_counter import TaskCounter
+from app.migrations.runner import Migration, MigrationContext
+from app.services.task_search_services import SQLITE_SEARCH_DDL, SQLITE_SEARCH_DROP, POSTGRES_SEARCH_DDL
+
+
+def _0001_base_tables(ctx: MigrationContext):
+    for table_name in ("users", "tasks", "agents"):
+        ctx.create_table(table_name)
+
+
+def _0002_chat_history(ctx: MigrationContext):
+    ctx.create_table("conversations")
+    ctx.create_table("messages")
+
+
+def _0003_task_counters(ctx: MigrationContext):
+    ctx.create_table("task_counters")
+
+
+def _0004_token_version(ctx: MigrationContext):
+    ctx.add_column("users", "token_version")
+
+
+def _0005_task_list_indexes(ctx: MigrationContext):
+    for index_name in ("ix_tasks_user_created", "ix_tasks_user_status_created", "ix_tasks_user_type_created"):
+        ctx.create_index("tasks", index_name)
+
+
+def _0006_task_change_version(ctx: MigrationContext):
+    ctx.add_column("task_counters", "version")
+    ctx.add_column("task_counters", "updated_at")
+
+
+def _backfill_task_counters(conn, batch_size: int) -> int:
+    # Users that have tasks but no counter row yet
+    user_ids = conn.execute(
+        select(Task.user_id)
+        .where(Task.user_id.is_not(None), Task.user_id.not_in(select(TaskCounter.user_id)))
+        .distinct()
+        .limit(batch_size)
+    ).scalars().all()
+    if not user_ids:
+        return 0
+    counts = {user_id: {"pending": 0, "in_progress": 0, "completed": 0} for user_id in user_ids}
+    rows = conn.execute(
+        select(Task.user_id, Task.status, func.count(Task.id))
+        .where(Task.user_id.in_(user_ids))
+        .group_by(Task.user_id, Task.status)
+    ).all()
+    for user_id, task_status, count in rows:
+        counts[user_id][TaskStatus(task_status).value] = count
+    conn.execute(insert(TaskCounter), [{"user_id": user_id, **c} for user_id, c in counts.items()])
+    return len(user_ids)
+
+
+def _0007_backfill_task_counters(ctx: MigrationContext):
+    # Without a row, /tasks/summary falls back to a GROUP BY until the user's next write
+    ctx.backfill("task_counters", _backfill_task_counters)
+
+
+def _0008_task_search_index(ctx: MigrationContext):
+    if ctx.dialect == "postgresql":
+        for ddl in POSTGRES_SEARCH_DDL:
+            ctx.execute(ddl)
+    elif ctx.dialect == "sqlite":
+        is_new = not ctx.has_table("tasks_fts")
+        try:
+            for ddl in SQLITE_SEARCH_DDL:
+                ctx.execute(ddl)
+        except OperationalError as e:
+            # SQLite built without FTS5: search keeps working with a LIKE scan
+            print(f"[DEBUG] Full-text index unavailable, search falls back to LIKE: {e}")
+            ctx.conn.rollback()
+            return
+        if is_new:
+            ctx.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+
+
+def _0009_email_outbox(ctx: MigrationContext):
+    ctx.create_table("email_outbox")
+
+
+def _backfill_task_created_at(conn, batch_size: int) -> int:
+    task_ids = conn.execute(
+        select(Task.id).where(Task.created_at.is_(None)).limit(batch_size)
+    ).scalars().all()
+    if not task_ids:
+        return 0
+    # Undated rows go before every dated one (then in id order), where the list already showed them
+    oldest = conn.execute(select(func.min(Task.created_at))).scalar() or datetime.utcnow()
+    conn.execute(update(Task).where(Task.id.in_(task_ids)).values(created_at=oldest))
+    return len(task_ids)
+
+
+def _0010_task_created_at_not_null(ctx: MigrationContext):
+    # Keyset pagination orders by (created_at, id): a NULL created_at breaks the cursor
+    ctx.backfill("tasks.created_at", _backfill_task_created_at)
+    ctx.set_not_null("tasks", "created_at")
+
+
+def _merge_duplicate_conversations(conn, batch_size: int) -> int:
+    # (agent, user) pairs that got two conversations from concurrent first messages
+    duplicates = conn.execute(
+        select(Conversation.agent_id, Conversation.user_id, func.min(Conversation.id))
+        .group_by(Conversation.agent_id, Conversation.user_id)
+        .having(func.count(Conversation.id) > 1)
+        .limit(batch_size)
+    ).all()
+    for agent_id, user_id, keep_id in duplicates:
+        other_ids = conn.execute(
+            select(Conversation.id)
+            .where(Conversation.agent_id == agent_id, Conversation.user_id == user_id, Conversation.id != keep_id)
+        ).scalars().all()
+        first_moved = conn.execute(
+            select(func.min(Message.id)).where(Message.conversation_id.in_(other_ids))
+        ).scalar()
+        if first_moved is not None:
+            # The moved messages are not in the kept summary: put them back in the window
+            summarized_through = conn.execute(
+                select(Conversation.summarized_through_id).where(Conversation.id == keep_id)
+            ).scalar_one()
+            conn.execute(
+                update(Conversation).where(Conversation.id == keep_id)
+                .values(summarized_through_id=min(summarized_through, first_moved - 1))
+            )
+            conn.execute(update(Message).where(Message.conversation_id.in_(other_ids)).values(conversation_id=keep_id))
+        conn.execute(delete(Conversation).where(Conversation.id.in_(other_ids)))
+    return len(duplicates)
+
+
+def _0011_unique_conversation(ctx: MigrationContext):
+    ctx.backfill("duplicate conversations", _merge_duplicate_conversations)
+    ctx.create_index("conversations", "uq_conversations_agent_user")
+
+
+def _0012_per_user_task_search(ctx: MigrationContext):
+    # tasks_fts from 0008 indexed every user's text together; rebuild it with user_id indexed
+    if ctx.dialect != "sqlite" or not ctx.has_table("tasks_fts"):
+        return
+    ddl = ctx.conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'tasks_fts'")).scalar()
+    if "user_id" in ddl:
+        return
+    for statement in SQLITE_SEARCH_DROP + SQLITE_SEARCH_DDL:
+        ctx.execute(statement)
+    ctx.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+
+
+MIGRATIONS = [
+    Migration(1, "base tables", _0001_base_tables),
+    Migration(2, "chat history", _0002_chat_history),
+    Migration(3, "task counters", _0003_task_counters),
+    Migration(4, "users.token_version", _0004_token_version),
+    Migration(5, "task list indexes", _0005_task_list_indexes),
+    Migration(6, "task change version", _0006_task_change_version),
+    Migration(7, "backfill task counters", _0007_backfill_task_counters),
+    Migration(8, "task search index", _0008_task_search_index),
+    Migration(9, "email outbox", _0009_email_outbox),
+    Migration(10, "tasks.created_at not null", _0010_task_created_at_not_null),
+    Migration(11, "one conversation per agent and user", _0011_unique_conversation),
+    Migration(12, "per-user task search index", _0012_per_user_task_search),
+]
+
+LATEST_VERSION = max(m.version for m in MIGRATIONS)
@@ -16,3 +16,6 @@ class Agent(Base):
 
     # Relationship to Task
     task = relationship("Task", back_populates="agent")
+
+    # Chat history with this agent
+    conversations = relationship("Conversation", back_populates="agent", cascade="all, delete-orphan")
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
+from datetime import datetime
+from config.db import Base
+
+class EmailOutbox(Base):
+    """
+    Outgoing emails. Rows are added in the same transaction as the change that causes the
+    email and sent later by the outbox worker (app/services/email_outbox_services.py), so
+    a restart never loses a queued message.
+
+    status: "pending" (waiting for next_attempt_at), "sending" (claimed by a worker until
+    claimed_until), "sent" or "failed" (gave up after EMAIL_MAX_ATTEMPTS).
+    """
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True)
+    recipient = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    html = Column(Text, nullable=False)
+    # What the email is for ("verification", "password_reset"), for logs and stats
+    kind = Column(String, nullable=False)
+
+    status = Column(String, default="pending", server_default="pending", nullable=False)
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    claim_token = Column(String, nullable=True)
+    claimed_until = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
+
+    # The worker polls for due rows: status = 'pending' AND next_attempt_at <= now
+    __table_args__ = (
+        Index("ix_email_outbox_status_due", "status", "next_attempt_at"),
+    )
@@ -1,5 +1,5 @@
 import enum
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from config.db import Base
@@ -20,7 +20,7 @@ class Task(Base):
     status = Column(Enum(TaskStatus), default=TaskStatus.PENDING, nullable=False)
     task_type = Column(String, nullable=True)
 
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"))
 
     # Establish relationship with User
@@ -28,3 +28,11 @@ class Task(Base):
 
     # Relationship with Agent
     agent = relationship("Agent", back_populates="task", uselist=False, cascade="all, delete-orphan")
+
+    # Keyset pagination walks (created_at, id) within a user, optionally filtered by
+    # status or type; the status index also serves the per-status summary counts
+    __table_args__ = (
+        Index("ix_tasks_user_created", "user_id", "created_at", "id"),
+        Index("ix_tasks_user_status_created", "user_id", "status", "created_at", "id"),
+        Index("ix_tasks_user_type_created", "user_id", "task_type", "created_at", "id"),
+    )
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from config.db import Base
+
+class TaskCounter(Base):
+    """
+    Per-user task counts by status, maintained by task_services in the same
+    transaction as the task writes, so /tasks/summary is a primary-key lookup.
+
+    `version` is bumped by every task write and `updated_at` records when; together they
+    are the ETag / Last-Modified of the user's task reads.
+    """
+    __tablename__ = "task_counters"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    pending = Column(Integer, default=0, server_default="0", nullable=False)
+    in_progress = Column(Integer, default=0, server_default="0", nullable=False)
+    completed = Column(Integer, default=0, server_default="0", nullable=False)
+    version = Column(Integer, default=0, server_default="0", nullable=False)
+    updated_at = Column(DateTime, nullable=True)
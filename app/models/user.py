@@ -14,6 +14,8 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     is_verified = Column(Boolean, default=False)
     verification_token = Column(String, nullable=True)
+    # Embedded in JWTs as "ver"; incrementing it revokes every token issued before
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)
 
     tasks = relationship("Task", back_populates="owner")
 
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, status
-from sqlalchemy.orm import Session
-from config.db import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.db import get_async_db
 from app.models.user import User
 from app.services.auth_services import get_current_user
-from app.schemas.agent_schema import  AgentResponse, AgentChatRequest, AgentChatResponse
+from app.services.rate_limit_services import limit_chat_rate
+from app.schemas.agent_schema import  AgentResponse, AgentChatRequest, AgentChatResponse, ChatHistoryResponse
 from app.controllers import agent_controller
 from app.services.agent_services import chat_with_agent
+from app.utils.streaming import StreamFormat, stream_response
 
 router = APIRouter(prefix="/tasks", tags=["Agent"])
 
@@ -29,22 +31,24 @@ router = APIRouter(prefix="/tasks", tags=["Agent"])
 # IMPORTANT: Put specific routes BEFORE parameterized routes
 # FastAPI matches routes in order, so /app-guide/chat must come before /{task_id}/chat
 @router.post("/app-guide/chat", response_model=AgentChatResponse)
-def chat_app_guide(
+async def chat_app_guide(
     chat_data: AgentChatRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(limit_chat_rate)
 ):
     """General Purpose Agent - explains how the app works"""
     print(f"[DEBUG] chat_app_guide called by user: {current_user.username}")
     print(f"[DEBUG] Received message: {chat_data.message}")
     try:
-        result = agent_controller.chat_app_guide_controller(
+        result = await agent_controller.chat_app_guide_controller(
             current_user,
             chat_data
         )
         print(f"[DEBUG] chat_app_guide returning result: {type(result)}")
         return result
+    except HTTPException:
+        # 429s from the agent queue keep their status and Retry-After
+        raise
     except Exception as e:
-        from fastapi import HTTPException
         import traceback
         print(f"[ERROR] chat_app_guide endpoint error: {str(e)}")
         print(f"[ERROR] Traceback: {traceback.format_exc()}")
@@ -53,16 +57,63 @@ def chat_app_guide(
             detail=f"Internal server error: {str(e)}"
         )
 
+@router.post("/app-guide/chat/stream")
+def chat_app_guide_stream(
+    chat_data: AgentChatRequest,
+    format: StreamFormat = "sse",
+    current_user: User = Depends(limit_chat_rate)
+):
+    """
+    Streaming General Purpose Agent chat.
+    Emits `delta` frames as text arrives and a final `done` frame with the AgentChatResponse fields.
+    Use ?format=ndjson for chunked JSON lines instead of Server-Sent Events.
+    """
+    frames = agent_controller.stream_app_guide_controller(current_user, chat_data)
+    return stream_response(frames, format)
+
 @router.post("/{task_id}/chat", response_model=AgentChatResponse)
-def chat_task(
+async def chat_task(
     task_id: int,
     chat_data: AgentChatRequest,   # ✅ schema
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(limit_chat_rate)
 ):
-    return agent_controller.chat_agent_controller(
+    return await agent_controller.chat_agent_controller(
         db,
         task_id,
         current_user,
         chat_data
-    )
\ No newline at end of file
+    )
+
+@router.post("/{task_id}/chat/stream")
+async def chat_task_stream(
+    task_id: int,
+    chat_data: AgentChatRequest,
+    format: StreamFormat = "sse",
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(limit_chat_rate)
+):
+    """
+    Streaming task agent chat (same frames as /app-guide/chat/stream).
+    """
+    frames = await agent_controller.stream_agent_controller(
+        db,
+        task_id,
+        current_user,
+        chat_data
+    )
+    return stream_response(frames, format)
+
+@router.get("/{task_id}/chat/history", response_model=ChatHistoryResponse)
+async def chat_history(
+    task_id: int,
+    before_id: int | None = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Stored conversation with the task's agent, newest messages first.
+    Older turns are also condensed in `summary`, which is what the agent sees.
+    """
+    return await agent_controller.chat_history_controller(db, task_id, current_user, before_id, limit)
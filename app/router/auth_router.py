@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
@@ -53,28 +53,32 @@ class RefreshSchema(BaseModel):
     refresh_token: str
 
 @router.post("/signup", response_model=UserResponseSchema)
-def signup(user: UserSignupSchema, db: Session = Depends(get_db), background_tasks: BackgroundTasks = BackgroundTasks()):
-    new_user = auth_controller.signup_controller(db, user, background_tasks)
+async def signup(user: UserSignupSchema, db: Session = Depends(get_db), background_tasks: BackgroundTasks = BackgroundTasks()):
+    new_user = await auth_controller.signup_controller(db, user, background_tasks)
     if not new_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     return new_user
 
+def _client_ip(request: Request) -> str | None:
+    # Behind a proxy this is the proxy unless uvicorn/gunicorn trust its X-Forwarded-For (--forwarded-allow-ips)
+    return request.client.host if request.client else None
+
 @router.post("/login", response_model=LoginResponseSchema)
-def login(user: LoginSchema, db: Session = Depends(get_db)):
-    login_data = auth_controller.login_controller(db, user.email, user.password)
+async def login(user: LoginSchema, request: Request, db: Session = Depends(get_db)):
+    login_data = await auth_controller.login_controller(db, user.email, user.password, _client_ip(request))
     if not login_data:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     return login_data
 
 @router.post("/token", response_model=LoginResponseSchema)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """
     Endpoint for Swagger UI (OAuth2 compliance).
     Receives form-data: username, password.
     Returns: access_token.
     NOTE: 'username' field MUST contain the email address.
     """
-    login_data = auth_controller.login_controller(db, form_data.username, form_data.password)
+    login_data = await auth_controller.login_controller(db, form_data.username, form_data.password, _client_ip(request))
     if not login_data:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     return login_data
@@ -105,12 +109,12 @@ def logout(db: Session = Depends(get_db)):
     return result
 
 @router.post("/change-password")
-def change_password(
+async def change_password(
     password_data: ChangePasswordSchema,
     current_user: User = Depends(auth_services.get_current_user),
     db: Session = Depends(get_db)
 ):
-    return auth_controller.change_password_controller(db, current_user, password_data)
+    return await auth_controller.change_password_controller(db, current_user, password_data)
 
 @router.get("/me", response_model=UserResponseSchema)
 def me(current_user: User = Depends(auth_services.get_current_user)):
@@ -123,8 +127,8 @@ def me(current_user: User = Depends(auth_services.get_current_user)):
     return current_user
 
 @router.post("/reset-password")
-def reset_password(reset_data: ResetPasswordSchema, db: Session = Depends(get_db)):
+async def reset_password(reset_data: ResetPasswordSchema, db: Session = Depends(get_db)):
     # Public endpoint for password reset using reset_token from /forgot-password.
     # No auth required. Expects reset_token in request body.
     
-    return auth_controller.reset_password_controller(db, reset_data.reset_token, reset_data.new_password)
\ No newline at end of file
+    return await auth_controller.reset_password_controller(db, reset_data.reset_token, reset_data.new_password)
\ No newline at end of file
@@ -0,0 +1,14 @@
+from typing import Optional
+from fastapi import APIRouter, Header
+from fastapi.responses import PlainTextResponse
+from app.controllers import metrics_controller
+
+router = APIRouter(tags=["Metrics"])
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics(authorization: Optional[str] = Header(None)):
+    # Scrape endpoint; protect it with METRICS_TOKEN when the app is publicly reachable
+    return PlainTextResponse(metrics_controller.metrics_controller(authorization), media_type=CONTENT_TYPE)
@@ -1,17 +1,27 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Header, Query, Request, Response, WebSocket, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
-from config.db import get_db
+from config.db import get_db, get_read_db
 from app.models.user import User
-from app.services.auth_services import get_current_user
+from app.services.auth_services import get_current_user, get_stream_user, get_websocket_user
+from app.utils.streaming import StreamFormat, stream_response
+from app.utils.http_cache import validator_headers, is_not_modified, not_modified_response, query_scope
 from app.schemas.task_schema import (
     TaskCreate,
     TaskUpdate,
     TaskResponse,
     TaskStatusUpdate,
     TaskTypeUpdate,
-    TaskSummaryResponse
+    TaskSummaryResponse,
+    TaskStatus,
+    TaskBulkCreate,
+    TaskBulkStatusUpdate,
+    TaskBulkDelete,
+    TaskBulkResponse,
+    TaskSearchResponse
 )
 from app.controllers import task_controller
 
@@ -25,29 +35,161 @@ def create_task(
 ):
     return task_controller.create_task_controller(db, current_user, task_data)
 
+# Bulk routes must come before the /{task_id} routes
+@router.post("/bulk", response_model=TaskBulkResponse, status_code=status.HTTP_201_CREATED)
+def bulk_create_tasks(
+    bulk_data: TaskBulkCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Create up to 5000 tasks in one transaction. Returns one result per item, in order.
+    """
+    return task_controller.bulk_create_tasks_controller(db, current_user, bulk_data)
+
+@router.patch("/bulk/status", response_model=TaskBulkResponse)
+def bulk_update_task_status(
+    bulk_data: TaskBulkStatusUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Set the status of many tasks at once. Ids that don't exist are reported as failed.
+    """
+    return task_controller.bulk_update_task_status_controller(db, current_user, bulk_data)
+
+@router.delete("/bulk", response_model=TaskBulkResponse)
+def bulk_delete_tasks(
+    bulk_data: TaskBulkDelete,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Delete many tasks (with their agents and chat history) at once.
+    """
+    return task_controller.bulk_delete_tasks_controller(db, current_user, bulk_data)
+
+# Change feed routes must also come before the /{task_id} routes
+@router.get("/changes")
+def task_changes(
+    since: Optional[int] = None,
+    format: StreamFormat = "sse",
+    last_event_id: Optional[int] = Header(None),
+    current_user: User = Depends(get_stream_user)
+):
+    """
+    Live feed of changes to the user's tasks (Server-Sent Events, or ?format=ndjson).
+    - Starts with a `hello` frame carrying the current change version, then sends `created`,
+      `updated` (id + changed fields) and `deleted` frames, each with its `version`.
+    - Resume with `?since=<version>` (or the `Last-Event-ID` header EventSource sends on reconnect).
+      If the missed events are no longer available a `reset` frame says to refetch `/tasks/`.
+    - A client that falls too far behind gets an `overflow` frame and is disconnected.
+    - The access token may be passed as `?token=` because EventSource can't set headers.
+    """
+    frames = task_controller.task_changes_controller(current_user, since if since is not None else last_event_id)
+    return stream_response(frames, format)
+
+@router.websocket("/changes/ws")
+async def task_changes_ws(
+    websocket: WebSocket,
+    since: Optional[int] = None,
+    current_user: User = Depends(get_websocket_user)
+):
+    """
+    The /tasks/changes feed over a WebSocket (token in ?token=), one JSON frame per message.
+    Slow clients are closed with code 1013 and should reconnect with ?since=.
+    """
+    await task_controller.task_changes_websocket_controller(websocket, current_user, since)
+
 @router.get("/", response_model=List[TaskResponse])
-def get_tasks(skip: int = 0, limit: int = 100, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    return task_controller.get_tasks_controller(db, current_user, skip, limit)
+def get_tasks(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[TaskStatus] = None,
+    task_type: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,title,status"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    List the user's tasks, oldest first.
+    - Pass the `X-Next-Cursor` response header back as `?cursor=` to get the next page
+      (the header is absent on the last page). `skip` is kept for older clients.
+    - Filter with `?status=` and/or `?task_type=`.
+    - `?fields=` returns only the listed fields, e.g. without the description.
+    - Send the `ETag` back as `If-None-Match` (with the same query) to get a 304 while none of the
+      user's tasks changed.
+    """
+    # Read the version before the tasks: a write in between only makes the ETag older than the data
+    version, updated_at = task_controller.get_task_version_controller(db, current_user)
+    # Each page / filter / field selection is a separate representation with its own ETag
+    headers = validator_headers(query_scope("tasks", request), current_user.id, version, updated_at)
+    if is_not_modified(request, headers):
+        return not_modified_response(headers)
+
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    tasks, next_cursor = task_controller.get_tasks_controller(
+        db, current_user, skip, limit, cursor, status, task_type, field_list
+    )
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if field_list:
+        # Sparse rows don't match TaskResponse, so bypass the response model
+        return JSONResponse(content=jsonable_encoder(tasks), headers=headers)
+    response.headers.update(headers)
+    return tasks
 
 
 
+@router.get("/search", response_model=TaskSearchResponse)
+def search_tasks(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Full-text search over the user's task titles and descriptions, best matches first.
+    Every word must match; the last word also matches as a prefix. Highlights are HTML-escaped
+    with the matches wrapped in <mark>. Pass `next_offset` back as `?offset=` for the next page.
+    """
+    return task_controller.search_tasks_controller(db, current_user, q, limit, offset)
+
 @router.get("/summary", response_model=TaskSummaryResponse)
 def get_task_summary(
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get summary of tasks (counts by status).
-    Useful for popup UI headers/badges.
+    Useful for popup UI headers/badges. Supports If-None-Match like `GET /tasks/`.
     """
+    version, updated_at = task_controller.get_task_version_controller(db, current_user)
+    headers = validator_headers("summary", current_user.id, version, updated_at)
+    if is_not_modified(request, headers):
+        return not_modified_response(headers)
+    response.headers.update(headers)
     return task_controller.get_task_summary_controller(db, current_user)
 
 @router.get("/{task_id}", response_model=TaskResponse)
 def get_task(
     task_id: int,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
+    version, updated_at = task_controller.get_task_version_controller(db, current_user)
+    headers = validator_headers(f"task{task_id}", current_user.id, version, updated_at)
+    if is_not_modified(request, headers):
+        return not_modified_response(headers)
+    response.headers.update(headers)
     return task_controller.get_task_controller(db, current_user, task_id)
 
 @router.put("/{task_id}", response_model=TaskResponse)
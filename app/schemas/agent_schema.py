@@ -30,3 +30,17 @@ class AgentChatResponse(BaseModel):
     response: str
     agent_name: str
     timestamp: datetime
+
+class ChatMessageResponse(BaseModel):
+    id: int
+    role: str
+    content: str
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class ChatHistoryResponse(BaseModel):
+    messages: list[ChatMessageResponse]
+    summary: Optional[str] = None
+    # Pass as ?before_id= to load the previous (older) page; null when there is none
+    next_before_id: Optional[int] = None
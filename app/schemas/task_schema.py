@@ -1,6 +1,6 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from enum import Enum
 
 class TaskStatus(str, Enum):
@@ -39,3 +39,42 @@ class TaskSummaryResponse(BaseModel):
     pending: int
     in_progress: int
     completed: int
+
+# Upper bound on items per bulk request
+BULK_MAX_ITEMS = 5000
+
+class TaskBulkCreate(BaseModel):
+    tasks: List[TaskCreate] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+
+class TaskBulkStatusUpdate(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+    status: TaskStatus
+
+class TaskBulkDelete(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+
+class BulkItemResult(BaseModel):
+    id: Optional[int] = None
+    ok: bool
+    error: Optional[str] = None
+
+class TaskBulkResponse(BaseModel):
+    succeeded: int
+    failed: int
+    # One entry per requested item, in request order
+    results: List[BulkItemResult]
+
+class TaskSearchHit(BaseModel):
+    id: int
+    title: str
+    status: TaskStatus
+    task_type: Optional[str] = None
+    created_at: datetime
+    # HTML-escaped text with the matched terms wrapped in <mark>...</mark>
+    title_highlight: str
+    description_snippet: Optional[str] = None
+    rank: float
+
+class TaskSearchResponse(BaseModel):
+    results: List[TaskSearchHit]
+    next_offset: Optional[int] = None
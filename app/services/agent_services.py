@@ -1,10 +1,53 @@
+import asyncio
+import dataclasses
+import hashlib
+import os
+import re
+import time
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+from config.db import AsyncSessionLocal
 from datetime import datetime
 from app.models.agent import Agent          # ✅ DB Agent
 from app.models.task import Task
 from app.models.user import User
-from app.agents.task_agent import get_task_agent, get_app_guide_agent, run_agent_sync
+from app.agents.task_agent import (
+    get_task_agent,
+    get_app_guide_agent,
+    build_agent,
+    run_agent_async,
+    stream_agent_async,
+    agent_queue
+)
+from app.services import conversation_services
+from app.agents.agent_pool import (
+    AGENT_POOL_REVALIDATE_SECONDS, PreparedAgent, agent_pool, task_agent_key, app_guide_key
+)
+from app.utils.fair_queue import QueueRejected
+from app.utils.response_cache import ResponseCache
+from app.utils.metrics import timed
+
+# App guide answers don't depend on user data, so they are cached across users.
+# The key combines the normalized question with a hash of the guide prompt, which means
+# editing get_app_guide_agent automatically invalidates old answers.
+APP_GUIDE_CACHE_SIZE = int(os.getenv("APP_GUIDE_CACHE_SIZE", "1024"))
+APP_GUIDE_CACHE_TTL_SECONDS = float(os.getenv("APP_GUIDE_CACHE_TTL_SECONDS", "86400"))
+APP_GUIDE_CACHE_DB = os.getenv("APP_GUIDE_CACHE_DB")  # e.g. ./app_guide_cache.db; unset = memory only
+
+app_guide_cache = ResponseCache(
+    max_entries=APP_GUIDE_CACHE_SIZE,
+    ttl_seconds=APP_GUIDE_CACHE_TTL_SECONDS,
+    db_path=APP_GUIDE_CACHE_DB
+)
+
+# The guide prompt contains the user's name; it is swapped for this marker in cached answers
+_USER_NAME_MARKER = "\x00user_name\x00"
+APP_GUIDE_PROMPT_VERSION = hashlib.sha256(
+    get_app_guide_agent(user_name=_USER_NAME_MARKER).encode()
+).hexdigest()[:16]
 
 
 def get_task_ownership(db: Session, task_id: int, user: User) -> Task:
@@ -60,18 +103,39 @@ def get_task_ownership(db: Session, task_id: int, user: User) -> Task:
 #     return agent
 
 
-def chat_with_agent(db: Session, task_id: int, user: User, message: str):
-    # Ensure task exists and belongs to current user
-    task = get_task_ownership(db, task_id, user)
+def _row_version(agent_id, agent_name, purpose, title, description) -> str:
+    # Version of exactly the task / agent fields the instructions are rendered from
+    fields = repr((agent_id, agent_name, purpose, title, description)).encode()
+    return hashlib.blake2b(fields, digest_size=12).hexdigest()
+
+
+async def _current_row_version(db: AsyncSession, task_id: int, user: User) -> str | None:
+    row = (await db.execute(
+        select(Agent.id, Agent.agent_name, Agent.purpose, Task.title, Task.description)
+        .join(Agent, Agent.task_id == Task.id)
+        .where(Task.id == task_id, Task.user_id == user.id)
+    )).first()
+    return _row_version(*row) if row else None
 
-    # Ensure agent exists for this task and belongs to the same user
-    db_agent = (
-        db.query(Agent)
-        .join(Task)
-        .filter(Agent.task_id == task_id, Task.user_id == user.id)
-        .first()
+
+async def load_task_agent(db: AsyncSession, task_id: int, user: User) -> PreparedAgent:
+    """
+    Loads the task and its agent with one query and renders the agent instructions.
+    Raises 404 if the task doesn't belong to the user or has no agent.
+    """
+    result = await db.execute(
+        select(Task, Agent)
+        .outerjoin(Agent, Agent.task_id == Task.id)
+        .where(Task.id == task_id, Task.user_id == user.id)
     )
+    row = result.first()
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task not found or access denied"
+        )
 
+    task, db_agent = row
     if not db_agent:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -85,39 +149,165 @@ def chat_with_agent(db: Session, task_id: int, user: User, message: str):
         task_description=task.description,
         user_name=user.username
     )
+    return PreparedAgent(
+        version=_row_version(db_agent.id, db_agent.agent_name, db_agent.purpose, task.title, task.description),
+        owner_id=user.id,
+        agent_id=db_agent.id,
+        agent_name=db_agent.agent_name,
+        instructions=instructions,
+        agent=build_agent(instructions),
+        checked_at=time.monotonic()
+    )
+
 
-    
+@timed("agent.prepare")
+async def get_prepared_task_agent(db: AsyncSession, task_id: int, user: User) -> PreparedAgent:
+    """
+    Returns the pooled agent for a task, loading it from the DB on a miss.
+    A hit makes no query: update_task / delete_task invalidate the entry in their own worker,
+    and an entry older than AGENT_POOL_REVALIDATE_SECONDS is compared with this task's rows
+    (edits made by other workers), so edits to the user's other tasks never evict it.
+    """
+    key = task_agent_key(task_id)
+    prepared = agent_pool.get(key)
+    if prepared is not None and prepared.owner_id == user.id:
+        now = time.monotonic()
+        if now - prepared.checked_at < AGENT_POOL_REVALIDATE_SECONDS:
+            return prepared
+        if await _current_row_version(db, task_id, user) == prepared.version:
+            prepared = dataclasses.replace(prepared, checked_at=now)
+            agent_pool.put(key, prepared)
+            return prepared
+        agent_pool.invalidate(key)
 
-    print(f"[DEBUG] Calling agent for task {task_id}: '{task.title}' with message: '{message}'")
+    prepared = await load_task_agent(db, task_id, user)
+    agent_pool.put(key, prepared)
+    return prepared
+
+
+@timed("agent.prepare_app_guide")
+def get_prepared_app_guide_agent(user: User) -> PreparedAgent:
+    key = app_guide_key(user.username)
+    prepared = agent_pool.get(key)
+    if prepared is not None:
+        return prepared
+
+    instructions = get_app_guide_agent(user_name=user.username)
+    if not instructions or not instructions.strip():
+        raise ValueError("Failed to generate agent instructions")
+    prepared = PreparedAgent(
+        version=APP_GUIDE_PROMPT_VERSION,
+        owner_id=None,
+        agent_id=None,
+        agent_name="General Purpose Agent",
+        instructions=instructions,
+        agent=build_agent(instructions)
+    )
+    agent_pool.put(key, prepared)
+    return prepared
+
+
+async def _save_turn(db: AsyncSession, conversation_id: int, message: str, response_text: str) -> None:
+    # The reply is already paid for: if it can't be stored, log it and still return it
+    try:
+        await conversation_services.record_turn(db, conversation_id, message, response_text)
+    except Exception as e:
+        print(f"[ERROR] Could not save chat turn for conversation {conversation_id}: {str(e)}")
+
+
+async def chat_with_agent(db: AsyncSession, task_id: int, user: User, message: str):
+    prepared = await get_prepared_task_agent(db, task_id, user)
+    # Summary + recent turns of this user's conversation with the agent, then the new message
+    conversation_id, agent_input = await conversation_services.build_agent_input(
+        db, prepared.agent_id, user.id, message
+    )
+
+    print(f"[DEBUG] Calling agent for task {task_id} with message: '{message}'")
     try:
-        response_text = run_agent_sync(instructions, message)
+        response_text = await run_agent_async(prepared.agent, agent_input, user_key=user.id)
         print(f"[DEBUG] Agent response for task {task_id}: {response_text[:200]}...")
+    except QueueRejected:
+        # No agent slot freed up in time: 429 + Retry-After rather than a fallback answer
+        raise
+    except asyncio.TimeoutError:
+        print(f"[ERROR] Agent timed out for task {task_id}")
+        response_text = "The AI agent took too long to respond. Please try again."
     except Exception as e:
-        print(f"[ERROR] Agent sync failed for task {task_id}: {str(e)}")
+        print(f"[ERROR] Agent run failed for task {task_id}: {str(e)}")
         response_text = "AI agent error. See backend logs for details."
+    else:
+        await _save_turn(db, conversation_id, message, response_text)
 
     return {
         "response": response_text,
-        "agent_name": db_agent.agent_name,
+        "agent_name": prepared.agent_name,
         "timestamp": datetime.utcnow()
     }
 
 
-def chat_with_app_guide(user: User, message: str):
+def _normalize_question(message: str) -> str:
+    # "How do I create a task?" and "how do i create a task" share one cache entry
+    return re.sub(r"\s+", " ", message).strip().rstrip("?!. ").lower()
+
+
+def _app_guide_cache_key(message: str) -> str:
+    return f"{APP_GUIDE_PROMPT_VERSION}:{_normalize_question(message)}"
+
+
+def _user_name_pattern(user_name: str):
+    return re.compile(rf"(?<!\w){re.escape(user_name)}(?!\w)")
+
+
+def get_cached_app_guide_answer(user: User, message: str) -> str | None:
+    cached = app_guide_cache.get(_app_guide_cache_key(message))
+    if cached is None:
+        return None
+    return cached.replace(_USER_NAME_MARKER, user.username)
+
+
+def cache_app_guide_answer(user: User, message: str, response_text: str) -> None:
+    # Very short names could match ordinary words when re-personalizing, so skip those
+    if len(user.username) < 3:
+        return
+    generic = _user_name_pattern(user.username).sub(_USER_NAME_MARKER, response_text)
+    app_guide_cache.set(_app_guide_cache_key(message), generic)
+
+
+async def _app_guide_cache_call(fn, *args):
+    # With APP_GUIDE_CACHE_DB a lookup may read or write the SQLite file; keep that off the event loop
+    if app_guide_cache.persistent:
+        return await run_in_threadpool(fn, *args)
+    return fn(*args)
+
+
+async def chat_with_app_guide(user: User, message: str):
     """Chat with General Purpose Agent - explains how the app works"""
     print(f"[DEBUG] General Purpose Agent chat from user {user.username}: '{message}'")
 
+    cached = await _app_guide_cache_call(get_cached_app_guide_answer, user, message)
+    if cached is not None:
+        print("[DEBUG] General Purpose Agent answer served from cache")
+        return {
+            "response": cached,
+            "agent_name": "General Purpose Agent",
+            "timestamp": datetime.utcnow()
+        }
+
     try:
-        instructions = get_app_guide_agent(user_name=user.username)
-        if not instructions or not instructions.strip():
-            raise ValueError("Failed to generate agent instructions")
-        
-        response_text = run_agent_sync(instructions, message)
+        prepared = get_prepared_app_guide_agent(user)
+        response_text = await run_agent_async(prepared.agent, message, user_key=user.id)
         
         if not response_text or not response_text.strip():
             response_text = "I'm here to help! Could you please rephrase your question about how to use the app?"
+        else:
+            await _app_guide_cache_call(cache_app_guide_answer, user, message, response_text)
         
         print(f"[DEBUG] General Purpose Agent response: {response_text[:200]}...")
+    except QueueRejected:
+        raise
+    except asyncio.TimeoutError:
+        print("[ERROR] General Purpose Agent timed out")
+        response_text = "I'm taking too long to answer right now. Please try again in a moment."
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
@@ -130,3 +320,110 @@ def chat_with_app_guide(user: User, message: str):
         "agent_name": "General Purpose Agent",
         "timestamp": datetime.utcnow()
     }
+
+
+async def _stream_frames(agent, agent_input, agent_name: str, error_text: str, user_key, on_complete=None):
+    """
+    Turns an agent stream into protocol-neutral frames:
+    {"type": "delta", "delta": ...} for each chunk, then one
+    {"type": "done", response, agent_name, timestamp} frame with the AgentChatResponse fields.
+    Failures produce an {"type": "error"} frame followed by a "done" frame carrying the
+    same fallback text the non-streaming endpoints return.
+    `on_complete(response_text)` is called only when the stream finished successfully; if it
+    fails, that is logged and the reply still goes out.
+    """
+    parts = []
+    try:
+        async for delta in stream_agent_async(agent, agent_input, user_key=user_key):
+            parts.append(delta)
+            yield {"type": "delta", "delta": delta}
+        response_text = "".join(parts)
+    except asyncio.TimeoutError:
+        print(f"[ERROR] Agent stream timed out for {agent_name}")
+        response_text = "".join(parts) or "The AI agent took too long to respond. Please try again."
+        yield {"type": "error", "detail": "timeout"}
+    except QueueRejected as e:
+        # The 200 is already sent; the client can retry after e.headers["Retry-After"]
+        print(f"[ERROR] No agent slot for {agent_name}: {e.reason}")
+        response_text = e.detail
+        yield {"type": "error", "detail": "busy"}
+    except Exception as e:
+        print(f"[ERROR] Agent stream failed for {agent_name}: {str(e)}")
+        response_text = error_text
+        yield {"type": "error", "detail": "agent_error"}
+    else:
+        if on_complete is not None and response_text.strip():
+            try:
+                await on_complete(response_text)
+            except Exception as e:
+                print(f"[ERROR] Could not save the streamed reply of {agent_name}: {str(e)}")
+
+    yield {
+        "type": "done",
+        "response": response_text,
+        "agent_name": agent_name,
+        "timestamp": datetime.utcnow()
+    }
+
+
+async def stream_chat_with_agent(db: AsyncSession, task_id: int, user: User, message: str):
+    """Streaming version of chat_with_agent. Ownership is checked before the stream starts."""
+    prepared = await get_prepared_task_agent(db, task_id, user)
+    conversation_id, agent_input = await conversation_services.build_agent_input(
+        db, prepared.agent_id, user.id, message
+    )
+
+    async def remember(response_text: str):
+        # The request's session may already be closed once the body is streaming
+        async with AsyncSessionLocal() as stream_db:
+            await conversation_services.record_turn(stream_db, conversation_id, message, response_text)
+
+    print(f"[DEBUG] Streaming agent for task {task_id} with message: '{message}'")
+    # Turn the request away with a real 429 while that is still possible
+    agent_queue.check()
+    return _stream_frames(
+        prepared.agent,
+        agent_input,
+        prepared.agent_name,
+        "AI agent error. See backend logs for details.",
+        user.id,
+        on_complete=remember
+    )
+
+
+async def _cached_frames(response_text: str, agent_name: str):
+    yield {"type": "delta", "delta": response_text}
+    yield {
+        "type": "done",
+        "response": response_text,
+        "agent_name": agent_name,
+        "timestamp": datetime.utcnow()
+    }
+
+
+def stream_chat_with_app_guide(user: User, message: str):
+    """Streaming version of chat_with_app_guide"""
+    print(f"[DEBUG] General Purpose Agent stream from user {user.username}: '{message}'")
+    cached = get_cached_app_guide_answer(user, message)
+    if cached is not None:
+        return _cached_frames(cached, "General Purpose Agent")
+
+    agent_queue.check()
+    prepared = get_prepared_app_guide_agent(user)
+
+    async def remember(response_text: str):
+        await _app_guide_cache_call(cache_app_guide_answer, user, message, response_text)
+
+    return _stream_frames(
+        prepared.agent,
+        message,
+        "General Purpose Agent",
+        "I'm having trouble right now. Please try again or check if the API key is configured correctly.",
+        user.id,
+        on_complete=remember
+    )
+
+
+async def get_chat_history(db: AsyncSession, task_id: int, user: User, before_id: int | None, limit: int):
+    prepared = await get_prepared_task_agent(db, task_id, user)
+    return await conversation_services.get_history(db, prepared.agent_id, user.id, before_id, limit)
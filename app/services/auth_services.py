@@ -1,18 +1,25 @@
-import bcrypt
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, Query, WebSocketException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from app.models.user import User
-from config.db import get_db
+from config.db import SessionLocal
+from typing import Optional
 import uuid
 from starlette.background import BackgroundTasks
-from app.utils.email_utils import send_verification_email
+from app.services.email_outbox_services import (
+    enqueue_verification_email, enqueue_password_reset_email, outbox_worker
+)
+from app.utils.principal_cache import CurrentUser, PrincipalCache
+from app.utils import password_hasher
+from app.utils.metrics import timed
+from starlette.concurrency import run_in_threadpool
 
 # THIS IS REQUIRED — define the bearer scheme BEFORE the function
 bearer_scheme = HTTPBearer()
+optional_bearer_scheme = HTTPBearer(auto_error=False)
 
 # JWT Security Config
 import os
@@ -21,18 +28,36 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_MINUTES = 10080  # 7 days
 
+# How long an authenticated user record is reused before the DB is consulted again
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+# When enabled, access tokens carry the user's profile and get_current_user never queries the DB.
+# Password changes revoke old access tokens immediately in the worker that handled them and in
+# other workers (or after a restart) only once they expire, so keep ACCESS_TOKEN_EXPIRE_MINUTES
+# short. Refresh tokens never carry the profile and are not accepted as access tokens.
+JWT_EMBED_PRINCIPAL = os.getenv("JWT_EMBED_PRINCIPAL", "false").lower() in ("1", "true", "yes")
+# /auth/forgot-password also returns the reset token (development); it is always emailed
+RESET_TOKEN_IN_RESPONSE = os.getenv("RESET_TOKEN_IN_RESPONSE", "true").lower() in ("1", "true", "yes")
+
+principal_cache = PrincipalCache(
+    ttl_seconds=PRINCIPAL_CACHE_TTL_SECONDS, revocation_ttl_seconds=ACCESS_TOKEN_EXPIRE_MINUTES * 60
+)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
 def hash_password(password: str) -> str:
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode(), salt).decode()
+    return password_hasher.hash_password(password)
 
 def verify_password(plain_password, hashed_password) -> bool:
-    return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
+    return password_hasher.verify_password(plain_password, hashed_password)
+
+# Async variants run bcrypt on the hashing executor (see app/utils/password_hasher.py)
+hash_password_async = password_hasher.hash_password_async
+verify_password_async = password_hasher.verify_password_async
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     """Generates a JWT Token with optional custom expiry delta."""
     to_encode = data.copy()
+    to_encode.setdefault("type", "access")
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
@@ -41,8 +66,49 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def create_refresh_token(data: dict):
-    """Generates long-lived refresh token (7 days)."""
-    return create_access_token(data, timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES))
+    """Generates long-lived refresh token (7 days). It is never accepted by authenticate_token."""
+    claims = {key: value for key, value in data.items() if key != "usr"}
+    claims["type"] = "refresh"
+    return create_access_token(claims, timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES))
+
+def token_claims(user) -> dict:
+    """
+    Claims identifying a user in access/refresh tokens:
+    - sub: email (as before)
+    - uid / ver: user id and token_version; bumping token_version revokes older tokens
+    - usr: slim profile, only when JWT_EMBED_PRINCIPAL is enabled (dropped from refresh tokens)
+    - type ("access" / "refresh" / "reset") is added by create_access_token / create_refresh_token
+    """
+    claims = {"sub": user.email, "uid": user.id, "ver": user.token_version or 0}
+    if JWT_EMBED_PRINCIPAL:
+        claims["usr"] = {
+            "username": user.username,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "is_verified": bool(user.is_verified),
+        }
+    return claims
+
+def _principal_from_claims(payload: dict):
+    profile = payload.get("usr")
+    if not profile or payload.get("uid") is None:
+        return None
+    return CurrentUser(
+        id=payload["uid"],
+        email=payload["sub"],
+        username=profile["username"],
+        first_name=profile["first_name"],
+        last_name=profile["last_name"],
+        is_verified=profile.get("is_verified", True),
+        token_version=payload.get("ver", 0),
+    )
+
+def revoke_user_tokens(user: User) -> None:
+    """
+    Invalidates every token issued to the user so far once committed. After the commit, call
+    principal_cache.invalidate(email, new version) so this worker stops trusting cached ones.
+    """
+    user.token_version = (user.token_version or 0) + 1
 
 def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
@@ -50,8 +116,8 @@ def get_user_by_email(db: Session, email: str):
 def get_user_by_username(db: Session, username: str):
     return db.query(User).filter(User.username == username).first()
 
-def create_new_user(db: Session, email: str, username: str, first_name: str, last_name: str, password: str, background_tasks: BackgroundTasks = None):
-    hashed_pwd = hash_password(password)
+def create_new_user(db: Session, email: str, username: str, first_name: str, last_name: str, password: str, background_tasks: BackgroundTasks = None, hashed_password: str = None):
+    hashed_pwd = hashed_password or hash_password(password)
     verification_token = None  # Disabled for development
     new_user = User(
         email=email,
@@ -63,16 +129,18 @@ def create_new_user(db: Session, email: str, username: str, first_name: str, las
         verification_token=verification_token
     )
     db.add(new_user)
+    send_email = False  # Disabled email sending for development
+    if send_email:
+        # Queued in the same transaction as the user, sent by the outbox worker
+        enqueue_verification_email(db, email, verification_token)
     db.commit()
     db.refresh(new_user)
-
-    if False:  # Disabled email sending for development
-        send_verification_email(email, verification_token, background_tasks)
+    if send_email:
+        outbox_worker.notify()
 
     return new_user
 
-def signup_user(db: Session, email: str, username: str, first_name: str, last_name: str, password: str, background_tasks: BackgroundTasks = None):
-    """Controller for user signup - returns user or raises exception if email or username exists"""
+def _check_signup_available(db: Session, email: str, username: str):
     # Check if email already exists
     user_by_email = get_user_by_email(db, email)
     if user_by_email:
@@ -83,16 +151,33 @@ def signup_user(db: Session, email: str, username: str, first_name: str, last_na
     if user_by_username:
         raise HTTPException(status_code=400, detail="Username already taken")
 
-    return create_new_user(db, email, username, first_name, last_name, password, background_tasks)
+async def signup_user(db: Session, email: str, username: str, first_name: str, last_name: str, password: str, background_tasks: BackgroundTasks = None):
+    """Controller for user signup - returns user or raises exception if email or username exists"""
+    await run_in_threadpool(_check_signup_available, db, email, username)
+    hashed_pwd = await hash_password_async(password)
+    return await run_in_threadpool(
+        create_new_user, db, email, username, first_name, last_name, password, background_tasks, hashed_pwd
+    )
+
+def _save_password_hash(db: Session, user: User, hashed_password: str):
+    user.hashed_password = hashed_password
+    db.commit()
+    # The commit expired `user`; reload it here rather than on the event loop when it is next read
+    db.refresh(user)
 
-def authenticate_user(db: Session, email: str, password: str):
+async def authenticate_user(db: Session, email: str, password: str):
     """Controller for user login - returns user or None if auth fails"""
-    user = get_user_by_email(db, email)
+    user = await run_in_threadpool(get_user_by_email, db, email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return None
 
+    # Upgrade hashes made with an older BCRYPT_ROUNDS while we have the plain password
+    if password_hasher.needs_rehash(user.hashed_password):
+        new_hash = await hash_password_async(password)
+        await run_in_threadpool(_save_password_hash, db, user, new_hash)
+
     if not user.is_verified:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -101,24 +186,55 @@ def authenticate_user(db: Session, email: str, password: str):
 
     return user
 
+@timed("auth.get_current_user")
 def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
-    db: Session = Depends(get_db)
-) -> User:
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)
+) -> CurrentUser:
     """
     Retrieves the current logged-in user based on the JWT token.
 
     Steps:
     1. Extract the token from Authorization header using HTTPBearer.
     2. Decode the JWT using the SECRET_KEY and ALGORITHM.
-    3. Extract the email (sub) from the token payload.
-    4. Retrieve the user from the database using the email.
-    5. Raise 401 if token is invalid, expired, or user not found.
+    3. Extract the email (sub) and token version (ver) from the token payload.
+    4. Return the cached user for (sub, ver) if present, or build it from the token's
+       embedded profile (JWT_EMBED_PRINCIPAL); otherwise load the user from the primary
+       database in a short session of its own (a replica may not have a new user yet, and
+       no connection is held for the rest of the request).
+    5. Raise 401 if token is invalid, expired, revoked, or user not found.
     """
 
     # Extract the token string from the Authorization header
-    token = credentials.credentials
+    return authenticate_token(credentials.credentials)
 
+def get_stream_user(
+    token: Optional[str] = Query(None, description="Access token, for clients that can't set headers (EventSource)"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_bearer_scheme)
+) -> CurrentUser:
+    """
+    get_current_user for long-lived streams: the token may come from ?token= as well as the
+    Authorization header. Like get_current_user, no DB session is held while streaming.
+    """
+    raw_token = token or (credentials.credentials if credentials else None)
+    if not raw_token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+        )
+    return authenticate_token(raw_token)
+
+def get_websocket_user(token: Optional[str] = Query(None)) -> CurrentUser:
+    """Browsers can't send headers on a WebSocket handshake, so the token comes from ?token=."""
+    try:
+        return get_stream_user(token, None)
+    except HTTPException as exc:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=exc.detail)
+
+def authenticate_token(token: str, db: Optional[Session] = None) -> CurrentUser:
+    """
+    Validates an access token and returns the user it belongs to (see get_current_user).
+    Without `db`, a cache miss is looked up in a short-lived session on the primary.
+    """
     try:
         # Decode the JWT token
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -133,27 +249,85 @@ def get_current_user(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token",
         )
+    if payload.get("type") != "access":
+        # Refresh and password reset tokens (and tokens issued before the claim existed) are not access tokens
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token type",
+        )
 
-    # Retrieve the user from the database
-    user = db.query(User).filter(User.email == email).first()
+    version = payload.get("ver", 0)
+    if principal_cache.is_revoked(email, version):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+        )
+
+    principal = principal_cache.get(email, version)
+    if principal is not None:
+        return principal
+
+    principal = _principal_from_claims(payload)
+    if principal is not None:
+        principal_cache.put(principal)
+        return principal
+
+    # Retrieve the user from the primary: a lagging replica would 401 a just-created or just-changed user
+    if db is None:
+        with SessionLocal() as session:
+            user = get_user_by_email(session, email)
+    else:
+        user = get_user_by_email(db, email)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
         )
+    if (user.token_version or 0) != version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+        )
 
-    return user
+    principal = CurrentUser.from_user(user)
+    principal_cache.put(principal)
+    return principal
+
+def _get_user_by_id(db: Session, user_id: int):
+    return db.query(User).filter(User.id == user_id).first()
+
+def _store_new_password(db: Session, user: User, hashed_password: str) -> dict:
+    """Saves the new hash and revokes older tokens; returns the claims for fresh ones."""
+    user.hashed_password = hashed_password
+    revoke_user_tokens(user)
+    email, version = user.email, user.token_version
+    db.commit()
+    # Only now: if the commit failed, the user's current tokens are still valid everywhere
+    principal_cache.invalidate(email, version)
+    # Built here: the commit expired `user`, and reading it reloads the row (a blocking query)
+    return token_claims(user)
+
+async def change_password_service(db: Session, current_user: CurrentUser, old_password: str, new_password: str):
+    # current_user is a detached record, so load the row we are going to modify
+    user = await run_in_threadpool(_get_user_by_id, db, current_user.id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
 
-def change_password_service(db: Session, user: User, old_password: str, new_password: str):
-    if not verify_password(old_password, user.hashed_password):
+    if not await verify_password_async(old_password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect old password"
         )
 
-    user.hashed_password = hash_password(new_password)
-    db.commit()
-    return {"message": "Password changed successfully"}
+    # Log out every other session; the caller gets fresh tokens below
+    new_hash = await hash_password_async(new_password)
+    claims = await run_in_threadpool(_store_new_password, db, user, new_hash)
+    return {
+        "message": "Password changed successfully",
+        "access_token": create_access_token(data=claims),
+        "refresh_token": create_refresh_token(data=claims),
+        "token_type": "bearer"
+    }
 
 def forgot_password_service(db: Session, email: str):
     # This service function handles the core logic for the forgot password feature.
@@ -174,11 +348,17 @@ def forgot_password_service(db: Session, email: str):
     # or just a dummy string if we want to be minimal.
     # But let's reuse create_access_token to give a real token back.
 
-    reset_token = create_access_token(data={"sub": user.email, "type": "reset"})
+    # "ver" makes the token single-use: resetting the password bumps token_version
+    reset_token = create_access_token(data={"sub": user.email, "ver": user.token_version or 0, "type": "reset"})
 
-    # In a real application, we would send this token via email.
-    # For this API endpoint, we will return the token in the response so it can be verified.
+    # The token is emailed through the outbox; the worker sends it after the commit
+    enqueue_password_reset_email(db, user.email, reset_token)
+    db.commit()
+    outbox_worker.notify()
 
+    if not RESET_TOKEN_IN_RESPONSE:
+        return {"message": "Password reset email sent"}
+    # Development: also return the token so the flow can be tried without a mailbox
     return {
         "message": "Password reset token generated",
         "reset_token": reset_token
@@ -194,7 +374,7 @@ def logout_service(db: Session):
 
     return {"message": "Logged out successfully"}
 
-def reset_password_service(db: Session, reset_token: str, new_password: str):
+async def reset_password_service(db: Session, reset_token: str, new_password: str):
     """
     Service for resetting password using reset_token from /forgot-password.
     - Decodes token to get email and validate type='reset'
@@ -213,10 +393,12 @@ def reset_password_service(db: Session, reset_token: str, new_password: str):
     except JWTError:
         raise HTTPException(status_code=400, detail="Invalid or expired reset token")
 
-    user = get_user_by_email(db, email)
+    user = await run_in_threadpool(get_user_by_email, db, email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    if payload.get("ver", 0) != (user.token_version or 0):
+        raise HTTPException(status_code=400, detail="Invalid or expired reset token")
 
-    user.hashed_password = hash_password(new_password)
-    db.commit()
+    new_hash = await hash_password_async(new_password)
+    await run_in_threadpool(_store_new_password, db, user, new_hash)
     return {"message": "Password reset successfully"}
@@ -0,0 +1,160 @@
+import os
+import re
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.conversation import Conversation, Message
+from app.utils.metrics import timed
+
+# Approximate token budget for the history sent with each message (summary + recent turns)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+# Rolling summary is capped at this many characters; the oldest lines are dropped first
+SUMMARY_MAX_CHARS = int(os.getenv("SUMMARY_MAX_CHARS", "4000"))
+# Each compacted message contributes at most this many characters to the summary
+SUMMARY_LINE_CHARS = 200
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough rule of thumb for English text: ~4 characters per token
+    return max(1, len(text) // 4)
+
+
+async def _find_conversation(db: AsyncSession, agent_id: int, user_id: int):
+    result = await db.execute(
+        select(Conversation).where(Conversation.agent_id == agent_id, Conversation.user_id == user_id)
+    )
+    return result.scalars().first()
+
+
+async def get_or_create_conversation(db: AsyncSession, agent_id: int, user_id: int) -> Conversation:
+    conversation = await _find_conversation(db, agent_id, user_id)
+    if conversation is None:
+        try:
+            # Savepoint so a concurrent first message for the same pair doesn't abort our transaction
+            async with db.begin_nested():
+                conversation = Conversation(agent_id=agent_id, user_id=user_id, summarized_through_id=0)
+                db.add(conversation)
+            await db.commit()
+        except IntegrityError:
+            conversation = await _find_conversation(db, agent_id, user_id)
+    return conversation
+
+
+async def _window(db: AsyncSession, conversation: Conversation):
+    # Only messages not yet folded into the summary; compaction keeps this within the budget
+    result = await db.execute(
+        select(Message)
+        .where(
+            Message.conversation_id == conversation.id,
+            Message.id > conversation.summarized_through_id
+        )
+        .order_by(Message.id)
+    )
+    return result.scalars().all()
+
+
+@timed("agent.build_input")
+async def build_agent_input(db: AsyncSession, agent_id: int, user_id: int, message: str):
+    """
+    Returns (conversation_id, input_items) for the agent runner:
+    the rolling summary (as a system message), the recent turns and the new user message.
+    The size of the input stays roughly constant no matter how long the conversation is.
+    """
+    conversation = await get_or_create_conversation(db, agent_id, user_id)
+
+    items = []
+    if conversation.summary:
+        items.append({
+            "role": "system",
+            "content": f"Summary of the earlier conversation with this user:\n{conversation.summary}"
+        })
+    for past in await _window(db, conversation):
+        items.append({"role": past.role, "content": past.content})
+    items.append({"role": "user", "content": message})
+    return conversation.id, items
+
+
+def _summary_line(message: Message) -> str:
+    text = re.sub(r"\s+", " ", message.content).strip()
+    if len(text) > SUMMARY_LINE_CHARS:
+        text = text[:SUMMARY_LINE_CHARS].rstrip() + "..."
+    return f"- {message.role}: {text}"
+
+
+async def _compact(db: AsyncSession, conversation: Conversation) -> None:
+    """
+    Folds the oldest turns into the rolling summary until the window fits the budget.
+    The summary is extractive (one shortened line per message) so compaction never
+    costs an extra LLM call.
+    """
+    window = await _window(db, conversation)
+    total = sum(m.token_count for m in window)
+    summary_tokens = estimate_tokens(conversation.summary or "")
+    if total + summary_tokens <= CONTEXT_TOKEN_BUDGET:
+        return
+
+    lines = conversation.summary.splitlines() if conversation.summary else []
+    folded_through = conversation.summarized_through_id
+    # Always keep the latest exchange verbatim
+    for old in window[:-2]:
+        if total + estimate_tokens("\n".join(lines)) <= CONTEXT_TOKEN_BUDGET:
+            break
+        lines.append(_summary_line(old))
+        total -= old.token_count
+        folded_through = old.id
+
+    summary = "\n".join(lines)
+    while len(summary) > SUMMARY_MAX_CHARS and "\n" in summary:
+        summary = summary.split("\n", 1)[1]
+    conversation.summary = summary[-SUMMARY_MAX_CHARS:]
+    conversation.summarized_through_id = folded_through
+
+
+@timed("agent.record_turn")
+async def record_turn(db: AsyncSession, conversation_id: int, user_message: str, assistant_message: str) -> None:
+    """Stores one user/assistant exchange and compacts older turns if needed."""
+    conversation = await db.get(Conversation, conversation_id)
+    if conversation is None:
+        return
+    db.add_all([
+        Message(
+            conversation_id=conversation_id,
+            role="user",
+            content=user_message,
+            token_count=estimate_tokens(user_message)
+        ),
+        Message(
+            conversation_id=conversation_id,
+            role="assistant",
+            content=assistant_message,
+            token_count=estimate_tokens(assistant_message)
+        ),
+    ])
+    await db.flush()
+    await _compact(db, conversation)
+    await db.commit()
+
+
+async def get_history(db: AsyncSession, agent_id: int, user_id: int, before_id: int | None = None, limit: int = 50):
+    """
+    Returns one page of messages, newest first. Pass the returned next_before_id
+    to fetch the previous page.
+    """
+    conversation = await _find_conversation(db, agent_id, user_id)
+    if conversation is None:
+        return {"messages": [], "summary": None, "next_before_id": None}
+
+    query = select(Message).where(Message.conversation_id == conversation.id)
+    if before_id is not None:
+        query = query.where(Message.id < before_id)
+    # Fetch one extra row to know whether an older page exists
+    result = await db.execute(query.order_by(Message.id.desc()).limit(limit + 1))
+    page = result.scalars().all()
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    return {
+        "messages": page,
+        "summary": conversation.summary,
+        "next_before_id": page[-1].id if has_more else None
+    }
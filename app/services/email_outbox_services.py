@@ -0,0 +1,249 @@
+import asyncio
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from config.db import SessionLocal
+from app.models.email_outbox import EmailOutbox
+from app.utils import email_utils
+
+# Run the sender in this process; off by default so only the designated process(es) send mail
+EMAIL_OUTBOX_WORKER = os.getenv("EMAIL_OUTBOX_WORKER", "false").lower() in ("1", "true", "yes")
+# Messages claimed and sent over one connection per round
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "50"))
+# Upper bound on messages per second across the batch (the provider's sending limit)
+EMAIL_RATE_PER_SECOND = float(os.getenv("EMAIL_RATE_PER_SECOND", "10"))
+# Seconds between checks for due rows when nothing wakes the worker (retries, other processes)
+EMAIL_POLL_SECONDS = float(os.getenv("EMAIL_POLL_SECONDS", "5"))
+# Attempts before a message is marked failed
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "8"))
+# Retry delay: base * 2^(attempt-1), capped, with jitter
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "30"))
+EMAIL_RETRY_MAX_SECONDS = float(os.getenv("EMAIL_RETRY_MAX_SECONDS", "3600"))
+# A claimed row whose worker died is picked up again after this many seconds
+EMAIL_CLAIM_SECONDS = float(os.getenv("EMAIL_CLAIM_SECONDS", "300"))
+
+
+def enqueue_email(db: Session, recipient: str, subject: str, html: str, kind: str) -> EmailOutbox:
+    """
+    Adds an email to the outbox in the caller's transaction; it is sent once the caller
+    commits (and is dropped if it rolls back). Call outbox_worker.notify() after the
+    commit to send it right away instead of at the next poll.
+    """
+    row = EmailOutbox(recipient=recipient, subject=subject, html=html, kind=kind)
+    db.add(row)
+    return row
+
+
+def enqueue_verification_email(db: Session, email: str, token: str) -> EmailOutbox:
+    subject, html = email_utils.verification_email(token)
+    return enqueue_email(db, email, subject, html, "verification")
+
+
+def enqueue_password_reset_email(db: Session, email: str, token: str) -> EmailOutbox:
+    subject, html = email_utils.password_reset_email(token)
+    return enqueue_email(db, email, subject, html, "password_reset")
+
+
+def retry_delay(attempts: int) -> float:
+    delay = min(EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), EMAIL_RETRY_MAX_SECONDS)
+    # Jitter so messages that failed together don't all retry together
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _is_permanent(error: Exception) -> bool:
+    # 5xx replies (unknown mailbox, rejected content) won't succeed on a retry.
+    # A refused recipient list carries one error per recipient instead of a code.
+    errors = getattr(error, "recipients", None) or [error]
+    codes = [getattr(e, "code", None) for e in errors]
+    return all(isinstance(code, int) and 500 <= code < 600 for code in codes)
+
+
+def claim_batch(limit: int) -> list:
+    """
+    Marks up to `limit` due rows as "sending" under a fresh claim token and returns them.
+    The UPDATE re-checks the due condition, so concurrent workers (other processes) never
+    claim the same row; rows of a worker that died become due again after EMAIL_CLAIM_SECONDS.
+    """
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+    due = or_(
+        and_(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now),
+        and_(EmailOutbox.status == "sending", EmailOutbox.claimed_until < now),
+    )
+    candidates = (
+        select(EmailOutbox.id)
+        .where(due)
+        .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+        .limit(limit)
+        # Postgres: skip rows another worker is claiming right now (no-op on SQLite)
+        .with_for_update(skip_locked=True)
+    )
+    with SessionLocal() as db:
+        claimed = db.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(candidates.scalar_subquery()), due)
+            .values(status="sending", claim_token=token, claimed_until=now + timedelta(seconds=EMAIL_CLAIM_SECONDS))
+        ).rowcount
+        db.commit()
+        if not claimed:
+            return []
+        rows = db.execute(
+            select(EmailOutbox.id, EmailOutbox.recipient, EmailOutbox.subject, EmailOutbox.html,
+                   EmailOutbox.kind, EmailOutbox.attempts, EmailOutbox.claim_token)
+            .where(EmailOutbox.claim_token == token)
+            .order_by(EmailOutbox.id)
+        ).mappings().all()
+        return [dict(row) for row in rows]
+
+
+def record_results(results: list) -> None:
+    """
+    Stores the outcome of a batch: (row, None) for sent messages, (row, error) otherwise.
+    Only rows still holding our claim token are updated.
+    """
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        for row, error in results:
+            owned = and_(EmailOutbox.id == row["id"], EmailOutbox.claim_token == row["claim_token"])
+            if error is None:
+                values = {"status": "sent", "sent_at": now, "last_error": None}
+            else:
+                attempts = row["attempts"] + 1
+                values = {"attempts": attempts, "last_error": str(error)[:1000]}
+                if _is_permanent(error) or attempts >= EMAIL_MAX_ATTEMPTS:
+                    values["status"] = "failed"
+                else:
+                    values["status"] = "pending"
+                    values["next_attempt_at"] = now + timedelta(seconds=retry_delay(attempts))
+            db.execute(update(EmailOutbox).where(owned).values(claim_token=None, claimed_until=None, **values))
+        db.commit()
+
+
+class EmailOutboxWorker:
+    """
+    Background task draining the outbox: claims a batch of due rows, sends them over one
+    pooled SMTP connection (email_utils.SMTPConnection) paced to EMAIL_RATE_PER_SECOND,
+    records the outcome and repeats. Failed sends are retried with exponential backoff.
+
+    Delivery is at least once: a crash between sending and recording re-sends that batch
+    after EMAIL_CLAIM_SECONDS.
+    """
+
+    def __init__(self):
+        self.smtp = email_utils.SMTPConnection()
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._next_send_at = 0.0
+
+    def start(self) -> None:
+        """Starts the worker on the running event loop (app lifespan)."""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Lets the current batch finish, then closes the SMTP connection."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        try:
+            await self._task
+        finally:
+            self._task = None
+            await self.smtp.close()
+
+    def notify(self) -> None:
+        """Wakes the worker so a just-committed email goes out now. Thread-safe."""
+        if self._loop is None or self._wake is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        except RuntimeError:
+            # Loop closed (shutdown); the row is picked up by the next worker that starts
+            pass
+
+    async def _pace(self) -> None:
+        if EMAIL_RATE_PER_SECOND <= 0:
+            return
+        now = time.monotonic()
+        if self._next_send_at > now:
+            await asyncio.sleep(self._next_send_at - now)
+        self._next_send_at = max(now, self._next_send_at) + 1 / EMAIL_RATE_PER_SECOND
+
+    async def _send_batch(self, batch: list) -> list:
+        results = []
+        for i, row in enumerate(batch):
+            await self._pace()
+            try:
+                await self.smtp.send(email_utils.build_message(row["recipient"], row["subject"], row["html"]))
+                results.append((row, None))
+                self.sent += 1
+            except Exception as e:
+                print(f"[DEBUG] Email {row['id']} ({row['kind']}) to {row['recipient']} failed: {e}")
+                results.append((row, e))
+                if isinstance(e, OSError):
+                    # Connection-level failure (aiosmtplib's connect/disconnect/timeout errors are
+                    # OSErrors too): the rest of the batch would fail the same way.
+                    # A rejected message leaves the session usable and the batch goes on.
+                    await self.smtp.close()
+                    results.extend((rest, e) for rest in batch[i + 1:])
+                    break
+        for row, error in results:
+            if error is not None:
+                if _is_permanent(error) or row["attempts"] + 1 >= EMAIL_MAX_ATTEMPTS:
+                    self.failed += 1
+                else:
+                    self.retried += 1
+        return results
+
+    async def _run(self) -> None:
+        print("[DEBUG] Email outbox worker started")
+        while not self._stopping:
+            # Cleared before looking, so a notify() during the claim isn't lost
+            self._wake.clear()
+            try:
+                batch = await run_in_threadpool(claim_batch, EMAIL_BATCH_SIZE)
+                if batch:
+                    results = await self._send_batch(batch)
+                    await run_in_threadpool(record_results, results)
+                    continue
+                await self.smtp.close_if_idle()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Database hiccup: keep the worker alive and try again at the next poll
+                print(f"[DEBUG] Email outbox worker error: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), EMAIL_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+        print("[DEBUG] Email outbox worker stopped")
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "smtp_connections_opened": self.smtp.connections_opened,
+            "smtp_connected": self.smtp.is_connected,
+        }
+
+
+outbox_worker = EmailOutboxWorker()
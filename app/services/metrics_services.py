@@ -0,0 +1,154 @@
+import hmac
+import os
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from config.db import engine, read_engine
+from app.utils.metrics import registry, install_query_counter
+
+# Serve GET /metrics (Prometheus text format)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# When set, /metrics requires `Authorization: Bearer <METRICS_TOKEN>`
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+# Without a token /metrics answers 403, unless this is on (only where the port isn't reachable from outside)
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "false").lower() in ("1", "true", "yes")
+
+
+def _pool_stats() -> dict:
+    samples = {}
+    for name, bound in (("primary", engine), ("read", read_engine)):
+        if name == "read" and read_engine is engine:
+            continue
+        pool = bound.pool
+        # StaticPool (in-memory SQLite) has no counters
+        for field in ("checkedout", "checkedin", "size"):
+            method = getattr(pool, field, None)
+            if method is not None:
+                samples[(("engine", name), ("state", field))] = method()
+    return samples
+
+
+def register_app_collectors() -> None:
+    """
+    Exposes the stats() the caches, pools and background workers already keep, read at
+    scrape time, and starts counting SQL statements. Called once from the app lifespan.
+    """
+    from app.agents.agent_pool import agent_pool
+    from app.agents.task_agent import agent_queue, router_stats
+    from app.services.agent_services import app_guide_cache
+    from app.services.auth_services import principal_cache
+    from app.services.email_outbox_services import outbox_worker
+    from app.services.rate_limit_services import login_email_lockout, login_ip_lockout
+    from app.services.task_feed_services import task_feed
+    from app.utils.static_assets import frontend_assets
+
+    install_query_counter()
+
+    def caches():
+        return {
+            "principal": principal_cache.stats(),
+            "app_guide": app_guide_cache.stats(),
+            "agent_pool": agent_pool.stats(),
+        }
+
+    registry.register_collector(
+        "app_cache_entries", "Entries held by in-process caches",
+        lambda: {(("cache", name),): stats["entries"] for name, stats in caches().items()}
+    )
+    registry.register_collector(
+        "app_cache_lookups_total", "Cache lookups by result",
+        lambda: {
+            (("cache", name), ("result", result)): stats[key]
+            for name, stats in caches().items() for result, key in (("hit", "hits"), ("miss", "misses"))
+        },
+        kind="counter"
+    )
+    registry.register_collector("db_pool_connections", "Connections of the SQLAlchemy pools", _pool_stats)
+    registry.register_collector(
+        "change_feed_subscribers", "Connected change feed clients",
+        lambda: {(): task_feed.stats()["subscribers"]}
+    )
+    registry.register_collector(
+        "change_feed_events_total", "Change feed events published and clients dropped for falling behind",
+        lambda: {(("event", key),): task_feed.stats()[key] for key in ("published", "dropped")},
+        kind="counter"
+    )
+    registry.register_collector(
+        "email_outbox_messages_total", "Outbox emails sent, scheduled for retry or given up on by this worker",
+        lambda: {(("result", key),): outbox_worker.stats()[key] for key in ("sent", "retried", "failed")},
+        kind="counter"
+    )
+    registry.register_collector(
+        "email_smtp_connections_opened_total", "SMTP sessions opened by the outbox worker",
+        lambda: {(): outbox_worker.stats()["smtp_connections_opened"]},
+        kind="counter"
+    )
+    registry.register_collector(
+        "llm_backend_in_flight", "Model calls in flight per LLM backend",
+        lambda: {(("backend", name),): stats["in_flight"] for name, stats in router_stats().items()}
+    )
+    registry.register_collector(
+        "llm_backend_circuit_state", "Circuit breaker state per LLM backend (1 for the current state)",
+        lambda: {
+            (("backend", name), ("state", state)): int(stats["state"] == state)
+            for name, stats in router_stats().items() for state in ("closed", "open", "half_open")
+        }
+    )
+    registry.register_collector(
+        "llm_backend_latency_p95_seconds", "Recent p95 per LLM backend, the delay before a call is hedged",
+        lambda: {
+            (("backend", name), ("mode", mode)): p95
+            for name, stats in router_stats().items() for mode, p95 in stats["p95"].items() if p95 is not None
+        }
+    )
+    registry.register_collector(
+        "agent_queue_requests", "Chats holding an agent slot (active) or waiting for one (waiting)",
+        lambda: {(("state", key),): agent_queue.stats()[key] for key in ("active", "waiting")}
+    )
+    registry.register_collector(
+        "agent_queue_rejections_total", "Chats turned away with 429 because the queue was full or the wait too long",
+        lambda: {
+            (("reason", reason),): agent_queue.stats()[key]
+            for reason, key in (("queue_full", "rejected"), ("queue_timeout", "timed_out"))
+        },
+        kind="counter"
+    )
+
+    def login_lockouts():
+        return {"email": login_email_lockout.stats(), "ip": login_ip_lockout.stats()}
+
+    registry.register_collector(
+        "login_locked_keys", "Emails and client IPs currently locked out of login",
+        lambda: {(("scope", scope),): stats["locked"] for scope, stats in login_lockouts().items()}
+    )
+    registry.register_collector(
+        "login_lockouts_total", "Lockouts started after repeated failed logins",
+        lambda: {(("scope", scope),): stats["lockouts"] for scope, stats in login_lockouts().items()},
+        kind="counter"
+    )
+    registry.register_collector(
+        "login_rejected_total", "Login attempts answered with 429 during a lockout (no bcrypt work done)",
+        lambda: {(("scope", scope),): stats["rejected"] for scope, stats in login_lockouts().items()},
+        kind="counter"
+    )
+    registry.register_collector(
+        "static_assets_bytes", "Memory held by the preloaded frontend build, with compressed variants",
+        lambda: {(): frontend_assets.stats()["bytes"]}
+    )
+
+
+def check_metrics_access(authorization: Optional[str]) -> None:
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if METRICS_TOKEN:
+        if not hmac.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}"):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    elif not METRICS_PUBLIC:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Set METRICS_TOKEN (or METRICS_PUBLIC=true) to serve metrics"
+        )
+
+
+def render_metrics() -> str:
+    return registry.expose()
@@ -0,0 +1,96 @@
+import math
+import os
+from fastapi import Depends, HTTPException, status
+from app.services.auth_services import get_current_user
+from app.utils.metrics import registry
+from app.utils.principal_cache import CurrentUser
+from app.utils.rate_limiter import FailureLockout, TokenBucketLimiter
+
+# Sustained chat requests allowed per user per minute (0 disables the limit)
+CHAT_RATE_LIMIT_PER_MINUTE = float(os.getenv("CHAT_RATE_LIMIT_PER_MINUTE", "20"))
+# Chat requests a user may send back to back before the per-minute rate applies
+CHAT_RATE_LIMIT_BURST = float(os.getenv("CHAT_RATE_LIMIT_BURST", "10"))
+CHAT_RATE_LIMIT_DB = os.getenv("CHAT_RATE_LIMIT_DB")  # e.g. ./rate_limits.db shared by all workers; unset = per process
+
+# Failed logins per email / per client IP within the window before that email or IP is locked out (0 disables)
+LOGIN_MAX_FAILURES_PER_EMAIL = int(os.getenv("LOGIN_MAX_FAILURES_PER_EMAIL", "5"))
+LOGIN_MAX_FAILURES_PER_IP = int(os.getenv("LOGIN_MAX_FAILURES_PER_IP", "50"))
+LOGIN_FAILURE_WINDOW_SECONDS = float(os.getenv("LOGIN_FAILURE_WINDOW_SECONDS", "900"))
+# First lockout; each further lockout of the same email / IP doubles it, up to the maximum
+LOGIN_LOCKOUT_SECONDS = float(os.getenv("LOGIN_LOCKOUT_SECONDS", "30"))
+LOGIN_LOCKOUT_MAX_SECONDS = float(os.getenv("LOGIN_LOCKOUT_MAX_SECONDS", "3600"))
+
+chat_limiter = TokenBucketLimiter(
+    rate=CHAT_RATE_LIMIT_PER_MINUTE / 60,
+    burst=CHAT_RATE_LIMIT_BURST,
+    db_path=CHAT_RATE_LIMIT_DB
+)
+
+login_email_lockout = FailureLockout(
+    LOGIN_MAX_FAILURES_PER_EMAIL, LOGIN_FAILURE_WINDOW_SECONDS, LOGIN_LOCKOUT_SECONDS, LOGIN_LOCKOUT_MAX_SECONDS
+)
+login_ip_lockout = FailureLockout(
+    LOGIN_MAX_FAILURES_PER_IP, LOGIN_FAILURE_WINDOW_SECONDS, LOGIN_LOCKOUT_SECONDS, LOGIN_LOCKOUT_MAX_SECONDS
+)
+
+chat_rate_limited = registry.counter(
+    "chat_rate_limited_total", "Chat requests answered with 429 by the per-user rate limit"
+)
+
+
+def limit_chat_rate(current_user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
+    """Dependency for the chat endpoints: the authenticated user, or 429 + Retry-After over the limit."""
+    retry_after = chat_limiter.acquire(f"chat:{current_user.id}")
+    if retry_after > 0:
+        chat_rate_limited.inc()
+        print(f"[DEBUG] Chat rate limit hit by user {current_user.id}; retry in {retry_after:.1f}s")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many chat messages. Please wait a moment and try again.",
+            headers={"Retry-After": str(max(math.ceil(retry_after), 1))}
+        )
+    return current_user
+
+
+def _login_email_key(email: str) -> str:
+    return email.strip().lower()
+
+
+def _login_rejected(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many failed login attempts. Please try again later.",
+        headers={"Retry-After": str(max(math.ceil(retry_after), 1))}
+    )
+
+
+def begin_login_attempt(email: str, client_ip: str | None) -> None:
+    """
+    Reserves a login attempt for the email and the client IP before any bcrypt work, or raises
+    429 + Retry-After while either is locked out or already has as many attempts running as
+    it has failures left. Every successful call must be paired with end_login_attempt.
+    """
+    retry_after = login_email_lockout.acquire(_login_email_key(email))
+    if retry_after > 0:
+        raise _login_rejected(retry_after)
+    if client_ip:
+        retry_after = login_ip_lockout.acquire(client_ip)
+        if retry_after > 0:
+            login_email_lockout.release(_login_email_key(email), failed=False)
+            raise _login_rejected(retry_after)
+
+
+def end_login_attempt(email: str, client_ip: str | None, failed: bool) -> None:
+    """Releases the reservations; `failed` counts a wrong email/password, a success clears the email's failures."""
+    lockout = login_email_lockout.release(_login_email_key(email), failed)
+    if lockout:
+        print(f"[DEBUG] Login locked for {lockout:.0f}s after repeated failures for {email}")
+    if client_ip:
+        lockout = login_ip_lockout.release(client_ip, failed)
+        if lockout:
+            print(f"[DEBUG] Login locked for {lockout:.0f}s after repeated failures from {client_ip}")
+
+
+def record_login_success(email: str) -> None:
+    # The IP's failures stay: one valid account must not reset an attacker's count
+    login_email_lockout.clear(_login_email_key(email))
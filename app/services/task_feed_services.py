@@ -0,0 +1,112 @@
+import os
+import time
+from typing import Optional
+
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+
+from config.db import ReadSessionLocal
+from app.models.task_counter import TaskCounter
+from app.utils.change_feed import ChangeHub
+
+# Events kept per user so reconnecting clients can resume with ?since=<version>
+CHANGE_FEED_BUFFER = int(os.getenv("CHANGE_FEED_BUFFER", "256"))
+# Undelivered events a client may fall behind before it is disconnected
+CHANGE_FEED_QUEUE_SIZE = int(os.getenv("CHANGE_FEED_QUEUE_SIZE", "100"))
+# Users whose recent events are kept for resuming
+CHANGE_FEED_MAX_USERS = int(os.getenv("CHANGE_FEED_MAX_USERS", "10000"))
+# Idle connections get a ping this often so proxies don't close them
+CHANGE_FEED_HEARTBEAT_SECONDS = float(os.getenv("CHANGE_FEED_HEARTBEAT_SECONDS", "25"))
+# How long a live event may wait for a missing earlier version (published out of order by a
+# concurrent request) before the gap is treated as a write this worker never saw
+CHANGE_FEED_GAP_GRACE_SECONDS = float(os.getenv("CHANGE_FEED_GAP_GRACE_SECONDS", "1"))
+
+task_feed = ChangeHub(
+    buffer_size=CHANGE_FEED_BUFFER,
+    queue_size=CHANGE_FEED_QUEUE_SIZE,
+    max_users=CHANGE_FEED_MAX_USERS
+)
+
+# Fields sent for created tasks; updates only carry the id and the fields that changed
+TASK_EVENT_FIELDS = ("id", "title", "description", "task_type", "status", "created_at")
+
+
+def task_event_fields(task) -> dict:
+    get = task.get if isinstance(task, dict) else lambda name: getattr(task, name)
+    return {name: get(name) for name in TASK_EVENT_FIELDS}
+
+
+def publish_task_change(user_id: int, version: int, change: str, **payload) -> None:
+    """
+    Pushes a change event to the user's live feeds. Call after the commit, with the version
+    returned by task_services._bump_task_counters.
+    - "created": tasks=[full task]
+    - "updated": tasks=[{"id", <changed fields>}]
+    - "deleted": ids=[task ids]
+    """
+    task_feed.publish(user_id, {"type": change, "version": version, **payload})
+
+
+def _current_version(user_id: int) -> int:
+    # Short-lived session: the feed connection itself must not hold a pooled connection
+    with ReadSessionLocal() as db:
+        version = db.execute(select(TaskCounter.version).where(TaskCounter.user_id == user_id)).scalar()
+        return version or 0
+
+
+async def task_change_frames(user_id: int, since: Optional[int] = None):
+    """
+    Async generator of change feed frames for one connection:
+    - "hello": {"version"}, the user's current version
+    - the buffered events after `since` (if given), then live events as they happen
+    - "reset": the events after `since` are no longer available, or a live version was skipped
+      (written through another worker); refetch and resume from "version"
+    - "ping": heartbeat while idle
+    - "overflow": the client fell too far behind and is being disconnected; reconnect with ?since=
+    """
+    current_version = await run_in_threadpool(_current_version, user_id)
+    subscription, backlog = task_feed.subscribe(user_id, since, current_version)
+    try:
+        yield {"type": "hello", "version": current_version}
+        if backlog is None:
+            yield {"type": "reset", "version": current_version}
+            backlog = []
+        last = current_version
+        for event in backlog:
+            yield event
+            last = max(last, event["version"])
+
+        # Live events must continue the version sequence; early ones wait here for the gap to fill
+        pending = {}
+        gap_deadline = None
+        next_ping = time.monotonic() + CHANGE_FEED_HEARTBEAT_SECONDS
+        while True:
+            if subscription.dropped:
+                yield {"type": "overflow"}
+                return
+            wake_at = next_ping if gap_deadline is None else min(next_ping, gap_deadline)
+            event = await subscription.next(max(0.0, wake_at - time.monotonic()))
+            if event is not None and event["version"] > last:
+                pending[event["version"]] = event
+            while last + 1 in pending:
+                last += 1
+                yield pending.pop(last)
+            if not pending:
+                gap_deadline = None
+            elif gap_deadline is None:
+                gap_deadline = time.monotonic() + CHANGE_FEED_GAP_GRACE_SECONDS
+            elif time.monotonic() >= gap_deadline:
+                last = max(pending)
+                pending.clear()
+                gap_deadline = None
+                yield {"type": "reset", "version": last}
+            if event is None and time.monotonic() >= next_ping:
+                # Idle: a write through another worker would otherwise go unnoticed until the next local one
+                version = await run_in_threadpool(_current_version, user_id)
+                if version > last and not pending:
+                    last = version
+                    yield {"type": "reset", "version": last}
+                yield {"type": "ping"}
+                next_ping = time.monotonic() + CHANGE_FEED_HEARTBEAT_SECONDS
+    finally:
+        task_feed.unsubscribe(subscription)
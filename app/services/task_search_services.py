@@ -0,0 +1,199 @@
+import html
+import re
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models.task import TaskStatus
+from app.models.user import User
+from app.utils.metrics import timed
+
+# Private-use characters mark the matches inside the database; the text is HTML-escaped
+# afterwards and the markers become <mark> tags, so task content can't inject markup
+_START, _STOP = "\ue000", "\ue001"
+
+# Words (letters/digits/underscore) of the query; everything else, including FTS syntax, is dropped
+_TERM = re.compile(r"\w+", re.UNICODE)
+# Ignore absurdly long queries instead of building huge MATCH expressions
+_MAX_TERMS = 16
+
+# Which index detect_search_backend() found: "fts5", "tsvector" or "like" (no index, substring match)
+SEARCH_BACKEND = "like"
+
+# Applied by migrations 0008 and 0012 (app/migrations/versions.py)
+SQLITE_SEARCH_DDL = [
+    # External-content table: the text lives in tasks, the index in tasks_fts. user_id is
+    # indexed too, so a MATCH on it keeps the search inside one user's tasks
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5("
+    "title, description, user_id, content='tasks', content_rowid='id', "
+    "tokenize='porter unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN "
+    "INSERT INTO tasks_fts (rowid, title, description, user_id) "
+    "VALUES (new.id, new.title, new.description, new.user_id); END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN "
+    "INSERT INTO tasks_fts (tasks_fts, rowid, title, description, user_id) "
+    "VALUES ('delete', old.id, old.title, old.description, old.user_id); END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description, user_id ON tasks BEGIN "
+    "INSERT INTO tasks_fts (tasks_fts, rowid, title, description, user_id) "
+    "VALUES ('delete', old.id, old.title, old.description, old.user_id); "
+    "INSERT INTO tasks_fts (rowid, title, description, user_id) "
+    "VALUES (new.id, new.title, new.description, new.user_id); END",
+]
+
+# Drops the index and its triggers, so SQLITE_SEARCH_DDL can recreate them with new columns
+SQLITE_SEARCH_DROP = [
+    "DROP TRIGGER IF EXISTS tasks_fts_insert",
+    "DROP TRIGGER IF EXISTS tasks_fts_delete",
+    "DROP TRIGGER IF EXISTS tasks_fts_update",
+    "DROP TABLE IF EXISTS tasks_fts",
+]
+
+POSTGRES_SEARCH_DDL = [
+    # Generated column: Postgres keeps it in sync on every insert/update, no triggers needed
+    "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_tasks_search_vector ON tasks USING GIN (search_vector)",
+]
+
+
+def detect_search_backend(bind) -> str:
+    """
+    Picks the search implementation from what the migrations created (one catalog query):
+    SQLite: the FTS5 table tasks_fts, kept in sync by triggers. Postgres: the weighted
+    tsvector column tasks.search_vector with a GIN index. Otherwise (or if the SQLite
+    build lacks FTS5) search falls back to a LIKE scan.
+    """
+    global SEARCH_BACKEND
+    dialect = bind.dialect.name
+    with bind.connect() as conn:
+        if dialect == "sqlite":
+            found = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'tasks_fts'")).first()
+            SEARCH_BACKEND = "fts5" if found else "like"
+        elif dialect == "postgresql":
+            found = conn.execute(text(
+                "SELECT 1 FROM information_schema.columns WHERE table_name = 'tasks' AND column_name = 'search_vector'"
+            )).first()
+            SEARCH_BACKEND = "tsvector" if found else "like"
+        else:
+            SEARCH_BACKEND = "like"
+    return SEARCH_BACKEND
+
+
+def _terms(query: str) -> list:
+    return _TERM.findall(query)[:_MAX_TERMS]
+
+
+def _fts5_match(user_id: int, terms: list) -> str:
+    # Only this user's rows; every term must match in the title or description (implicit AND),
+    # the last one as a prefix for search-as-you-type
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return f'user_id : "{user_id}" AND {{title description}} : ({" ".join(quoted)})'
+
+
+def _tsquery(terms: list) -> str:
+    return " & ".join(terms) + ":*"
+
+
+def _render(marked: str | None) -> str | None:
+    if marked is None:
+        return None
+    return html.escape(marked).replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+
+def _search_fts5(db: Session, user_id: int, terms: list, limit: int, offset: int):
+    return db.execute(
+        text(
+            "SELECT t.id, t.title, t.status, t.task_type, t.created_at, "
+            "highlight(tasks_fts, 0, :start, :stop) AS title_highlight, "
+            "snippet(tasks_fts, 1, :start, :stop, '…', 24) AS description_snippet, "
+            # bm25 is lower-is-better; title matches weigh more than description matches
+            "-bm25(tasks_fts, 10.0, 1.0, 0.0) AS rank "
+            "FROM tasks_fts JOIN tasks t ON t.id = tasks_fts.rowid "
+            "WHERE tasks_fts MATCH :match AND t.user_id = :user_id "
+            "ORDER BY rank DESC, t.id LIMIT :limit OFFSET :offset"
+        ),
+        {"start": _START, "stop": _STOP, "match": _fts5_match(user_id, terms), "user_id": user_id,
+         "limit": limit, "offset": offset}
+    ).mappings().all()
+
+
+def _search_tsvector(db: Session, user_id: int, terms: list, limit: int, offset: int):
+    options = f'StartSel="{_START}", StopSel="{_STOP}"'
+    return db.execute(
+        text(
+            "SELECT t.id, t.title, t.status, t.task_type, t.created_at, "
+            "ts_headline('english', t.title, q, :title_options) AS title_highlight, "
+            "CASE WHEN t.description IS NULL THEN NULL "
+            "ELSE ts_headline('english', t.description, q, :snippet_options) END AS description_snippet, "
+            "ts_rank_cd(t.search_vector, q) AS rank "
+            "FROM tasks t, to_tsquery('english', :query) AS q "
+            "WHERE t.user_id = :user_id AND t.search_vector @@ q "
+            "ORDER BY rank DESC, t.id LIMIT :limit OFFSET :offset"
+        ),
+        {"title_options": options + ", HighlightAll=true",
+         "snippet_options": options + ", MaxWords=35, MinWords=15",
+         "query": _tsquery(terms), "user_id": user_id, "limit": limit, "offset": offset}
+    ).mappings().all()
+
+
+def _mark(value: str | None, terms: list) -> str | None:
+    if value is None:
+        return None
+    pattern = re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE)
+    return pattern.sub(lambda m: f"{_START}{m.group(0)}{_STOP}", value)
+
+
+def _search_like(db: Session, user_id: int, terms: list, limit: int, offset: int):
+    # No index: every term must appear in the title or description
+    clauses = []
+    params = {"user_id": user_id, "limit": limit, "offset": offset}
+    for i, term in enumerate(terms):
+        params[f"term{i}"] = f"%{term}%"
+        clauses.append(f"(t.title LIKE :term{i} OR t.description LIKE :term{i})")
+    rows = db.execute(
+        text(
+            "SELECT t.id, t.title, t.status, t.task_type, t.created_at, t.description "
+            f"FROM tasks t WHERE t.user_id = :user_id AND {' AND '.join(clauses)} "
+            "ORDER BY t.created_at DESC, t.id LIMIT :limit OFFSET :offset"
+        ),
+        params
+    ).mappings().all()
+    return [
+        {**row, "title_highlight": _mark(row["title"], terms),
+         "description_snippet": _mark(row["description"], terms), "rank": 0.0}
+        for row in rows
+    ]
+
+
+_SEARCHERS = {"fts5": _search_fts5, "tsvector": _search_tsvector, "like": _search_like}
+
+
+@timed("task_services.search_tasks")
+def search_tasks(db: Session, user: User, query: str, limit: int = 20, offset: int = 0) -> dict:
+    """
+    Ranked full-text search over the user's task titles and descriptions.
+    All words must match, the last one as a prefix ("meet" finds "meeting"). Returns
+    {"results": [...], "next_offset": int | None}; highlights are HTML-escaped with <mark> tags.
+    """
+    terms = _terms(query)
+    if not terms:
+        return {"results": [], "next_offset": None}
+
+    # One extra row tells us whether there is a next page
+    rows = _SEARCHERS[SEARCH_BACKEND](db, user.id, terms, limit + 1, offset)
+    results = [
+        {
+            "id": row["id"],
+            "title": row["title"],
+            "status": TaskStatus[row["status"]],
+            "task_type": row["task_type"],
+            "created_at": row["created_at"],
+            "title_highlight": _render(row["title_highlight"]),
+            "description_snippet": _render(row["description_snippet"]),
+            "rank": row["rank"],
+        }
+        for row in rows[:limit]
+    ]
+    return {"results": results, "next_offset": offset + limit if len(rows) > limit else None}
@@ -1,9 +1,111 @@
+import base64
+import binascii
+import json
+import os
+from datetime import datetime
+from sqlalchemy import func, or_, and_, insert, update, delete, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from app.models.task import Task, TaskStatus
+from app.models.task_counter import TaskCounter
+from app.models.agent import Agent
+from app.models.conversation import Conversation, Message
 from app.models.user import User
-from app.schemas.task_schema import TaskCreate, TaskUpdate, TaskStatusUpdate, TaskTypeUpdate
+from app.schemas.task_schema import (
+    TaskCreate,
+    TaskUpdate,
+    TaskStatusUpdate,
+    TaskTypeUpdate,
+    TaskBulkCreate,
+    TaskBulkStatusUpdate,
+    TaskBulkDelete
+)
 from fastapi import HTTPException, status
+from app.agents.agent_pool import invalidate_task_agent
+from app.services.task_feed_services import publish_task_change, task_event_fields
+from app.utils.metrics import timed
 
+# Serve /tasks/summary from task_counters instead of a GROUP BY over the user's tasks
+TASK_SUMMARY_COUNTERS = os.getenv("TASK_SUMMARY_COUNTERS", "true").lower() in ("1", "true", "yes")
+
+# TaskStatus -> TaskCounter column
+_COUNTER_COLUMNS = {
+    TaskStatus.PENDING: "pending",
+    TaskStatus.IN_PROGRESS: "in_progress",
+    TaskStatus.COMPLETED: "completed",
+}
+
+
+@timed("task_services.count_tasks_by_status")
+def count_tasks_by_status(db: Session, user_id: int) -> dict:
+    """One GROUP BY over the (user_id, status) index instead of loading every task."""
+    rows = (
+        db.query(Task.status, func.count(Task.id))
+        .filter(Task.user_id == user_id)
+        .group_by(Task.status)
+        .all()
+    )
+    counts = {column: 0 for column in _COUNTER_COLUMNS.values()}
+    for task_status, count in rows:
+        counts[_COUNTER_COLUMNS[TaskStatus(task_status)]] = count
+    return counts
+
+
+def _bump_task_counters(db: Session, user_id: int, changes: dict | None = None) -> int:
+    """
+    Records a change to the user's tasks inside the current transaction: bumps the change
+    version (the ETag of the task reads and the version of change feed events) and applies
+    {TaskStatus: delta} to the counts. Returns the new version.
+    Every function that writes tasks must call it.
+    Must be called after the task change has been flushed: if the row doesn't exist yet it
+    is seeded from a GROUP BY that already includes the change.
+    """
+    now = datetime.utcnow()
+    values = {TaskCounter.version: TaskCounter.version + 1, TaskCounter.updated_at: now}
+    for task_status, delta in (changes or {}).items():
+        if delta:
+            column = getattr(TaskCounter, _COUNTER_COLUMNS[task_status])
+            values[column] = column + delta
+    bump = (
+        update(TaskCounter)
+        .where(TaskCounter.user_id == user_id)
+        .values(values)
+        .returning(TaskCounter.version)
+        .execution_options(synchronize_session=False)
+    )
+    version = db.execute(bump).scalar_one_or_none()
+    if version is not None:
+        return version
+
+    try:
+        # Savepoint so a concurrent first write for the same user doesn't abort our transaction
+        with db.begin_nested():
+            db.add(TaskCounter(user_id=user_id, version=1, updated_at=now, **count_tasks_by_status(db, user_id)))
+        return 1
+    except IntegrityError:
+        return db.execute(bump).scalar_one()
+
+
+@timed("task_services.get_task_version")
+def get_task_version(db: Session, user: User):
+    """
+    (version, updated_at) of the user's tasks: a primary-key lookup, used to answer
+    conditional GETs without running the actual query. (0, None) until the first write.
+    """
+    row = db.execute(
+        select(TaskCounter.version, TaskCounter.updated_at).where(TaskCounter.user_id == user.id)
+    ).first()
+    return (row.version, row.updated_at) if row is not None else (0, None)
+
+
+def _agent_fields(title: str, description: str | None) -> dict:
+    # Every task gets an agent automatically
+    return {
+        "agent_name": f"{title} Assistant",
+        "purpose": f"Help with task: {title}. {description or 'No description provided'}",
+    }
+
+@timed("task_services.create_task")
 def create_task(db: Session, user: User, task_data: TaskCreate):
     new_task = Task(
         title=task_data.title,
@@ -11,27 +113,101 @@ def create_task(db: Session, user: User, task_data: TaskCreate):
         task_type=task_data.task_type,
         user_id=user.id
     )
+    # The agent is saved through the relationship cascade, in the same flush and commit
+    new_task.agent = Agent(**_agent_fields(task_data.title, task_data.description))
     db.add(new_task)
+    db.flush()
+    version = _bump_task_counters(db, user.id, {TaskStatus.PENDING: 1})
     db.commit()
     db.refresh(new_task)
 
-    # Create an agent for this task automatically
-    from app.models.agent import Agent
-
-    agent = Agent(
-        agent_name=f"{task_data.title} Assistant",
-        purpose=f"Help with task: {task_data.title}. {task_data.description or 'No description provided'}",
-        task_id=new_task.id
-    )
-    db.add(agent)
-    db.commit()
-    db.refresh(agent)
-
+    publish_task_change(user.id, version, "created", tasks=[task_event_fields(new_task)])
     return new_task
 
+@timed("task_services.get_user_tasks")
 def get_user_tasks(db: Session, user: User, skip: int = 0, limit: int = 100):
     return db.query(Task).filter(Task.user_id == user.id).offset(skip).limit(limit).all()
 
+# Fields a client may request with ?fields= (id, created_at are always included for the cursor)
+TASK_LIST_FIELDS = ("id", "title", "description", "task_type", "status", "user_id", "created_at")
+
+
+def encode_cursor(task) -> str:
+    """Opaque cursor pointing just after `task` in (created_at, id) order."""
+    raw = json.dumps([task.created_at.isoformat(), task.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, task_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(task_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+@timed("task_services.list_tasks")
+def list_tasks(
+    db: Session,
+    user: User,
+    limit: int = 100,
+    cursor: str | None = None,
+    skip: int = 0,
+    status_filter: TaskStatus | None = None,
+    task_type: str | None = None,
+    fields: list[str] | None = None
+):
+    """
+    Returns (rows, next_cursor) for one page of the user's tasks in (created_at, id) order.
+
+    - cursor: value returned by the previous page; the page starts right after it, so the cost
+      doesn't grow with depth and rows inserted meanwhile don't shift the page boundaries
+    - skip: legacy offset, only used when no cursor is given
+    - status_filter / task_type: served by the matching (user_id, <filter>, created_at, id) index
+    - fields: load only these columns (e.g. leave out the description text); rows are then
+      plain mappings instead of Task objects
+    """
+    if fields:
+        unknown = set(fields) - set(TASK_LIST_FIELDS)
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+            )
+        columns = [getattr(Task, name) for name in TASK_LIST_FIELDS if name in fields or name in ("id", "created_at")]
+        query = db.query(*columns)
+    else:
+        query = db.query(Task)
+
+    query = query.filter(Task.user_id == user.id)
+    if status_filter is not None:
+        query = query.filter(Task.status == TaskStatus(status_filter.value))
+    if task_type is not None:
+        query = query.filter(Task.task_type == task_type)
+
+    query = query.order_by(Task.created_at, Task.id)
+    if cursor:
+        after_created_at, after_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Task.created_at > after_created_at,
+            and_(Task.created_at == after_created_at, Task.id > after_id)
+        ))
+    elif skip:
+        query = query.offset(skip)
+
+    # One extra row tells us whether there is a next page
+    rows = query.limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    rows = rows[:limit]
+    if fields:
+        rows = [dict(row._mapping) for row in rows]
+    return rows, next_cursor
+
+@timed("task_services.get_task_by_id")
 def get_task_by_id(db: Session, user: User, task_id: int):
     task = db.query(Task).filter(Task.id == task_id, Task.user_id == user.id).first()
     if not task:
@@ -41,49 +217,224 @@ def get_task_by_id(db: Session, user: User, task_id: int):
         )
     return task
 
+@timed("task_services.update_task")
 def update_task(db: Session, user: User, task_id: int, task_data: TaskUpdate):
     task = get_task_by_id(db, user, task_id)
 
+    diff = {}
     if task_data.title is not None:
-        task.title = task_data.title
+        task.title = diff["title"] = task_data.title
     if task_data.description is not None:
-        task.description = task_data.description
+        task.description = diff["description"] = task_data.description
 
+    db.flush()
+    version = _bump_task_counters(db, user.id)
     db.commit()
     db.refresh(task)
+    # The pooled agent's instructions embed the title and description
+    invalidate_task_agent(task_id)
+    publish_task_change(user.id, version, "updated", tasks=[{"id": task_id, **diff}])
     return task
 
+@timed("task_services.update_task_status")
 def update_task_status(db: Session, user: User, task_id: int, status_data: TaskStatusUpdate):
     task = get_task_by_id(db, user, task_id)
-    task.status = status_data.status
+    old_status = TaskStatus(task.status)
+    new_status = TaskStatus(status_data.status.value)
+    task.status = new_status
+    version = None
+    if new_status != old_status:
+        db.flush()
+        version = _bump_task_counters(db, user.id, {old_status: -1, new_status: 1})
     db.commit()
     db.refresh(task)
+    if version is not None:
+        publish_task_change(user.id, version, "updated", tasks=[{"id": task_id, "status": new_status}])
     return task
 
+@timed("task_services.update_task_type")
 def update_task_type(db: Session, user: User, task_id: int, type_data: TaskTypeUpdate):
     task = get_task_by_id(db, user, task_id)
     task.task_type = type_data.task_type
+    db.flush()
+    version = _bump_task_counters(db, user.id)
     db.commit()
     db.refresh(task)
+    publish_task_change(user.id, version, "updated", tasks=[{"id": task_id, "task_type": task.task_type}])
     return task
 
+@timed("task_services.delete_task")
 def delete_task(db: Session, user: User, task_id: int):
     task = get_task_by_id(db, user, task_id)
+    task_status = TaskStatus(task.status)
     db.delete(task)
+    db.flush()
+    version = _bump_task_counters(db, user.id, {task_status: -1})
     db.commit()
+    invalidate_task_agent(task_id)
+    publish_task_change(user.id, version, "deleted", ids=[task_id])
     return {"message": "Task deleted successfully"}
 
+@timed("task_services.get_task_summary")
 def get_task_summary(db: Session, user: User):
-    tasks = db.query(Task).filter(Task.user_id == user.id).all()
-
-    total = len(tasks)
-    pending = sum(1 for t in tasks if t.status == TaskStatus.PENDING)
-    in_progress = sum(1 for t in tasks if t.status == TaskStatus.IN_PROGRESS)
-    completed = sum(1 for t in tasks if t.status == TaskStatus.COMPLETED)
+    counter = db.get(TaskCounter, user.id) if TASK_SUMMARY_COUNTERS else None
+    if counter is not None:
+        counts = {column: getattr(counter, column) for column in _COUNTER_COLUMNS.values()}
+    else:
+        # No counter row until the user's first write; fall back to the aggregate
+        counts = count_tasks_by_status(db, user.id)
 
     return {
-        "total_tasks": total,
-        "pending": pending,
-        "in_progress": in_progress,
-        "completed": completed
+        "total_tasks": sum(counts.values()),
+        "pending": counts["pending"],
+        "in_progress": counts["in_progress"],
+        "completed": counts["completed"]
     }
+
+
+# ---------------------------------------------------------------------------
+# Bulk operations: one transaction and a handful of multi-row statements per request
+# ---------------------------------------------------------------------------
+
+# Stay well below SQLite's bound-parameter limit in IN (...) lists
+_CHUNK_SIZE = 500
+
+
+def _chunks(items: list, size: int = _CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _bulk_response(results: list) -> dict:
+    succeeded = sum(1 for r in results if r["ok"])
+    return {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
+
+
+def _owned_task_statuses(db: Session, user: User, ids: list) -> dict:
+    """{task_id: TaskStatus} for the ids that exist and belong to the user."""
+    owned = {}
+    for chunk in _chunks(ids):
+        rows = db.execute(
+            select(Task.id, Task.status).where(Task.user_id == user.id, Task.id.in_(chunk))
+        ).all()
+        owned.update({task_id: TaskStatus(task_status) for task_id, task_status in rows})
+    return owned
+
+
+@timed("task_services.bulk_create_tasks")
+def bulk_create_tasks(db: Session, user: User, bulk_data: TaskBulkCreate):
+    """
+    Creates many tasks (and their agents) with two executemany INSERTs in one transaction.
+    Results are returned in request order; items with a blank title are rejected individually.
+    """
+    results = []
+    task_rows = []
+    now = datetime.utcnow()
+    for item in bulk_data.tasks:
+        if not item.title or not item.title.strip():
+            results.append({"id": None, "ok": False, "error": "Title is required"})
+            continue
+        results.append({"id": None, "ok": True, "error": None})
+        task_rows.append({
+            "title": item.title,
+            "description": item.description,
+            "task_type": item.task_type,
+            "status": TaskStatus.PENDING,
+            "created_at": now,
+            "user_id": user.id,
+        })
+
+    if task_rows:
+        new_ids = db.execute(
+            insert(Task).returning(Task.id, sort_by_parameter_order=True),
+            task_rows
+        ).scalars().all()
+        db.execute(
+            insert(Agent),
+            [
+                {**_agent_fields(row["title"], row["description"]), "task_id": task_id, "created_at": now}
+                for row, task_id in zip(task_rows, new_ids)
+            ]
+        )
+        version = _bump_task_counters(db, user.id, {TaskStatus.PENDING: len(new_ids)})
+        db.commit()
+
+        ids = iter(new_ids)
+        for result in results:
+            if result["ok"]:
+                result["id"] = next(ids)
+        publish_task_change(user.id, version, "created", tasks=[
+            task_event_fields({**row, "id": task_id}) for row, task_id in zip(task_rows, new_ids)
+        ])
+
+    return _bulk_response(results)
+
+
+@timed("task_services.bulk_update_task_status")
+def bulk_update_task_status(db: Session, user: User, bulk_data: TaskBulkStatusUpdate):
+    """Sets the status of many tasks with one UPDATE per chunk; unknown ids are reported as failed."""
+    ids = list(dict.fromkeys(bulk_data.ids))
+    new_status = TaskStatus(bulk_data.status.value)
+    owned = _owned_task_statuses(db, user, ids)
+
+    changed = [task_id for task_id, old_status in owned.items() if old_status != new_status]
+    for chunk in _chunks(changed):
+        db.execute(
+            update(Task)
+            .where(Task.user_id == user.id, Task.id.in_(chunk))
+            .values(status=new_status)
+        )
+
+    version = None
+    if changed:
+        changes = {new_status: len(changed)}
+        for task_id in changed:
+            changes[owned[task_id]] = changes.get(owned[task_id], 0) - 1
+        version = _bump_task_counters(db, user.id, changes)
+    db.commit()
+    if version is not None:
+        publish_task_change(user.id, version, "updated", tasks=[
+            {"id": task_id, "status": new_status} for task_id in changed
+        ])
+
+    return _bulk_response([
+        {"id": task_id, "ok": task_id in owned, "error": None if task_id in owned else "Task not found"}
+        for task_id in ids
+    ])
+
+
+@timed("task_services.bulk_delete_tasks")
+def bulk_delete_tasks(db: Session, user: User, bulk_data: TaskBulkDelete):
+    """
+    Deletes many tasks with their agents and chat history in one transaction.
+    The ORM cascades are bypassed, so dependent rows are deleted explicitly, children first.
+    """
+    ids = list(dict.fromkeys(bulk_data.ids))
+    owned = _owned_task_statuses(db, user, ids)
+    owned_ids = list(owned)
+
+    for chunk in _chunks(owned_ids):
+        agent_ids = select(Agent.id).where(Agent.task_id.in_(chunk))
+        conversation_ids = select(Conversation.id).where(Conversation.agent_id.in_(agent_ids))
+        db.execute(delete(Message).where(Message.conversation_id.in_(conversation_ids)))
+        db.execute(delete(Conversation).where(Conversation.agent_id.in_(agent_ids)))
+        db.execute(delete(Agent).where(Agent.task_id.in_(chunk)))
+        db.execute(delete(Task).where(Task.user_id == user.id, Task.id.in_(chunk)))
+
+    version = None
+    if owned:
+        changes = {}
+        for task_status in owned.values():
+            changes[task_status] = changes.get(task_status, 0) - 1
+        version = _bump_task_counters(db, user.id, changes)
+    db.commit()
+
+    for task_id in owned_ids:
+        invalidate_task_agent(task_id)
+    if version is not None:
+        publish_task_change(user.id, version, "deleted", ids=owned_ids)
+
+    return _bulk_response([
+        {"id": task_id, "ok": task_id in owned, "error": None if task_id in owned else "Task not found"}
+        for task_id in ids
+    ])
@@ -0,0 +1,121 @@
+import asyncio
+import bisect
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+class Subscription:
+    """
+    One connected client. Events are handed over through a bounded asyncio.Queue on the
+    client's event loop; when the client falls `queue_size` events behind it is dropped
+    (`dropped` is set) rather than letting the queue grow.
+    """
+
+    def __init__(self, user_id: int, queue_size: int):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+    def _offer(self, event: Dict[str, Any]) -> None:
+        # Runs on the subscriber's loop
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped = True
+
+    async def next(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Next event, or None if nothing arrived within `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class ChangeHub:
+    """
+    In-process publish/subscribe of per-user change events.
+
+    Every event carries the user's change `version`. The last `buffer_size` events of the
+    `max_users` most recently active users are kept, so a reconnecting client can ask for
+    everything after the version it last saw. Only writes handled by this process are
+    seen; a gap in the buffered versions makes subscribe() ask the client to refetch.
+
+    publish() is thread-safe and may be called from sync endpoints in the threadpool.
+    """
+
+    def __init__(self, buffer_size: int = 256, queue_size: int = 100, max_users: int = 10000):
+        self.buffer_size = buffer_size
+        self.queue_size = queue_size
+        self.max_users = max_users
+        self.published = 0
+        self.dropped = 0
+        self._buffers: "OrderedDict[int, List[Dict[str, Any]]]" = OrderedDict()
+        self._subscribers: Dict[int, set] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, user_id: int, event: Dict[str, Any]) -> None:
+        with self._lock:
+            buffer = self._buffers.setdefault(user_id, [])
+            self._buffers.move_to_end(user_id)
+            # Concurrent writers may publish out of order; keep the buffer sorted by version
+            versions = [e["version"] for e in buffer]
+            buffer.insert(bisect.bisect_right(versions, event["version"]), event)
+            del buffer[:-self.buffer_size]
+            while len(self._buffers) > self.max_users:
+                self._buffers.popitem(last=False)
+            subscribers = list(self._subscribers.get(user_id, ()))
+            self.published += 1
+
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._offer, event)
+            except RuntimeError:
+                # The subscriber's loop is closed; it will be unsubscribed by its own finally
+                pass
+
+    def subscribe(self, user_id: int, since: Optional[int], current_version: int):
+        """
+        Registers a subscription (must be called on the subscriber's event loop).
+        Returns (subscription, backlog):
+        - backlog is the list of buffered events after `since`; without `since`, the events
+          published after `current_version` was read
+        - backlog is None when the events after `since` are not all buffered and the
+          client has to refetch its state
+        """
+        subscription = Subscription(user_id, self.queue_size)
+        if since is None:
+            since = current_version
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+            buffer = self._buffers.get(user_id, [])
+            backlog = [e for e in buffer if e["version"] > since]
+            latest = max([current_version] + [e["version"] for e in backlog])
+            if since > latest:
+                return subscription, None
+            if {e["version"] for e in backlog} != set(range(since + 1, latest + 1)):
+                return subscription, None
+            return subscription, backlog
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.user_id]
+            if subscription.dropped:
+                self.dropped += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "users_buffered": len(self._buffers),
+                "subscribers": sum(len(s) for s in self._subscribers.values()),
+                "published": self.published,
+                "dropped": self.dropped,
+            }
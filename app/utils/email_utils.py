@@ -1,28 +1,36 @@
 import os
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from pydantic import EmailStr
-from starlette.background import BackgroundTasks
+import time
+from email.message import EmailMessage
+from email.utils import formataddr, make_msgid
 
-# Configuration
+# SMTP settings
 # In a real application, using a .env file is recommended
-conf = ConnectionConfig(
-    MAIL_USERNAME = os.getenv("MAIL_USERNAME", "user@example.com"),
-    MAIL_PASSWORD = os.getenv("MAIL_PASSWORD", "password"),
-    MAIL_FROM = os.getenv("MAIL_FROM", "noreply@example.com"),
-    MAIL_PORT = int(os.getenv("MAIL_PORT", 587)),
-    MAIL_SERVER = os.getenv("MAIL_SERVER", "smtp.example.com"),
-    MAIL_FROM_NAME = os.getenv("MAIL_FROM_NAME", "FastAPI App"),
-    MAIL_STARTTLS = True,
-    MAIL_SSL_TLS = False,
-    USE_CREDENTIALS = True,
-    VALIDATE_CERTS = True
-)
-
-def send_verification_email(email: EmailStr, token: str, background_tasks: BackgroundTasks):
-    # Adjust the base URL as needed for your environment
-    base_url = os.getenv("BASE_URL", "http://localhost:8000")
-    verification_link = f"{base_url}/auth/verify-email?token={token}"
+MAIL_USERNAME = os.getenv("MAIL_USERNAME", "user@example.com")
+MAIL_PASSWORD = os.getenv("MAIL_PASSWORD", "password")
+MAIL_FROM = os.getenv("MAIL_FROM", "noreply@example.com")
+MAIL_FROM_NAME = os.getenv("MAIL_FROM_NAME", "FastAPI App")
+MAIL_SERVER = os.getenv("MAIL_SERVER", "smtp.example.com")
+MAIL_PORT = int(os.getenv("MAIL_PORT", "587"))
+# STARTTLS after connecting (port 587) or implicit TLS (port 465)
+MAIL_STARTTLS = os.getenv("MAIL_STARTTLS", "true").lower() in ("1", "true", "yes")
+MAIL_SSL_TLS = os.getenv("MAIL_SSL_TLS", "false").lower() in ("1", "true", "yes")
+# Log in with MAIL_USERNAME / MAIL_PASSWORD (off for a local relay)
+MAIL_USE_CREDENTIALS = os.getenv("MAIL_USE_CREDENTIALS", "true").lower() in ("1", "true", "yes")
+MAIL_VALIDATE_CERTS = os.getenv("MAIL_VALIDATE_CERTS", "true").lower() in ("1", "true", "yes")
+# Seconds for connecting and for each SMTP command
+MAIL_TIMEOUT = float(os.getenv("MAIL_TIMEOUT", "30"))
+# An idle connection is closed after this many seconds (servers drop it around 5 minutes anyway)
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", "60"))
+# Reconnect after this many messages; some providers cap messages per session
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100"))
 
+# Adjust the base URL as needed for your environment
+BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
+
+
+def verification_email(token: str) -> tuple:
+    """(subject, html) of the signup verification email."""
+    verification_link = f"{BASE_URL}/auth/verify-email?token={token}"
     html = f"""
     <html>
         <body>
@@ -33,16 +41,102 @@ def send_verification_email(email: EmailStr, token: str, background_tasks: Backg
         </body>
     </html>
     """
+    return "Verify your email", html
+
+
+def password_reset_email(token: str) -> tuple:
+    """(subject, html) of the forgot-password email carrying the reset token."""
+    reset_link = f"{BASE_URL}/reset-password?token={token}"
+    html = f"""
+    <html>
+        <body>
+            <p>Hi,</p>
+            <p>We received a request to reset your password. Use the link below to choose a new one:</p>
+            <p><a href="{reset_link}">Reset Password</a></p>
+            <p>Or use this reset token: {token}</p>
+            <p>If you didn't ask for this, you can ignore this email.</p>
+        </body>
+    </html>
+    """
+    return "Reset your password", html
+
+
+def build_message(recipient: str, subject: str, html: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = formataddr((MAIL_FROM_NAME, MAIL_FROM))
+    message["To"] = recipient
+    message["Subject"] = subject
+    message["Message-ID"] = make_msgid(domain=MAIL_FROM.rpartition("@")[2] or None)
+    message.set_content("This email needs an HTML-capable client.")
+    message.add_alternative(html, subtype="html")
+    return message
+
+
+class SMTPConnection:
+    """
+    One long-lived SMTP session reused for many messages, so a burst of emails costs a
+    single connect + STARTTLS + login instead of one per message. It (re)connects on
+    demand, after SMTP_MAX_MESSAGES_PER_CONNECTION messages and when the server dropped
+    it; close_if_idle() hangs up after SMTP_IDLE_TIMEOUT seconds without traffic.
+    Not safe for concurrent use: one sender (the outbox worker) owns it.
+    """
+
+    def __init__(self):
+        self._client = None
+        self._sent_on_connection = 0
+        self._last_used = 0.0
+        self.connections_opened = 0
+
+    @property
+    def is_connected(self) -> bool:
+        return self._client is not None and self._client.is_connected
+
+    async def _connect(self):
+        import aiosmtplib
+
+        client = aiosmtplib.SMTP(
+            hostname=MAIL_SERVER,
+            port=MAIL_PORT,
+            use_tls=MAIL_SSL_TLS,
+            start_tls=MAIL_STARTTLS and not MAIL_SSL_TLS,
+            validate_certs=MAIL_VALIDATE_CERTS,
+            timeout=MAIL_TIMEOUT,
+        )
+        await client.connect()
+        if MAIL_USE_CREDENTIALS:
+            await client.login(MAIL_USERNAME, MAIL_PASSWORD)
+        self._client = client
+        self._sent_on_connection = 0
+        self.connections_opened += 1
+        print(f"[DEBUG] SMTP connected to {MAIL_SERVER}:{MAIL_PORT}")
+
+    async def send(self, message: EmailMessage) -> None:
+        """Sends one message; raises aiosmtplib.SMTPException / OSError on failure."""
+        import aiosmtplib
 
-    message = MessageSchema(
-        subject="Verify your email",
-        recipients=[email],
-        body=html,
-        subtype=MessageType.html
-    )
+        if self.is_connected and self._sent_on_connection >= SMTP_MAX_MESSAGES_PER_CONNECTION:
+            await self.close()
+        if not self.is_connected:
+            await self._connect()
+        try:
+            await self._client.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            # The server hung up on an idle or old session: reconnect once and retry
+            await self.close()
+            await self._connect()
+            await self._client.send_message(message)
+        self._sent_on_connection += 1
+        self._last_used = time.monotonic()
 
-    fm = FastMail(conf)
+    async def close_if_idle(self) -> None:
+        if self.is_connected and time.monotonic() - self._last_used > SMTP_IDLE_TIMEOUT:
+            await self.close()
 
-    # We use background_tasks to send the email asynchronously
-    # Note: send_message is an async method
-    background_tasks.add_task(fm.send_message, message)
+    async def close(self) -> None:
+        client, self._client = self._client, None
+        if client is None or not client.is_connected:
+            return
+        try:
+            await client.quit()
+        except Exception:
+            client.close()
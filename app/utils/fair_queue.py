@@ -0,0 +1,124 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from typing import Dict, Hashable, List, Optional
+
+from fastapi import HTTPException, status
+
+
+class QueueRejected(HTTPException):
+    """429 with Retry-After: the queue is full, or the wait for a slot exceeded max_wait."""
+
+    def __init__(self, reason: str, retry_after: float):
+        self.reason = reason
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="The assistant is busy right now. Please try again shortly.",
+            headers={"Retry-After": str(max(math.ceil(retry_after), 1))},
+        )
+
+
+class FairQueue:
+    """
+    Admission control with weighted fair queuing between keys (users).
+
+    At most `max_active` holders at once. When every slot is taken, callers wait in a
+    queue ordered by virtual finish time: each key's requests are spaced `1 / weight`
+    apart in virtual time, so a user with 50 queued requests does not delay a user with
+    one. A caller waits at most `max_wait` seconds and at most `max_waiting` callers wait
+    at once; beyond either, QueueRejected (429) is raised.
+
+    Single event loop only (one instance per worker process).
+    """
+
+    # Forget per-key finish tags once this many keys are tracked and their tags are in the past
+    _PRUNE_KEYS = 1024
+
+    def __init__(self, max_active: int, max_wait: float, max_waiting: int):
+        self.max_active = max_active
+        self.max_wait = max_wait
+        self.max_waiting = max_waiting
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        # Entries are [finish tag, sequence, future]; cancelled ones are skipped lazily
+        self._heap: List[list] = []
+        self._waiting = 0
+        self._finish: Dict[Hashable, float] = {}
+        self._virtual_time = 0.0
+        self._sequence = itertools.count()
+        # Moving average of how long a slot is held, for Retry-After
+        self._hold_seconds = 1.0
+
+    def _next_tag(self, key: Hashable, weight: float) -> float:
+        tag = max(self._virtual_time, self._finish.get(key, 0.0)) + 1.0 / weight
+        self._finish[key] = tag
+        if len(self._finish) > self._PRUNE_KEYS:
+            self._finish = {k: t for k, t in self._finish.items() if t > self._virtual_time}
+        return tag
+
+    def retry_after(self) -> float:
+        """Rough time until a newly queued caller would get a slot."""
+        return self._hold_seconds * (self._waiting + 1) / self.max_active
+
+    def check(self) -> None:
+        """Raises QueueRejected now if a new caller would be turned away (for streams, before they start)."""
+        if self.active >= self.max_active and self._waiting >= self.max_waiting:
+            self.rejected += 1
+            raise QueueRejected("queue_full", self.retry_after())
+
+    async def acquire(self, key: Hashable, weight: float = 1.0, max_wait: Optional[float] = None) -> float:
+        """Waits for a slot; returns the acquire time to pass to release()."""
+        tag = self._next_tag(key, weight)
+        if self.active < self.max_active and self._waiting == 0:
+            self.active += 1
+            self.admitted += 1
+            return time.monotonic()
+        if self._waiting >= self.max_waiting:
+            self.rejected += 1
+            raise QueueRejected("queue_full", self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, [tag, next(self._sequence), future])
+        self._waiting += 1
+        wait = self.max_wait if max_wait is None else min(max_wait, self.max_wait)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=max(wait, 0))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we gave up: pass it on
+                self.release(time.monotonic())
+            else:
+                future.cancel()
+                self._waiting -= 1
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                raise QueueRejected("queue_timeout", self.retry_after())
+            raise
+        self.admitted += 1
+        return time.monotonic()
+
+    def release(self, acquired_at: float) -> None:
+        self._hold_seconds += 0.1 * ((time.monotonic() - acquired_at) - self._hold_seconds)
+        while self._heap:
+            tag, _, future = heapq.heappop(self._heap)
+            if future.done():
+                continue
+            # Hand the slot straight to the next waiter; `active` stays the same
+            self._waiting -= 1
+            self._virtual_time = tag
+            future.set_result(None)
+            return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self._waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
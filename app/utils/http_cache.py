@@ -0,0 +1,63 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from urllib.parse import urlencode
+
+from fastapi import Request, Response, status
+
+
+def validator_headers(scope: str, user_id: int, version: int, updated_at: Optional[datetime] = None) -> dict:
+    """
+    ETag / Last-Modified for a per-user resource that changes whenever `version` does.
+    The response depends on the caller's token, so shared caches must not reuse it.
+    """
+    headers = {
+        "ETag": f'W/"{scope}-{user_id}-{version}"',
+        "Cache-Control": "private, no-cache",
+        "Vary": "Authorization",
+    }
+    if updated_at is not None:
+        headers["Last-Modified"] = format_datetime(updated_at.replace(tzinfo=timezone.utc), usegmt=True)
+    return headers
+
+
+def query_scope(scope: str, request: Request) -> str:
+    """
+    `scope` narrowed to the request's query parameters (order-insensitive), so each page,
+    filter and field selection of a list gets its own ETag.
+    """
+    params = sorted(request.query_params.multi_items())
+    if not params:
+        return scope
+    digest = hashlib.blake2b(urlencode(params).encode(), digest_size=6).hexdigest()
+    return f"{scope}.{digest}"
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" are the same validator for GET
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def is_not_modified(request: Request, headers: dict) -> bool:
+    """True when the request's If-None-Match / If-Modified-Since still match `headers`."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-Modified-Since is ignored when If-None-Match is present (RFC 9110 13.1.3)
+        return _etag_matches(if_none_match, headers["ETag"])
+
+    if_modified_since = request.headers.get("if-modified-since")
+    last_modified = headers.get("Last-Modified")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def not_modified_response(headers: dict) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
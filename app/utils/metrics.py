@@ -0,0 +1,304 @@
+"""
+Small, dependency-free metrics registry with Prometheus text exposition (GET /metrics).
+
+- Counter / Histogram: label values are positional, e.g. `requests.inc("GET", "/tasks/", "200")`.
+  Each update is a dict lookup plus a few additions under an uncontended lock.
+- register_collector(fn): fn() returns samples read at scrape time (cache sizes, pool
+  usage...), so nothing is tracked on the hot path for them.
+- timed(stage): decorator / context manager recording into app_stage_duration_seconds.
+- count_db_queries(): per-request query counter kept in a contextvar and fed by an
+  SQLAlchemy cursor hook (install_query_counter).
+- MetricsMiddleware: count, latency and DB queries per route.
+"""
+import asyncio
+import bisect
+import contextlib
+import contextvars
+import functools
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from starlette.exceptions import HTTPException
+
+# Seconds; spans fast in-memory paths up to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def value(self, *labelvalues) -> float:
+        return self._values.get(labelvalues, 0.0)
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for labelvalues, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labelvalues -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labelvalues) -> int:
+        series = self._series.get(labelvalues)
+        return series[2] if series else 0
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labelvalues, list(s[0]), s[1], s[2]) for labelvalues, s in self._series.items()]
+        for labelvalues, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                labels = _labels(self.labelnames, labelvalues, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        # (name, documentation, kind, fn) where fn() -> {((label, value), ...): number}
+        self._collectors: List[Tuple[str, str, str, Callable[[], Dict[Tuple, float]]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            return metric
+
+    def register_collector(self, name: str, documentation: str, fn: Callable[[], Dict[Tuple, float]],
+                           kind: str = "gauge") -> None:
+        """
+        Registers a metric read at scrape time. fn() returns {((label, value), ...): number};
+        use {(): number} for a single unlabelled sample. kind is "gauge", or "counter" for
+        totals another component already keeps (cache hits...). Errors in fn only skip it.
+        """
+        with self._lock:
+            self._collectors = [c for c in self._collectors if c[0] != name]
+            self._collectors.append((name, documentation, kind, fn))
+
+    def expose(self) -> str:
+        """All metrics in the Prometheus text format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.expose())
+        for name, documentation, kind, fn in collectors:
+            try:
+                samples = fn()
+            except Exception as e:
+                print(f"[DEBUG] Metrics collector {name} failed: {e}")
+                continue
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples.items():
+                names = tuple(label for label, _ in labels)
+                values = tuple(value for _, value in labels)
+                lines.append(f"{name}{_labels(names, values)} {_number(float(value))}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_duration = registry.histogram(
+    "app_stage_duration_seconds",
+    "Time spent in instrumented stages (services, auth, bcrypt, agent prompt building, LLM calls)",
+    ("stage",),
+)
+stage_errors = registry.counter(
+    "app_stage_errors_total", "Instrumented stages that raised an exception", ("stage",)
+)
+
+
+class timed:
+    """
+    Records how long the wrapped function or block takes under app_stage_duration_seconds{stage}.
+    Works on sync and async functions (the signature is kept, so it is safe on FastAPI
+    dependencies) and as `with timed("stage"):`. HTTPExceptions (404, 401...) are normal
+    outcomes; any other exception also counts in app_stage_errors_total.
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        stage_duration.observe(time.perf_counter() - self._start, self.stage)
+        if exc_type is not None and not issubclass(exc_type, HTTPException):
+            stage_errors.inc(self.stage)
+        return False
+
+    def __call__(self, fn):
+        stage = self.stage
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with timed(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+# --- Database queries per request ---------------------------------------------------------
+
+# A one-element list shared by the request and every thread/task it spawns (contextvars are
+# copied into threadpool calls, so the list object itself is what they all increment)
+_query_counter: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("query_counter", default=None)
+
+db_queries = registry.counter("db_queries_total", "SQL statements executed")
+
+
+@contextlib.contextmanager
+def count_db_queries():
+    """Counts the SQL statements executed inside the block (and its threadpool calls)."""
+    counter = [0]
+    token = _query_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _query_counter.reset(token)
+
+
+def install_query_counter() -> None:
+    """Counts every statement of every engine (sync, read-only and async) from now on."""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    if event.contains(Engine, "before_cursor_execute", _count_query):
+        return
+    event.listen(Engine, "before_cursor_execute", _count_query)
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    db_queries.inc()
+    counter = _query_counter.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+# --- HTTP requests ------------------------------------------------------------------------
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status")
+)
+http_duration = registry.histogram(
+    "http_request_duration_seconds", "Time until the response finished (whole stream for SSE)", ("method", "route")
+)
+http_db_queries = registry.histogram(
+    "http_request_db_queries", "SQL statements executed per request", ("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+)
+_in_flight = [0]
+registry.register_collector(
+    "http_requests_in_flight", "Requests being handled by this worker", lambda: {(): _in_flight[0]}
+)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no per-request task or body buffering) recording count, latency
+    and DB queries per route. Routes are labelled by their template ("/tasks/{task_id}"),
+    never the raw path, so the number of series stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_code[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        _in_flight[0] += 1
+        try:
+            with count_db_queries() as queries:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            _in_flight[0] -= 1
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_duration.observe(time.perf_counter() - start, method, route_path)
+            http_db_queries.observe(queries[0], method, route_path)
+            http_requests.inc(method, route_path, str(status_code[0]))
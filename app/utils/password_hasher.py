@@ -0,0 +1,113 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+import bcrypt
+from fastapi import HTTPException, status
+
+from app.utils.metrics import registry, timed
+
+# Where bcrypt runs for the async helpers:
+# - "process": a process pool, so hashing scales across cores instead of contending for the GIL
+# - "thread": a thread pool (bcrypt releases the GIL, but shares the worker's CPU)
+# - "inline": directly on the event loop (tests / tiny deployments only)
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "process").lower()
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+# Hash/verify calls allowed to queue or run at once; beyond this, requests get 503 immediately
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 8)))
+# bcrypt cost factor for new hashes; existing hashes are upgraded on the next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+_executor: Executor | None = None
+_executor_lock = threading.Lock()
+_pending = 0
+_pending_lock = threading.Lock()
+
+registry.register_collector(
+    "bcrypt_pending", "Hash/verify calls queued or running in the hashing pool", lambda: {(): _pending}
+)
+
+
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=rounds)).decode()
+
+
+def _check(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode(), hashed.encode())
+
+
+def hash_password(password: str) -> str:
+    """Blocking hash with the configured cost factor."""
+    return _hash(password, BCRYPT_ROUNDS)
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    """Blocking verify."""
+    return _check(password, hashed)
+
+
+def needs_rehash(hashed: str) -> bool:
+    """True when the hash was made with a different cost factor than BCRYPT_ROUNDS."""
+    # bcrypt hashes look like $2b$12$<salt+hash>
+    parts = hashed.split("$")
+    try:
+        return int(parts[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+def get_executor() -> Executor | None:
+    global _executor
+    if PASSWORD_HASH_EXECUTOR == "inline":
+        return None
+    with _executor_lock:
+        if _executor is None:
+            if PASSWORD_HASH_EXECUTOR == "thread":
+                _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+            else:
+                # "spawn" avoids forking a process that already runs threads
+                _executor = ProcessPoolExecutor(
+                    max_workers=PASSWORD_HASH_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+        return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+async def _submit(fn, *args):
+    global _pending
+    with _pending_lock:
+        if _pending >= PASSWORD_HASH_MAX_PENDING:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        _pending += 1
+    try:
+        executor = get_executor()
+        if executor is None:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+
+@timed("bcrypt.hash")
+async def hash_password_async(password: str) -> str:
+    return await _submit(_hash, password, BCRYPT_ROUNDS)
+
+
+@timed("bcrypt.verify")
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await _submit(_check, password, hashed)
@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """
+    Slim, immutable view of the authenticated user returned by get_current_user.
+    It is detached from any DB session; services that need to modify the user
+    must load the User row themselves.
+    """
+    id: int
+    email: str
+    username: str
+    first_name: str
+    last_name: str
+    is_verified: bool
+    token_version: int
+
+    @classmethod
+    def from_user(cls, user) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            is_verified=bool(user.is_verified),
+            token_version=user.token_version or 0,
+        )
+
+
+class PrincipalCache:
+    """
+    In-process cache of CurrentUser records keyed by (token subject, token version).
+
+    Entries live for `ttl_seconds`. invalidate() drops a user's entries and remembers the
+    lowest version still valid for `revocation_ttl_seconds` (the access token lifetime: older
+    tokens have expired by then), so tokens minted before a password change are rejected by
+    this worker even if they carry the user's profile (see JWT_EMBED_PRINCIPAL).
+    Both kinds of entry are capped at `max_entries`, least recently used dropped first.
+    """
+
+    def __init__(self, ttl_seconds: float = 60, max_entries: int = 10000,
+                 revocation_ttl_seconds: Optional[float] = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.revocation_ttl_seconds = ttl_seconds if revocation_ttl_seconds is None else revocation_ttl_seconds
+        self._entries: "OrderedDict[tuple[str, int], tuple[float, CurrentUser]]" = OrderedDict()
+        # subject -> (expires_at, lowest valid version)
+        self._min_version: "OrderedDict[str, tuple[float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, subject: str, version: int) -> Optional[CurrentUser]:
+        if self.ttl_seconds <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get((subject, version))
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, principal = entry
+            if expires_at <= time.monotonic():
+                del self._entries[(subject, version)]
+                self.misses += 1
+                return None
+            self._entries.move_to_end((subject, version))
+            self.hits += 1
+            return principal
+
+    def put(self, principal: CurrentUser) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        key = (principal.email, principal.token_version)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, principal)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def is_revoked(self, subject: str, version: int) -> bool:
+        with self._lock:
+            floor = self._min_version.get(subject)
+            if floor is None:
+                return False
+            expires_at, min_version = floor
+            if expires_at <= time.monotonic():
+                del self._min_version[subject]
+                return False
+            return version < min_version
+
+    def invalidate(self, subject: str, new_version: Optional[int] = None) -> None:
+        """Drops the subject's entries; with new_version, rejects older versions. Call after the commit."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == subject]:
+                del self._entries[key]
+            if new_version is not None:
+                now = time.monotonic()
+                floor = self._min_version.get(subject)
+                if floor is not None and floor[0] > now:
+                    new_version = max(new_version, floor[1])
+                self._min_version[subject] = (now + self.revocation_ttl_seconds, new_version)
+                self._min_version.move_to_end(subject)
+                while len(self._min_version) > self.max_entries:
+                    self._min_version.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "revoked": len(self._min_version),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,246 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket per key: `burst` requests at once, refilled at `rate` requests per second.
+
+    - acquire(key) takes one token and returns 0.0, or returns how many seconds until a
+      token is available (without taking one).
+    - In memory by default; buckets are kept in LRU order and at most `max_keys` are held
+      (an evicted bucket comes back full).
+    - If `db_path` is given the buckets live in a small SQLite table instead, so every
+      worker on the host shares them. Each acquire is one short write transaction; if the
+      database cannot be used the request is allowed (the limiter fails open). The connection
+      is opened on first use in each process, never inherited across fork (gunicorn preload).
+    - `rate <= 0` disables the limiter.
+
+    Thread-safe: sync dependencies run in the threadpool and share one instance.
+    """
+
+    _PRUNE_EVERY = 1000  # drop full buckets from the SQLite table once per this many writes
+
+    def __init__(self, rate: float, burst: float, db_path: Optional[str] = None, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_keys = max_keys
+        self.allowed = 0
+        self.limited = 0
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._db_path = db_path if rate > 0 else None
+        self._db = None
+        self._db_pid = None
+        self._forked_db = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # Caller holds the lock
+        if self._db is None or self._db_pid != os.getpid():
+            # A connection opened before a fork is left alone in the child (not even closed)
+            self._forked_db = self._db
+            self._db = None
+            db = sqlite3.connect(self._db_path, check_same_thread=False, isolation_level=None, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db, self._db_pid = db, os.getpid()
+        return self._db
+
+    def _refill(self, tokens: float, updated_at: float, now: float) -> float:
+        return min(self.burst, tokens + max(now - updated_at, 0.0) * self.rate)
+
+    def _take(self, tokens: float) -> tuple:
+        # (tokens left, seconds to wait); the token is only taken when one is available
+        if tokens >= 1.0:
+            return tokens - 1.0, 0.0
+        return tokens, (1.0 - tokens) / self.rate
+
+    def acquire(self, key: str) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            if self._db_path:
+                try:
+                    wait = self._acquire_db(self._connection(), key)
+                except sqlite3.Error as e:
+                    print(f"[DEBUG] Rate limit store unavailable, allowing request: {e}")
+                    wait = 0.0
+            else:
+                wait = self._acquire_memory(key)
+            if wait > 0:
+                self.limited += 1
+            else:
+                self.allowed += 1
+            return wait
+
+    def _acquire_memory(self, key: str) -> float:
+        # Caller holds the lock
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        tokens = self.burst if bucket is None else self._refill(bucket[0], bucket[1], now)
+        tokens, wait = self._take(tokens)
+        self._buckets[key] = [tokens, now]
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def _acquire_db(self, db: sqlite3.Connection, key: str) -> float:
+        # Caller holds the lock. Wall-clock time, since the rows are shared between processes.
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens = self.burst if row is None else self._refill(row[0], row[1], now)
+            tokens, wait = self._take(tokens)
+            db.execute(
+                "INSERT INTO rate_limit_buckets (key, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (key, tokens, now)
+            )
+            self._writes += 1
+            if self._writes % self._PRUNE_EVERY == 0:
+                # Buckets untouched for long enough to be full again hold no information
+                db.execute(
+                    "DELETE FROM rate_limit_buckets WHERE updated_at < ?", (now - self.burst / self.rate,)
+                )
+            db.execute("COMMIT")
+        except BaseException:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            raise
+        return wait
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "keys": len(self._buckets),
+                "allowed": self.allowed,
+                "limited": self.limited,
+                "shared": bool(self._db_path),
+            }
+
+
+class _FailureRecord:
+    __slots__ = ("failures", "strikes", "locked_until", "in_flight")
+
+    def __init__(self, max_failures: int):
+        self.failures = deque(maxlen=max_failures)  # ring buffer of the latest failure times
+        self.strikes = 0
+        self.locked_until = 0.0
+        self.in_flight = 0  # attempts reserved by acquire() and not yet released
+
+
+class FailureLockout:
+    """
+    Sliding-window failure counter per key with exponential lockout.
+
+    - Each key keeps only its last `max_failures` failure times in a ring buffer; when all of
+      them fall within `window` seconds the key is locked for `base_lockout` seconds, doubling
+      with every further lockout up to `max_lockout`. After `max_lockout` seconds without a
+      lockout the doubling starts over.
+    - acquire(key) reserves an attempt before the expensive check runs and returns 0.0, or
+      returns the seconds to wait: the rest of a lockout, or `busy_retry_after` while the
+      attempts already in flight use up the failures left before a lockout. A concurrent burst
+      therefore gets no more attempts than a sequential one.
+    - release(key, failed) ends the reservation and counts the failure; clear(key) forgets the
+      key's failures after a success.
+    - At most `max_keys` keys are tracked (least recently used are dropped first).
+    - `max_failures <= 0` disables the lockout.
+
+    Thread-safe; per process.
+    """
+
+    def __init__(self, max_failures: int, window: float, base_lockout: float, max_lockout: float,
+                 max_keys: int = 100000, busy_retry_after: float = 1.0):
+        self.max_failures = max_failures
+        self.window = window
+        self.base_lockout = base_lockout
+        self.max_lockout = max(max_lockout, base_lockout)
+        self.max_keys = max_keys
+        self.busy_retry_after = busy_retry_after
+        self.lockouts = 0
+        self.rejected = 0
+        self._records: "OrderedDict[str, _FailureRecord]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _record(self, key: str) -> _FailureRecord:
+        # Caller holds the lock
+        record = self._records.get(key)
+        if record is None:
+            record = self._records[key] = _FailureRecord(self.max_failures)
+            while len(self._records) > self.max_keys:
+                self._records.popitem(last=False)
+        else:
+            self._records.move_to_end(key)
+        return record
+
+    def acquire(self, key: str) -> float:
+        if self.max_failures <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            record = self._record(key)
+            wait = record.locked_until - now
+            if wait <= 0:
+                recent = sum(1 for failed_at in record.failures if now - failed_at <= self.window)
+                if record.in_flight < self.max_failures - recent:
+                    record.in_flight += 1
+                    return 0.0
+                wait = self.busy_retry_after
+            self.rejected += 1
+            return wait
+
+    def release(self, key: str, failed: bool) -> float:
+        """Ends an acquire() reservation; a failure is counted. Returns the lockout it started (0.0 if none)."""
+        if self.max_failures <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            record = self._record(key)
+            record.in_flight = max(record.in_flight - 1, 0)
+            if not failed:
+                return 0.0
+            if record.strikes and now - record.locked_until > self.max_lockout:
+                record.strikes = 0
+            record.failures.append(now)
+            if len(record.failures) < self.max_failures or now - record.failures[0] > self.window:
+                return 0.0
+            lockout = min(self.base_lockout * 2 ** record.strikes, self.max_lockout)
+            record.strikes += 1
+            record.locked_until = now + lockout
+            record.failures.clear()
+            self.lockouts += 1
+            return lockout
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            record = self._records.get(key)
+            if record is None:
+                return
+            if record.in_flight:
+                # Other attempts are still running; keep their reservations
+                record.failures.clear()
+                record.strikes = 0
+            else:
+                del self._records[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "keys": len(self._records),
+                "locked": sum(1 for record in self._records.values() if record.locked_until > now),
+                "lockouts": self.lockouts,
+                "rejected": self.rejected,
+            }
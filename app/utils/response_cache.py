@@ -0,0 +1,149 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache with a per-entry TTL for string values.
+
+    - Entries expire `ttl_seconds` after they were stored.
+    - When more than `max_entries` are held, the least recently used entry is evicted.
+    - If `db_path` is given, entries are also written to a small SQLite table so they
+      survive restarts and can be shared by several workers on the same host.
+      Memory misses fall back to the table before counting as a miss. The connection is
+      opened on first use in each process, never inherited across fork (gunicorn preload).
+      Lookups then do file I/O, so async code should call them through the threadpool
+      (see `persistent`).
+    - `max_entries=0` disables the cache (every lookup is a miss, nothing is stored).
+
+    Thread-safe: sync endpoints run in the threadpool and share one instance. SQLite I/O
+    runs under its own lock, so memory hits never wait for it.
+    """
+
+    _PRUNE_EVERY = 100  # run the SQLite eviction pass once per this many writes
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._db_path = db_path if max_entries > 0 else None
+        self._db = None
+        self._db_pid = None
+        self._forked_db = None
+        self._db_lock = threading.Lock()
+
+    @property
+    def persistent(self) -> bool:
+        """True when lookups may touch the SQLite table (i.e. block on file I/O)."""
+        return bool(self._db_path)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Caller holds _db_lock
+        if self._db is None or self._db_pid != os.getpid():
+            # A connection opened before a fork is left alone in the child (not even closed)
+            self._forked_db = self._db
+            self._db = None
+            db = sqlite3.connect(self._db_path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db, self._db_pid = db, os.getpid()
+        return self._db
+
+    def get(self, key: str) -> Optional[str]:
+        if self.max_entries <= 0:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            if not self._db_path:
+                self.misses += 1
+                return None
+
+        with self._db_lock:
+            db = self._connection()
+            row = db.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+            if row is not None:
+                db.execute("UPDATE response_cache SET last_used = ? WHERE key = ?", (now, key))
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self._store(key, row[0], row[1])
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        if self.max_entries <= 0:
+            return
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            self._store(key, value, expires_at)
+        if self._db_path:
+            with self._db_lock:
+                db = self._connection()
+                db.execute(
+                    "INSERT OR REPLACE INTO response_cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, value, expires_at, now)
+                )
+                self._writes += 1
+                if self._writes % self._PRUNE_EVERY == 0:
+                    self._prune_db(db, now)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self._db_path:
+            with self._db_lock:
+                self._connection().execute("DELETE FROM response_cache")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            }
+
+    def _store(self, key: str, value: str, expires_at: float) -> None:
+        # Caller holds the lock
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _prune_db(self, db: sqlite3.Connection, now: float) -> None:
+        # Caller holds _db_lock. Drop expired rows, then the least recently used overflow.
+        db.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+        db.execute(
+            "DELETE FROM response_cache WHERE key IN ("
+            "SELECT key FROM response_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
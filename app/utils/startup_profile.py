@@ -0,0 +1,109 @@
+"""
+Opt-in startup profiler (STARTUP_PROFILE=true): times every module executed during
+import and prints the slowest ones once the app has started.
+
+    STARTUP_PROFILE=true uvicorn main:app
+    python -m app.utils.startup_profile      # import main.py and print the report
+
+For a complete tree, `python -X importtime -c "import main"` gives the interpreter's own view.
+"""
+import importlib.abc
+import os
+import sys
+import threading
+import time
+
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "false").lower() in ("1", "true", "yes")
+# Modules listed in the report
+STARTUP_PROFILE_TOP = int(os.getenv("STARTUP_PROFILE_TOP", "20"))
+
+_started_at = None
+_finder = None
+# module name -> [cumulative seconds, self seconds]
+_timings: dict = {}
+_stack: list = []
+_local = threading.local()
+
+
+class _TimedLoader:
+    """Wraps a loader so exec_module (running the module body) is timed."""
+
+    def __init__(self, loader, name: str):
+        self._loader = loader
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        start = time.perf_counter()
+        _stack.append(0.0)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            children = _stack.pop()
+            elapsed = time.perf_counter() - start
+            _timings[self._name] = [elapsed, elapsed - children]
+            if _stack:
+                _stack[-1] += elapsed
+
+
+class _TimingFinder(importlib.abc.MetaPathFinder):
+    def find_spec(self, name, path, target=None):
+        if getattr(_local, "busy", False):
+            return None
+        _local.busy = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(name, path, target)
+                if spec is not None:
+                    if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                        spec.loader = _TimedLoader(spec.loader, name)
+                    return spec
+            return None
+        finally:
+            _local.busy = False
+
+
+def start(force: bool = False) -> None:
+    """Starts recording; call before the imports to be measured. No-op unless enabled."""
+    global _started_at, _finder
+    if not (STARTUP_PROFILE or force) or _finder is not None:
+        return
+    _started_at = time.perf_counter()
+    _finder = _TimingFinder()
+    sys.meta_path.insert(0, _finder)
+
+
+def stop() -> None:
+    global _finder
+    if _finder is not None:
+        sys.meta_path.remove(_finder)
+        _finder = None
+
+
+def report(top: int = STARTUP_PROFILE_TOP) -> str:
+    """Stops recording and returns (and prints) the slowest imports."""
+    if _started_at is None:
+        return ""
+    stop()
+    total = time.perf_counter() - _started_at
+    lines = [f"[STARTUP] {total * 1000:.0f} ms since start(), {len(_timings)} modules imported"]
+    lines.append(f"[STARTUP] {'cumulative ms':>14} {'self ms':>9}  module")
+    ranked = sorted(_timings.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    for name, (cumulative, own) in ranked:
+        lines.append(f"[STARTUP] {cumulative * 1000:14.1f} {own * 1000:9.1f}  {name}")
+    text = "\n".join(lines)
+    print(text)
+    return text
+
+
+if __name__ == "__main__":
+    start(force=True)
+    import main  # noqa: F401
+    report()
@@ -0,0 +1,198 @@
+"""
+In-memory static file server for the built frontend (frontend/dist).
+
+load() walks the directory once, at startup, and keeps every file in memory with its
+content type, a strong ETag and gzip/brotli variants, so a request is a dict lookup with
+no filesystem calls. Files under assets/ have content hashes in their names (Vite) and
+are served as immutable; everything else (index.html, favicon...) is revalidated through
+its ETag. Rebuilding the frontend needs a restart (or another load()).
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip variants are built
+    brotli = None
+
+# Directory of the production frontend build
+FRONTEND_DIST_DIR = os.getenv("FRONTEND_DIST_DIR", "frontend/dist")
+# Files bigger than this are not loaded (they are left to the catch-all's 404 / index.html)
+STATIC_MAX_FILE_BYTES = int(os.getenv("STATIC_MAX_FILE_BYTES", str(20 * 1024 * 1024)))
+# Smaller files are not worth compressing
+STATIC_COMPRESS_MIN_BYTES = int(os.getenv("STATIC_COMPRESS_MIN_BYTES", "512"))
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+_COMPRESSIBLE = re.compile(r"^(text/|application/(javascript|json|manifest\+json|xml|wasm)|image/svg\+xml)")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+@dataclass
+class StaticFile:
+    body: bytes
+    content_type: str
+    etag: str
+    cache_control: str
+    # encoding ("br", "gzip") -> compressed body, only when it is smaller
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+
+
+def _content_type(path: str) -> str:
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type == "application/javascript":
+        content_type += "; charset=utf-8"
+    return content_type
+
+
+def _compress(body: bytes, content_type: str) -> Dict[str, bytes]:
+    if len(body) < STATIC_COMPRESS_MIN_BYTES or not _COMPRESSIBLE.match(content_type):
+        return {}
+    variants = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=11)
+    return {encoding: data for encoding, data in variants.items() if len(data) < len(body)}
+
+
+def _accepted_encoding(request: Request, static_file: StaticFile) -> Optional[str]:
+    accept = request.headers.get("accept-encoding", "")
+    offered = {}
+    for part in accept.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        offered[name.strip().lower()] = q
+    # Brotli is smaller than gzip for the same content, so prefer it
+    for encoding in ("br", "gzip"):
+        if encoding in static_file.encoded and offered.get(encoding, 0) > 0:
+            return encoding
+    return None
+
+
+def _etag(static_file: StaticFile, encoding: Optional[str]) -> str:
+    # Each encoding is a different representation, so it gets its own (strong) ETag
+    return static_file.etag if encoding is None else f'{static_file.etag[:-1]}-{encoding}"'
+
+
+def _etag_matches(header: str, static_file: StaticFile) -> bool:
+    # Weak comparison (RFC 9110): W/"x" matches "x"; any encoding of the same content matches
+    candidates = [value.strip().removeprefix("W/") for value in header.split(",")]
+    etags = {static_file.etag} | {_etag(static_file, encoding) for encoding in static_file.encoded}
+    return "*" in candidates or any(c in etags for c in candidates)
+
+
+class StaticAssets:
+    def __init__(self, root: str = FRONTEND_DIST_DIR):
+        self.root = root
+        self.files: Dict[str, StaticFile] = {}
+        self.bytes_loaded = 0
+
+    @property
+    def index(self) -> Optional[StaticFile]:
+        return self.files.get("index.html")
+
+    def load(self) -> int:
+        """(Re)builds the manifest from disk; returns the number of files loaded."""
+        files = {}
+        total = 0
+        if os.path.isdir(self.root):
+            for directory, _, names in os.walk(self.root):
+                for name in names:
+                    full_path = os.path.join(directory, name)
+                    if os.path.getsize(full_path) > STATIC_MAX_FILE_BYTES:
+                        print(f"[DEBUG] Static file too big to preload, skipped: {full_path}")
+                        continue
+                    with open(full_path, "rb") as f:
+                        body = f.read()
+                    path = os.path.relpath(full_path, self.root).replace(os.sep, "/")
+                    content_type = _content_type(path)
+                    files[path] = StaticFile(
+                        body=body,
+                        content_type=content_type,
+                        etag='"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"',
+                        cache_control=IMMUTABLE_CACHE_CONTROL if path.startswith("assets/") else REVALIDATE_CACHE_CONTROL,
+                        encoded=_compress(body, content_type),
+                    )
+                    total += len(body) + sum(len(v) for v in files[path].encoded.values())
+        self.files = files
+        self.bytes_loaded = total
+        if files:
+            print(f"[DEBUG] Loaded {len(files)} static files ({total // 1024} KiB with compressed variants)")
+        return len(files)
+
+    def get(self, path: str) -> Optional[StaticFile]:
+        return self.files.get(path.lstrip("/"))
+
+    def response(self, request: Request, static_file: StaticFile) -> Response:
+        """
+        Response for GET/HEAD of a loaded file: 304 on a matching If-None-Match, a
+        precompressed variant when Accept-Encoding allows it, 206/416 for a single
+        byte range (served from the uncompressed body).
+        """
+        headers = {
+            "ETag": static_file.etag,
+            "Cache-Control": static_file.cache_control,
+            "Accept-Ranges": "bytes",
+        }
+        encoding = None
+        if static_file.encoded:
+            headers["Vary"] = "Accept-Encoding"
+            if "range" not in request.headers:
+                encoding = _accepted_encoding(request, static_file)
+                headers["ETag"] = _etag(static_file, encoding)
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, static_file):
+            return Response(status_code=304, headers=headers)
+
+        body = static_file.body
+        status_code = 200
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        if range_header and (if_range is None or if_range == static_file.etag):
+            match = _RANGE.match(range_header.strip())
+            # Multiple ranges or other units: ignore the header and send everything
+            if match and match.group(1) + match.group(2):
+                size = len(body)
+                first, last = match.groups()
+                if first:
+                    start, end = int(first), (min(int(last), size - 1) if last else size - 1)
+                else:
+                    start, end = max(size - int(last), 0), size - 1
+                if start >= size or start > end:
+                    headers["Content-Range"] = f"bytes */{size}"
+                    return Response(status_code=416, headers=headers)
+                body = body[start:end + 1]
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+                status_code = 206
+        elif encoding is not None:
+            body = static_file.encoded[encoding]
+            headers["Content-Encoding"] = encoding
+
+        if request.method == "HEAD":
+            headers["Content-Length"] = str(len(body))
+            return Response(status_code=status_code, headers=headers, media_type=static_file.content_type)
+        return Response(body, status_code=status_code, headers=headers, media_type=static_file.content_type)
+
+    def stats(self) -> dict:
+        return {
+            "files": len(self.files),
+            "bytes": self.bytes_loaded,
+            "brotli": brotli is not None,
+        }
+
+
+frontend_assets = StaticAssets()
@@ -0,0 +1,39 @@
+import json
+from typing import Any, AsyncIterator, Dict, Literal
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+StreamFormat = Literal["sse", "ndjson"]
+
+# Headers that stop proxies (nginx etc.) from buffering the stream
+STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+def _dump(frame: Dict[str, Any]) -> str:
+    return json.dumps(jsonable_encoder(frame), ensure_ascii=False)
+
+
+async def _sse(frames: AsyncIterator[Dict[str, Any]]):
+    async for frame in frames:
+        # Versioned frames set the event id, so EventSource resumes with Last-Event-ID
+        event_id = f"id: {frame['version']}\n" if frame.get("version") is not None else ""
+        yield f"{event_id}event: {frame['type']}\ndata: {_dump(frame)}\n\n"
+
+
+async def _ndjson(frames: AsyncIterator[Dict[str, Any]]):
+    async for frame in frames:
+        yield _dump(frame) + "\n"
+
+
+def stream_response(frames: AsyncIterator[Dict[str, Any]], fmt: StreamFormat = "sse") -> StreamingResponse:
+    """
+    Wraps an async iterator of frame dicts (each with a "type" key) in a StreamingResponse.
+    - "sse": Server-Sent Events, one `event: <type>` block per frame
+    - "ndjson": chunked JSON lines, one frame per line
+    """
+    if fmt == "ndjson":
+        return StreamingResponse(_ndjson(frames), media_type="application/x-ndjson", headers=STREAM_HEADERS)
+    return StreamingResponse(_sse(frames), media_type="text/event-stream", headers=STREAM_HEADERS)
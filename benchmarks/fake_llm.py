@@ -0,0 +1,76 @@
+"""
+The in-process fake model (app/agents/llm_backends.FakeLLM) served over HTTP, standing in
+for the Gemini endpoint so benchmarks measure the app, including the HTTP hop to the
+model, and not the network or a rate-limited API.
+
+    python -m benchmarks.fake_llm --port 9100 --latency 0.2
+    LLM_BASE_URL=http://127.0.0.1:9100 LLM_MODEL=fake-model uvicorn main:app
+
+Serves POST /chat/completions (plain and streamed) and GET /models.
+"""
+import argparse
+import threading
+import time
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from app.agents.llm_backends import FakeLLM
+
+
+def create_app(fake: FakeLLM) -> Starlette:
+    async def chat_completions(request: Request):
+        body = await request.json()
+        if body.get("stream"):
+            return StreamingResponse(fake.stream(body), media_type="text/event-stream")
+        return JSONResponse(await fake.completion(body))
+
+    async def models(request: Request):
+        return JSONResponse({"object": "list", "data": [{"id": "fake-model", "object": "model"}]})
+
+    return Starlette(routes=[
+        Route("/chat/completions", chat_completions, methods=["POST"]),
+        Route("/models", models, methods=["GET"]),
+    ])
+
+
+class FakeLLMServer:
+    """Runs the fake server with uvicorn in a background thread (own event loop)."""
+
+    def __init__(self, fake: FakeLLM, host: str = "127.0.0.1", port: int = 9100):
+        import uvicorn
+
+        self.fake = fake
+        self.url = f"http://{host}:{port}"
+        config = uvicorn.Config(create_app(fake), host=host, port=port, log_level="warning", lifespan="off")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, name="fake-llm", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError(f"Fake LLM server did not start on {self.url}")
+            time.sleep(0.02)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200)
+    parser.add_argument("--reply-words", type=int, default=40)
+    args = parser.parse_args()
+    fake = FakeLLM(args.latency, args.tokens_per_second, args.reply_words)
+    uvicorn.run(create_app(fake), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,156 @@
+"""Load generation, latency statistics, /metrics scraping and baseline comparison."""
+import asyncio
+import json
+import math
+import re
+import sys
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+# A regression is reported when p95 grows or RPS drops by more than this fraction...
+DEFAULT_TOLERANCE = 0.25
+# ...or when a request makes more DB queries than in the baseline (query counts are exact)
+DB_QUERY_SLACK = 0.5
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(p / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class Recorder:
+    """Collects per-label latencies and errors for one scenario."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        # label -> (method, route template), to look up the label's DB queries in /metrics
+        self.routes: Dict[str, tuple] = {}
+        self.elapsed: Dict[str, float] = defaultdict(float)
+
+    async def call(self, label: str, route: tuple, request: Awaitable, expect=(200, 201, 204)):
+        self.routes[label] = route
+        start = time.perf_counter()
+        response = await request
+        self.latencies[label].append(time.perf_counter() - start)
+        if response.status_code not in expect:
+            self.errors[label] += 1
+            if self.errors[label] <= 3:
+                print(f"  ! {label}: {response.status_code} {response.text[:200]}", file=sys.stderr)
+        return response
+
+    def summary(self, before: Optional[dict] = None, after: Optional[dict] = None) -> Dict[str, dict]:
+        results = {}
+        for label, values in self.latencies.items():
+            ordered = sorted(values)
+            elapsed = self.elapsed.get(label) or self.elapsed.get(None, 0.0)
+            results[label] = {
+                "requests": len(values),
+                "errors": self.errors.get(label, 0),
+                "rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+                "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+                "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+                "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+            }
+            if before is not None and after is not None:
+                results[label]["db_queries_per_request"] = db_queries_per_request(before, after, *self.routes[label])
+        return results
+
+
+async def run_load(recorder: Recorder, iteration: Callable[[int], Awaitable], iterations: int,
+                   concurrency: int, phase: Optional[str] = None):
+    """
+    Runs `iteration(i)` for i in range(iterations) with `concurrency` in flight. The wall
+    time is charged to `phase` (a label; None = every label without its own phase) for RPS.
+    """
+    next_index = iter(range(iterations))
+
+    async def worker():
+        for i in next_index:
+            await iteration(i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    recorder.elapsed[phase] += time.perf_counter() - start
+
+
+_SAMPLE = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+
+
+def parse_metrics(text: str) -> Dict[tuple, float]:
+    """Prometheus text -> {(name, frozenset(labels)): value}."""
+    samples = {}
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        pairs = frozenset(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', labels or ""))
+        samples[(name, pairs)] = float(value)
+    return samples
+
+
+async def scrape(client) -> Dict[tuple, float]:
+    response = await client.get("/metrics")
+    response.raise_for_status()
+    return parse_metrics(response.text)
+
+
+def db_queries_per_request(before: Dict[tuple, float], after: Dict[tuple, float], method: str, route: str) -> Optional[float]:
+    """Average SQL statements per request of one route between two scrapes."""
+    labels = frozenset({("method", method), ("route", route)})
+    total = after.get(("http_request_db_queries_sum", labels), 0.0) - before.get(("http_request_db_queries_sum", labels), 0.0)
+    count = after.get(("http_request_db_queries_count", labels), 0.0) - before.get(("http_request_db_queries_count", labels), 0.0)
+    return round(total / count, 2) if count else None
+
+
+def print_results(results: Dict[str, dict]) -> None:
+    header = f"{'scenario':<34} {'reqs':>6} {'err':>4} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'db q/req':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        db = r.get("db_queries_per_request")
+        print(f"{name:<34} {r['requests']:>6} {r['errors']:>4} {r['rps']:>8} {r['p50_ms']:>9} "
+              f"{r['p95_ms']:>9} {r['p99_ms']:>9} {'-' if db is None else db:>9}")
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """Returns one message per regression against the baseline (scenarios missing from either are skipped)."""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if current["errors"] > base.get("errors", 0):
+            regressions.append(f"{name}: {current['errors']} errors (baseline {base.get('errors', 0)})")
+        if base["p95_ms"] and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95_ms']} ms vs baseline {base['p95_ms']} ms")
+        if base["rps"] and current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: {current['rps']} rps vs baseline {base['rps']} rps")
+        db, base_db = current.get("db_queries_per_request"), base.get("db_queries_per_request")
+        if db is not None and base_db is not None and db > base_db + DB_QUERY_SLACK:
+            regressions.append(f"{name}: {db} DB queries per request vs baseline {base_db}")
+    return regressions
+
+
+def missing_from_baseline(results: Dict[str, dict], baseline: Dict[str, dict]) -> List[str]:
+    """Scenarios that ran but have nothing to be compared with."""
+    return [name for name in results if name not in baseline]
+
+
+def load_baseline(path: str) -> Optional[Dict[str, dict]]:
+    try:
+        with open(path) as f:
+            return json.load(f)["results"]
+    except FileNotFoundError:
+        return None
+
+
+def save_results(path: str, results: Dict[str, dict], meta: dict) -> None:
+    with open(path, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2, sort_keys=True)
+        f.write("\n")
@@ -0,0 +1,225 @@
+"""
+Load tests for the auth, task and agent endpoints, with a fake LLM and baseline comparison.
+
+    python -m benchmarks.run                         # in-process (httpx ASGI transport)
+    python -m benchmarks.run --mode uvicorn          # real HTTP against a uvicorn subprocess
+    python -m benchmarks.run --save-baseline         # record benchmarks/baseline-<mode>.json
+    python -m benchmarks.run --scenarios task_crud,chat --requests 500 --concurrency 32
+    python -m benchmarks.run --llm inprocess         # LLM_BACKEND=fake instead of the fake HTTP server
+    python -m benchmarks.run --ci                    # no baseline (or a scenario missing from it) fails
+
+Each scenario reports requests, errors, RPS, p50/p95/p99 latency and SQL statements per
+request (read from /metrics). When a baseline exists, p95 growth or an RPS drop beyond
+--tolerance, new errors, or extra DB queries are printed as REGRESSION and the exit code is 1.
+With --ci (on by default when the CI environment variable is set) a missing baseline exits with 2,
+so a regression can't pass unnoticed.
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+# Settings for the app under test; set before anything imports it
+BENCH_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".bench.db")
+LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".bench.log")
+
+
+def _prepare_environment(args, llm_url: str) -> None:
+    if "DATABASE_URL" not in os.environ:
+        # Fresh SQLite database on every run, so results do not depend on earlier runs
+        for suffix in ("", "-wal", "-shm"):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(BENCH_DB_PATH + suffix)
+        os.environ["DATABASE_URL"] = f"sqlite:///{BENCH_DB_PATH}"
+    # The agents talk to the fake model, over HTTP (--llm server) or in process (--llm inprocess)
+    os.environ["LLM_BACKEND"] = "openai" if args.llm == "server" else "fake"
+    os.environ["LLM_BASE_URL"] = llm_url
+    os.environ["LLM_MODEL"] = "fake-model"
+    os.environ["LLM_API_KEY"] = "bench-key"
+    os.environ["LLM_FAKE_LATENCY"] = str(args.llm_latency)
+    os.environ.setdefault("EMAIL_OUTBOX_WORKER", "false")
+    os.environ["METRICS_ENABLED"] = "true"
+    # The harness scrapes /metrics for DB queries per request; the server only listens on 127.0.0.1
+    os.environ.setdefault("METRICS_PUBLIC", "true")
+    # The chat scenario is one user sending every request; measure the agent path, not the 429s
+    os.environ.setdefault("CHAT_RATE_LIMIT_PER_MINUTE", "0")
+    # Every benchmark request comes from one address, so only the per-email login lockout is exercised
+    os.environ.setdefault("LOGIN_MAX_FAILURES_PER_IP", "0")
+
+
+class BenchContext:
+    def __init__(self, client, args, in_process: bool):
+        self.client = client
+        self.concurrency = args.concurrency
+        self.requests = args.requests
+        self.summary_sizes = args.summary_sizes
+        self.in_process = in_process
+
+
+async def _run_scenarios(ctx: BenchContext, names) -> dict:
+    from benchmarks.scenarios import SCENARIOS
+
+    results = {}
+    for name in names:
+        print(f"Running {name}...", file=sys.stderr)
+        results.update(await SCENARIOS[name](ctx))
+    return results
+
+
+def _client_headers() -> dict:
+    token = os.getenv("METRICS_TOKEN")
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+
+async def run_in_process(args) -> dict:
+    import httpx
+    import main
+
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            client.headers.update(_client_headers())
+            return await _run_scenarios(BenchContext(client, args, in_process=True), args.scenarios)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_uvicorn(args, log) -> dict:
+    import httpx
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        stdout=log, stderr=subprocess.STDOUT,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+            client.headers.update(_client_headers())
+            deadline = time.monotonic() + 60
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with code {server.returncode}; see {LOG_PATH}")
+                try:
+                    if (await client.get("/metrics")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"uvicorn did not start on {base_url}; see {LOG_PATH}")
+                await asyncio.sleep(0.1)
+            return await _run_scenarios(BenchContext(client, args, in_process=False), args.scenarios)
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main():
+    from benchmarks.scenarios import SCENARIOS
+
+    parser = argparse.ArgumentParser(description="Load tests for the auth, task and agent endpoints")
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--summary-sizes", default="10000,100000",
+                        help="tasks per user for the /tasks/summary scenario (e.g. 10000,100000,1000000)")
+    parser.add_argument("--llm", choices=("server", "inprocess"), default="server",
+                        help="fake model behind a local HTTP server, or the in-process LLM_BACKEND=fake")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds before the fake model's first token")
+    parser.add_argument("--baseline", help="baseline JSON (default: benchmarks/baseline-<mode>.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="allowed p95 growth / RPS drop as a fraction (default 0.25)")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--ci", action="store_true", default=os.getenv("CI", "").lower() in ("1", "true", "yes"),
+                        help="exit with 2 when there is no baseline to compare with (default: on when CI is set)")
+    args = parser.parse_args()
+
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    args.summary_sizes = [int(size) for size in args.summary_sizes.split(",") if size.strip()]
+    baseline_path = args.baseline or os.path.join(os.path.dirname(os.path.abspath(__file__)), f"baseline-{args.mode}.json")
+    if args.ci and not args.save_baseline and not os.path.exists(baseline_path):
+        # Fail before spending minutes on a run that can't be judged
+        print(f"No baseline at {baseline_path}. Record one on this runner with --save-baseline and commit it.")
+        sys.exit(2)
+
+    llm_port = _free_port()
+    _prepare_environment(args, f"http://127.0.0.1:{llm_port}")
+
+    from app.agents.llm_backends import FakeLLM
+    from benchmarks.fake_llm import FakeLLMServer
+    from benchmarks.harness import (
+        DEFAULT_TOLERANCE, compare, load_baseline, missing_from_baseline, print_results, save_results
+    )
+
+    llm_server = FakeLLMServer(FakeLLM(latency=args.llm_latency), port=llm_port) if args.llm == "server" else contextlib.nullcontext()
+    with open(LOG_PATH, "w") as log, llm_server:
+        if args.mode == "inprocess":
+            # The app logs every request; keep that out of the report
+            with contextlib.redirect_stdout(log):
+                results = asyncio.run(run_in_process(args))
+        else:
+            results = asyncio.run(run_uvicorn(args, log))
+
+    print()
+    print_results(results)
+    meta = {
+        "mode": args.mode,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "llm": args.llm,
+        "llm_latency": args.llm_latency,
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "recorded_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+    }
+    if args.output:
+        save_results(args.output, results, meta)
+
+    if args.save_baseline:
+        save_results(baseline_path, results, meta)
+        print(f"\nBaseline written to {baseline_path}")
+        return
+
+    baseline = load_baseline(baseline_path)
+    if baseline is None:
+        print(f"\nNo baseline at {baseline_path}; run with --save-baseline to record one.")
+        if args.ci:
+            sys.exit(2)
+        return
+    missing = missing_from_baseline(results, baseline)
+    if missing:
+        print(f"\nNot in the baseline (not compared): {', '.join(missing)}")
+        if args.ci:
+            sys.exit(2)
+    tolerance = DEFAULT_TOLERANCE if args.tolerance is None else args.tolerance
+    regressions = compare(results, baseline, tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} REGRESSION(S) against {baseline_path}:")
+        for message in regressions:
+            print(f"REGRESSION: {message}")
+        sys.exit(1)
+    print(f"\nNo regressions against {baseline_path} (tolerance {tolerance:.0%}).")
+
+
+if __name__ == "__main__":
+    main()
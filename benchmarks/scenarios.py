@@ -0,0 +1,205 @@
+"""
+Benchmark scenarios. Each takes the BenchContext and returns {label: stats}; run.py
+prints them and compares them with the baseline.
+"""
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select
+
+from benchmarks.harness import Recorder, run_load, scrape
+
+PASSWORD = "bench-Passw0rd"
+
+
+async def create_user(ctx) -> dict:
+    """Signs up and logs in a fresh user; returns {"email", "id", "headers"}."""
+    name = f"bench_{uuid.uuid4().hex[:10]}"
+    email = f"{name}@example.com"
+    response = await ctx.client.post("/auth/signup", json={
+        "email": email, "username": name, "first_name": "Bench", "last_name": "User", "password": PASSWORD
+    })
+    response.raise_for_status()
+    response = await ctx.client.post("/auth/login", json={"email": email, "password": PASSWORD})
+    response.raise_for_status()
+    body = response.json()
+    return {"email": email, "id": body["user"]["id"], "headers": {"Authorization": f"Bearer {body['access_token']}"}}
+
+
+async def _measure(ctx, recorder: Recorder, iteration, iterations: int, phase=None) -> dict:
+    before = await scrape(ctx.client)
+    await run_load(recorder, iteration, iterations, ctx.concurrency, phase)
+    after = await scrape(ctx.client)
+    return recorder.summary(before, after)
+
+
+async def login_storm(ctx) -> dict:
+    """Concurrent logins spread over a few accounts: dominated by bcrypt verify."""
+    users = [await create_user(ctx) for _ in range(min(ctx.concurrency, 10))]
+    recorder = Recorder()
+
+    async def iteration(i):
+        user = users[i % len(users)]
+        await recorder.call("login_storm", ("POST", "/auth/login"), ctx.client.post(
+            "/auth/login", json={"email": user["email"], "password": PASSWORD}
+        ))
+
+    return await _measure(ctx, recorder, iteration, ctx.requests)
+
+
+async def credential_stuffing(ctx) -> dict:
+    """
+    Wrong passwords against a few victim emails interleaved with real logins: once the
+    victims are locked out the attack gets cheap 429s and stops competing for bcrypt.
+    """
+    users = [await create_user(ctx) for _ in range(min(ctx.concurrency, 10))]
+    victims = [f"victim_{uuid.uuid4().hex[:10]}@example.com" for _ in range(3)] + [users[0]["email"]]
+    recorder = Recorder()
+
+    async def iteration(i):
+        if i % 4:
+            email = victims[i % len(victims)]
+            await recorder.call("credential_stuffing:attack", ("POST", "/auth/login"), ctx.client.post(
+                "/auth/login", json={"email": email, "password": f"guess-{i}"}
+            ), expect=(401, 429))
+        else:
+            user = users[1 + (i // 4) % (len(users) - 1)] if len(users) > 1 else users[0]
+            await recorder.call("credential_stuffing:login", ("POST", "/auth/login"), ctx.client.post(
+                "/auth/login", json={"email": user["email"], "password": PASSWORD}
+            ))
+
+    return await _measure(ctx, recorder, iteration, ctx.requests)
+
+
+async def task_crud(ctx) -> dict:
+    """Create / read / update status / list / delete, each authenticated (get_current_user on every call)."""
+    user = await create_user(ctx)
+    headers = user["headers"]
+    client = ctx.client
+    recorder = Recorder()
+
+    async def iteration(i):
+        response = await recorder.call("task_crud:create", ("POST", "/tasks/"), client.post(
+            "/tasks/", json={"title": f"Bench task {i}", "description": "Benchmark task body"}, headers=headers
+        ))
+        if response.status_code != 201:
+            return
+        task_id = response.json()["id"]
+        await recorder.call("task_crud:get", ("GET", "/tasks/{task_id}"), client.get(f"/tasks/{task_id}", headers=headers))
+        await recorder.call("task_crud:status", ("PATCH", "/tasks/{task_id}/status"), client.patch(
+            f"/tasks/{task_id}/status", json={"status": "in_progress"}, headers=headers
+        ))
+        await recorder.call("task_crud:list", ("GET", "/tasks/"), client.get("/tasks/?limit=20", headers=headers))
+        await recorder.call("task_crud:delete", ("DELETE", "/tasks/{task_id}"), client.delete(f"/tasks/{task_id}", headers=headers))
+
+    return await _measure(ctx, recorder, iteration, max(ctx.requests // 5, 1))
+
+
+def seed_tasks(user_id: int, count: int, batch_size: int = 20000) -> None:
+    """Inserts `count` tasks for a user straight into the database and sets their counters."""
+    from config.db import engine
+    from app.models import agent, conversation, user  # noqa: F401  (mappers Task relates to)
+    from app.models.task import Task, TaskStatus
+    from app.models.task_counter import TaskCounter
+
+    statuses = list(TaskStatus)
+    start = datetime.utcnow() - timedelta(days=365)
+    with engine.begin() as conn:
+        for offset in range(0, count, batch_size):
+            conn.execute(insert(Task), [
+                {
+                    "title": f"Seeded task {n}",
+                    "description": f"Seeded description {n}",
+                    "status": statuses[n % len(statuses)],
+                    "task_type": ("work", "home", None)[n % 3],
+                    "created_at": start + timedelta(seconds=n),
+                    "user_id": user_id,
+                }
+                for n in range(offset, min(offset + batch_size, count))
+            ])
+        counts = dict(conn.execute(
+            select(Task.status, func.count(Task.id)).where(Task.user_id == user_id).group_by(Task.status)
+        ).all())
+        conn.execute(delete(TaskCounter).where(TaskCounter.user_id == user_id))
+        conn.execute(insert(TaskCounter).values(
+            user_id=user_id,
+            pending=counts.get(TaskStatus.PENDING, 0),
+            in_progress=counts.get(TaskStatus.IN_PROGRESS, 0),
+            completed=counts.get(TaskStatus.COMPLETED, 0),
+            version=1,
+            updated_at=datetime.utcnow(),
+        ))
+
+
+async def task_summary(ctx) -> dict:
+    """GET /tasks/summary for users with many tasks, from the counters and (in-process) from a GROUP BY."""
+    results = {}
+    for size in ctx.summary_sizes:
+        user = await create_user(ctx)
+        print(f"  seeding {size} tasks...", file=sys.stderr)
+        seed_tasks(user["id"], size)
+
+        variants = ["counters", "group_by"] if ctx.in_process else ["configured"]
+        for variant in variants:
+            if ctx.in_process:
+                from app.services import task_services
+                task_services.TASK_SUMMARY_COUNTERS = variant == "counters"
+            recorder = Recorder()
+            label = f"summary[{size}]:{variant}"
+
+            async def iteration(i, label=label):
+                await recorder.call(label, ("GET", "/tasks/summary"), ctx.client.get("/tasks/summary", headers=user["headers"]))
+
+            # The GROUP BY over a million rows is slow; keep the run bounded
+            iterations = ctx.requests if variant != "group_by" or size <= 100000 else max(ctx.requests // 10, 10)
+            results.update(await _measure(ctx, recorder, iteration, iterations))
+        if ctx.in_process:
+            from app.services import task_services
+            task_services.TASK_SUMMARY_COUNTERS = True
+    return results
+
+
+async def chat(ctx) -> dict:
+    """Concurrent task chats against the fake LLM: plain and streamed replies."""
+    user = await create_user(ctx)
+    headers = user["headers"]
+    response = await ctx.client.post("/tasks/", json={"title": "Chat bench", "description": "Talk to me"}, headers=headers)
+    response.raise_for_status()
+    task_id = response.json()["id"]
+    # The first chat imports the agents SDK and creates the task's agent; keep that out of the numbers
+    response = await ctx.client.post(f"/tasks/{task_id}/chat", json={"message": "Warm up"}, headers=headers)
+    response.raise_for_status()
+    recorder = Recorder()
+
+    async def plain(i):
+        await recorder.call("chat", ("POST", "/tasks/{task_id}/chat"), ctx.client.post(
+            f"/tasks/{task_id}/chat", json={"message": f"Question number {i}?"}, headers=headers
+        ))
+
+    async def streamed(i):
+        async def request():
+            # Reads the whole SSE body, so the latency covers the full streamed answer
+            response = await ctx.client.post(
+                f"/tasks/{task_id}/chat/stream", json={"message": f"Streamed question {i}?"}, headers=headers
+            )
+            if "event: error" in response.text or "event: done" not in response.text:
+                response.status_code = 599
+            return response
+
+        await recorder.call("chat_stream", ("POST", "/tasks/{task_id}/chat/stream"), request())
+
+    before = await scrape(ctx.client)
+    await run_load(recorder, plain, ctx.requests, ctx.concurrency, phase="chat")
+    await run_load(recorder, streamed, ctx.requests, ctx.concurrency, phase="chat_stream")
+    after = await scrape(ctx.client)
+    return recorder.summary(before, after)
+
+
+SCENARIOS = {
+    "login_storm": login_storm,
+    "credential_stuffing": credential_stuffing,
+    "task_crud": task_crud,
+    "task_summary": task_summary,
+    "chat": chat,
+}
@@ -0,0 +1,39 @@
+"""
+Production server config (Linux/macOS):
+
+    gunicorn -c gunicorn.conf.py
+
+The app is imported once in the master (preload) and the heavy, lazily created clients are
+built there too, so forked workers start serving immediately and share those pages
+copy-on-write. Each worker still runs the app lifespan (schema check, email outbox worker)
+on its own.
+"""
+import multiprocessing
+import os
+
+wsgi_app = "main:app"
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+# Import main.py in the master before forking (set GUNICORN_PRELOAD=false to import per worker)
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+
+def on_starting(server):
+    if not preload_app:
+        return
+    # Build what is otherwise created on first use, so workers inherit it instead of each paying for it
+    from app.agents import task_agent
+    task_agent.warm_up()
+    server.log.info("Preloaded app and LLM client")
+
+
+def post_fork(server, worker):
+    # Pooled DB connections must never be shared between processes; drop any the master opened
+    # (close=False leaves the parent's sockets alone)
+    from config.db import engine, read_engine
+    engine.dispose(close=False)
+    if read_engine is not engine:
+        read_engine.dispose(close=False)
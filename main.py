@@ -1,24 +1,50 @@
+# Must run before the other imports so they can be timed (STARTUP_PROFILE=true)
+from app.utils import startup_profile
+startup_profile.start()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.openapi.models import OAuthFlows as OAuthFlowsModel
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from app.router import auth_router, task_router, agent_router
-from config.db import engine, Base
-from app.models import user, task, agent  # Required for table creation
+from fastapi import HTTPException, Request
+from app.router import auth_router, task_router, agent_router, metrics_router
+from config.db import engine, dispose_engines
+from app.migrations.runner import ensure_schema
+from app.migrations.versions import MIGRATIONS
+from app.utils import password_hasher
+from app.utils.static_assets import frontend_assets
+from app.utils.metrics import MetricsMiddleware
+from app.services.metrics_services import register_app_collectors, METRICS_ENABLED
+from app.services.task_search_services import detect_search_backend
+from app.services.email_outbox_services import outbox_worker, EMAIL_OUTBOX_WORKER
 
-# This command creates the database tables automatically
-import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup work goes before the yield, shutdown work after it.
+    # Schema changes are versioned migrations (app/migrations); when the schema is current
+    # this is a single query, so every worker can run it on boot.
+    ensure_schema(engine, MIGRATIONS)
+    detect_search_backend(engine)
+    # The built frontend is served from memory (app/utils/static_assets.py)
+    frontend_assets.load()
+    register_app_collectors()
+    if EMAIL_OUTBOX_WORKER:
+        outbox_worker.start()
+    startup_profile.report()
+    yield
+    await outbox_worker.stop()
+    password_hasher.shutdown_executor()
+    await dispose_engines()
 
 # Customizing Swagger UI to handle Bearer Token better
 app = FastAPI(
     title="Gemini Secure Login",
+    lifespan=lifespan,
     swagger_ui_init_oauth={
         "usePkceWithAuthorizationCodeGrant": True,
         "clientId": "gemini-client",
@@ -32,8 +58,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let the browser read pagination headers
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"],
 )
 
+# Per-route request count, latency and DB queries for GET /metrics (added last, so it is
+# the outermost layer and also times CORS preflights)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # This is just optional metadata to help Swagger understand we use Bearer tokens
 # The real security is enforced in the routers via Depends(get_current_user)
 
@@ -41,35 +74,36 @@ app.add_middleware(
 app.include_router(auth_router.router)
 app.include_router(task_router.router)
 app.include_router(agent_router.router)
+app.include_router(metrics_router.router)
 
-# Mount static files from frontend build
-# Ensure the directory exists before mounting to avoid errors
-if os.path.exists("frontend/dist/assets"):
-    app.mount("/assets", StaticFiles(directory="frontend/dist/assets"), name="assets")
+# The frontend build (frontend/dist) is loaded into memory at startup and served by the
+# catch-all below: hashed /assets files are cached as immutable, the rest revalidated by ETag
 
-@app.get("/")
-def serve_root():
-    if os.path.exists("frontend/dist/index.html"):
-        return FileResponse("frontend/dist/index.html")
+@app.api_route("/", methods=["GET", "HEAD"])
+async def serve_root(request: Request):
+    if frontend_assets.index is not None:
+        return frontend_assets.response(request, frontend_assets.index)
     return {"status": "Frontend not built. Run 'npm run build' in frontend directory."}
 
-@app.get("/{full_path:path}")
-async def serve_frontend(full_path: str):
+@app.api_route("/{full_path:path}", methods=["GET", "HEAD"])
+async def serve_frontend(full_path: str, request: Request):
     # If the path starts with api/ docs/ or openapi.json, we should let it 404 naturally
     # if it wasn't caught by the routers above.
     # But since this is a catch-all, it WILL catch missing API routes.
     # We don't want to return HTML for missing API endpoints.
     if full_path.startswith("api") or full_path.startswith("docs") or full_path == "openapi.json":
-        from fastapi import HTTPException
         raise HTTPException(status_code=404, detail="Not Found")
 
-    # Check for specific static files in root (like favicon.ico, manifestation.json)
-    possible_path = os.path.join("frontend/dist", full_path)
-    if os.path.exists(possible_path) and os.path.isfile(possible_path):
-        return FileResponse(possible_path)
+    # Built files (assets/*, favicon.ico, ...)
+    static_file = frontend_assets.get(full_path)
+    if static_file is not None:
+        return frontend_assets.response(request, static_file)
+    # A missing hashed asset is a 404, not the SPA page
+    if full_path.startswith("assets/"):
+        raise HTTPException(status_code=404, detail="Not Found")
 
     # For any other route (client-side routing), return index.html
-    if os.path.exists("frontend/dist/index.html"):
-        return FileResponse("frontend/dist/index.html")
+    if frontend_assets.index is not None:
+        return frontend_assets.response(request, frontend_assets.index)
 
     return {"status": "Frontend not built."}
@@ -0,0 +1,40 @@
+"""
+Applies the versioned schema migrations in app/migrations/versions.py.
+
+    python migrate.py               # apply everything pending
+    python migrate.py --dry-run     # print the SQL that would run
+    python migrate.py --status      # show applied / pending migrations
+    python migrate.py --to 5        # stop after version 5
+"""
+import argparse
+
+from config.db import engine
+from app.migrations.runner import current_version, migrate
+from app.migrations.versions import MIGRATIONS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply database schema migrations")
+    parser.add_argument("--dry-run", action="store_true", help="print the SQL instead of running it")
+    parser.add_argument("--status", action="store_true", help="list migrations and exit")
+    parser.add_argument("--to", type=int, default=None, help="highest version to apply")
+    args = parser.parse_args()
+
+    if args.status:
+        version = current_version(engine)
+        for migration in MIGRATIONS:
+            state = "applied" if migration.version <= version else "pending"
+            print(f"{migration.version:04d} {migration.name:<28} {state}")
+        return
+
+    applied = migrate(engine, MIGRATIONS, target=args.to, dry_run=args.dry_run)
+    if not applied:
+        print("Database schema is up to date.")
+    elif args.dry_run:
+        print(f"{len(applied)} migration(s) pending.")
+    else:
+        print(f"Applied {len(applied)} migration(s); schema is at version {current_version(engine)}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Shared setup: the settings are read at import time, so the test environment is set here,
+before any test module imports the app. The app runs on a throwaway SQLite database.
+"""
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+
+_DB_DIR = tempfile.mkdtemp(prefix="app-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}")
+os.environ.setdefault("EMAIL_OUTBOX_WORKER", "false")
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("LLM_FAKE_LATENCY", "0.01")
+os.environ.setdefault("CHAT_RATE_LIMIT_PER_MINUTE", "0")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_user_numbers = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+def _new_user_headers(client):
+    n = next(_user_numbers)
+    email, password = f"user{n}@example.com", "Passw0rd!x"
+    response = client.post("/auth/signup", json={
+        "email": email, "username": f"user{n}", "first_name": "Test", "last_name": "User", "password": password
+    })
+    assert response.status_code in (200, 201), response.text
+    response = client.post("/auth/login", json={"email": email, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def auth_headers(client):
+    """Signs up and logs in a fresh user; returns their Authorization header."""
+    return _new_user_headers(client)
+
+
+@pytest.fixture
+def other_auth_headers(client):
+    """A second fresh user, for checks that one user can't see another's data."""
+    return _new_user_headers(client)
@@ -0,0 +1,49 @@
+"""Task agent chat: a reply the model produced is returned even when saving the turn fails."""
+import json
+
+import pytest
+
+from app.services import conversation_services
+
+FALLBACK = "AI agent error. See backend logs for details."
+
+
+@pytest.fixture
+def task_id(client, auth_headers):
+    response = client.post("/tasks/", json={"title": "Plan the trip"}, headers=auth_headers)
+    assert response.status_code in (200, 201), response.text
+    return response.json()["id"]
+
+
+@pytest.fixture
+def broken_history(monkeypatch):
+    async def record_turn(*args, **kwargs):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(conversation_services, "record_turn", record_turn)
+
+
+def _sse_frames(body: str):
+    return [json.loads(line[len("data: "):]) for line in body.splitlines() if line.startswith("data: ")]
+
+
+def test_reply_survives_a_failed_save(client, auth_headers, task_id, broken_history):
+    response = client.post(f"/tasks/{task_id}/chat", json={"message": "hello"}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["response"].startswith("Fake reply to: hello")
+
+
+def test_streamed_reply_survives_a_failed_save(client, auth_headers, task_id, broken_history):
+    response = client.post(f"/tasks/{task_id}/chat/stream", json={"message": "hello"}, headers=auth_headers)
+    assert response.status_code == 200
+    frames = _sse_frames(response.text)
+    assert not [f for f in frames if f["type"] == "error"]
+    streamed = "".join(f["delta"] for f in frames if f["type"] == "delta")
+    assert frames[-1]["type"] == "done" and frames[-1]["response"] == streamed != FALLBACK
+
+
+def test_turn_is_saved_normally(client, auth_headers, task_id):
+    client.post(f"/tasks/{task_id}/chat", json={"message": "remember me"}, headers=auth_headers)
+    history = client.get(f"/tasks/{task_id}/chat/history", headers=auth_headers)
+    assert history.status_code == 200
+    assert "remember me" in history.text
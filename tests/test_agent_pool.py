@@ -0,0 +1,90 @@
+"""Pooled task agents: keyed per task, reused without a query, evicted only by edits to that task."""
+import asyncio
+import dataclasses
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.agents.agent_pool import agent_pool, task_agent_key
+from app.services import agent_services
+from config.db import DATABASE_URL, async_database_url
+
+
+class NoQueries:
+    """Stands in for the session when a pool hit must not touch the database."""
+
+    async def execute(self, *args, **kwargs):
+        raise AssertionError("a pool hit ran a query")
+
+    scalar = execute
+
+
+@pytest.fixture
+def user_tasks(client, auth_headers):
+    me = client.get("/auth/me", headers=auth_headers).json()
+    ids = []
+    for title in ("Plan the trip", "Pay the bills"):
+        response = client.post("/tasks/", json={"title": title, "description": "soon"}, headers=auth_headers)
+        ids.append(response.json()["id"])
+    user = SimpleNamespace(id=me["id"], username=me["username"])
+    return user, ids, auth_headers
+
+
+def _prepare(task_id, user, db=None):
+    async def run():
+        if db is not None:
+            return await agent_services.get_prepared_task_agent(db, task_id, user)
+        engine = create_async_engine(async_database_url())
+        try:
+            async with async_sessionmaker(engine)() as session:
+                return await agent_services.get_prepared_task_agent(session, task_id, user)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+def _age(task_id):
+    # Pretend the entry was last checked long ago
+    key = task_agent_key(task_id)
+    agent_pool.put(key, dataclasses.replace(agent_pool.get(key), checked_at=0.0))
+
+
+def test_hit_makes_no_query(user_tasks):
+    user, (task_id, _), _ = user_tasks
+    prepared = _prepare(task_id, user)
+    assert _prepare(task_id, user, db=NoQueries()) is prepared
+
+
+def test_edits_to_other_tasks_keep_the_entry(client, user_tasks):
+    user, (task_id, other_id), headers = user_tasks
+    prepared = _prepare(task_id, user)
+
+    client.put(f"/tasks/{other_id}", json={"title": "Pay the bills today"}, headers=headers)
+    assert agent_pool.get(task_agent_key(task_id)) is prepared
+
+    client.put(f"/tasks/{task_id}", json={"title": "Plan the trip to Rome"}, headers=headers)
+    assert agent_pool.get(task_agent_key(task_id)) is None
+    assert "Plan the trip to Rome" in _prepare(task_id, user).instructions
+
+
+def test_edits_from_other_workers_are_seen_on_revalidation(user_tasks):
+    user, (task_id, other_id), _ = user_tasks
+    prepared = _prepare(task_id, user)
+    engine = create_engine(DATABASE_URL)
+    with engine.begin() as conn:
+        # Another worker renames the other task: this entry survives its revalidation
+        conn.execute(text("UPDATE tasks SET title = 'Bills' WHERE id = :id"), {"id": other_id})
+    _age(task_id)
+    assert _prepare(task_id, user).version == prepared.version
+
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE tasks SET title = 'Trip' WHERE id = :id"), {"id": task_id})
+    # Within AGENT_POOL_REVALIDATE_SECONDS of the last check the entry is used as is
+    assert _prepare(task_id, user, db=NoQueries()).version == prepared.version
+    _age(task_id)
+    reloaded = _prepare(task_id, user)
+    assert reloaded.version != prepared.version and "Trip" in reloaded.instructions
+    engine.dispose()
@@ -0,0 +1,54 @@
+"""run_agent_async: runs share the event loop, are capped by the agent queue and time out."""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import agents
+import pytest
+
+from app.agents import task_agent
+from app.utils.fair_queue import FairQueue
+
+
+@pytest.fixture
+def slow_runner(monkeypatch):
+    """Runner.run that takes 0.2s of waiting (no CPU), tracking how many runs overlap."""
+    seen = {"running": 0, "peak": 0}
+
+    async def run(agent, message):
+        seen["running"] += 1
+        seen["peak"] = max(seen["peak"], seen["running"])
+        try:
+            await asyncio.sleep(0.2)
+        finally:
+            seen["running"] -= 1
+        return SimpleNamespace(final_output=f"done: {message}", context_wrapper=None)
+
+    monkeypatch.setattr(agents.Runner, "run", run)
+    return seen
+
+
+def test_runs_overlap_up_to_the_concurrency_limit(monkeypatch, slow_runner):
+    monkeypatch.setattr(task_agent, "agent_queue", FairQueue(max_active=4, max_wait=10, max_waiting=100))
+
+    async def burst():
+        return await asyncio.gather(*(
+            task_agent.run_agent_async("Be brief.", f"m{i}", user_key=i) for i in range(8)
+        ))
+
+    start = time.perf_counter()
+    replies = asyncio.run(burst())
+    elapsed = time.perf_counter() - start
+    assert replies == [f"done: m{i}" for i in range(8)]
+    # Two waves of four, not eight runs one after another
+    assert slow_runner["peak"] == 4
+    assert elapsed < 0.2 * 8 / 2
+    assert task_agent.agent_queue.active == 0
+
+
+def test_timeout_cancels_the_run_and_frees_the_slot(monkeypatch, slow_runner):
+    monkeypatch.setattr(task_agent, "agent_queue", FairQueue(max_active=1, max_wait=10, max_waiting=100))
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(task_agent.run_agent_async("Be brief.", "hello", timeout=0.05))
+    assert slow_runner["running"] == 0
+    assert task_agent.agent_queue.active == 0
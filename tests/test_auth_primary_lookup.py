@@ -0,0 +1,34 @@
+"""Token checks read the user from the primary, never from the (possibly lagging) read pool."""
+import pytest
+
+from config.db import get_read_db
+
+
+@pytest.fixture
+def lagging_replica(client):
+    """Read sessions that have none of the users (a replica that hasn't caught up), counted."""
+    opened = []
+
+    class EmptyReplica:
+        def query(self, *args, **kwargs):
+            raise AssertionError("the read pool was used")
+
+    def replica_db():
+        opened.append(1)
+        yield EmptyReplica()
+
+    client.app.dependency_overrides[get_read_db] = replica_db
+    yield opened
+    client.app.dependency_overrides.pop(get_read_db, None)
+
+
+def test_new_user_authenticates_with_a_lagging_replica(client, auth_headers, lagging_replica):
+    response = client.get("/auth/me", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["email"].endswith("@example.com")
+
+
+def test_write_routes_hold_no_read_session(client, auth_headers, lagging_replica):
+    response = client.post("/tasks/", json={"title": "write only"}, headers=auth_headers)
+    assert response.status_code in (200, 201)
+    assert lagging_replica == []
@@ -0,0 +1,118 @@
+"""Access vs refresh tokens in authenticate_token."""
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import auth_services  # noqa: E402
+
+
+@pytest.fixture
+def user():
+    return SimpleNamespace(
+        id=41, email="tokens@example.com", username="tokens", first_name="T", last_name="K",
+        is_verified=True, token_version=0
+    )
+
+
+@pytest.fixture(autouse=True)
+def embedded_principal(monkeypatch):
+    # Embedded profiles are what let a token skip the DB entirely
+    monkeypatch.setattr(auth_services, "JWT_EMBED_PRINCIPAL", True)
+    auth_services.principal_cache.invalidate("tokens@example.com", 0)
+
+
+def _claims(token):
+    return jwt.get_unverified_claims(token)
+
+
+def test_access_token_authenticates_without_db(user):
+    token = auth_services.create_access_token(auth_services.token_claims(user))
+    assert _claims(token)["type"] == "access"
+    assert auth_services.authenticate_token(token, db=None).id == user.id
+
+
+def test_refresh_token_is_not_an_access_token(user):
+    token = auth_services.create_refresh_token(auth_services.token_claims(user))
+    claims = _claims(token)
+    assert claims["type"] == "refresh"
+    assert "usr" not in claims
+    with pytest.raises(HTTPException) as exc:
+        auth_services.authenticate_token(token, db=None)
+    assert exc.value.status_code == 401
+
+
+def test_untyped_token_is_rejected(user):
+    claims = auth_services.token_claims(user)
+    token = jwt.encode(claims, auth_services.SECRET_KEY, algorithm=auth_services.ALGORITHM)
+    with pytest.raises(HTTPException):
+        auth_services.authenticate_token(token, db=None)
+
+
+@pytest.fixture
+def stored_user(tmp_path):
+    """(session, User row) in a throwaway database."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.models import task, agent, conversation  # noqa: F401  (registers User's relationships)
+    from app.models.user import User
+    from config.db import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'auth.db'}")
+    Base.metadata.create_all(engine, tables=[User.__table__])
+    with sessionmaker(bind=engine)() as db:
+        # One email per test: the module-wide principal cache remembers revocations
+        user = User(email=f"{tmp_path.name}@example.com", username="stored", first_name="S", last_name="U",
+                    hashed_password="old", is_verified=True, token_version=0)
+        db.add(user)
+        db.commit()
+        yield db, user
+    engine.dispose()
+
+
+def test_password_helpers_leave_nothing_to_load_on_the_event_loop(stored_user):
+    from sqlalchemy import inspect
+
+    db, user = stored_user
+    auth_services._save_password_hash(db, user, "rehashed")
+    # Every column is loaded again (relationships stay lazy)
+    assert not inspect(user).expired_attributes & set(user.__table__.columns.keys())
+
+    claims = auth_services._store_new_password(db, user, "changed")
+    assert claims["uid"] == user.id and claims["ver"] == 1
+    assert auth_services.principal_cache.is_revoked(user.email, 0)
+
+
+def test_failed_commit_keeps_current_tokens_valid(stored_user, monkeypatch):
+    db, user = stored_user
+    email = user.email
+
+    def failing_commit():
+        raise RuntimeError("disk I/O error")
+
+    monkeypatch.setattr(db, "commit", failing_commit)
+    with pytest.raises(RuntimeError):
+        auth_services._store_new_password(db, user, "changed")
+    assert not auth_services.principal_cache.is_revoked(email, 0)
+
+
+def test_revocation_floors_are_bounded():
+    from app.utils.principal_cache import PrincipalCache
+
+    cache = PrincipalCache(ttl_seconds=60, max_entries=2, revocation_ttl_seconds=60)
+    for n in range(3):
+        cache.invalidate(f"user{n}@example.com", 1)
+    assert cache.stats()["revoked"] == 2
+    assert not cache.is_revoked("user0@example.com", 0)  # least recently revoked, dropped
+    assert cache.is_revoked("user2@example.com", 0)
+
+    expiring = PrincipalCache(ttl_seconds=60, revocation_ttl_seconds=0)
+    expiring.invalidate("old@example.com", 1)
+    assert not expiring.is_revoked("old@example.com", 0)
+    assert expiring.stats()["revoked"] == 0
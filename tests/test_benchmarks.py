@@ -0,0 +1,36 @@
+"""Benchmark harness: regressions and, in CI mode, a missing baseline fail the run."""
+import os
+import subprocess
+import sys
+
+from benchmarks.harness import compare, missing_from_baseline
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _row(p95_ms=10.0, rps=100.0, errors=0, db=2.0):
+    return {"p95_ms": p95_ms, "rps": rps, "errors": errors, "db_queries_per_request": db}
+
+
+def test_compare_flags_regressions_and_missing_scenarios():
+    baseline = {"task_crud": _row()}
+    results = {"task_crud": _row(p95_ms=20.0, rps=50.0, errors=1, db=5.0), "chat": _row()}
+    assert len(compare(results, baseline, tolerance=0.25)) == 4
+    assert compare({"task_crud": _row(p95_ms=12.0)}, baseline, tolerance=0.25) == []
+    assert missing_from_baseline(results, baseline) == ["chat"]
+
+
+def _run(*args, **env):
+    return subprocess.run(
+        [sys.executable, "-m", "benchmarks.run", *args], cwd=ROOT, capture_output=True, text=True, timeout=60,
+        env={**os.environ, **env}
+    )
+
+
+def test_missing_baseline_fails_in_ci_mode(tmp_path):
+    missing = str(tmp_path / "baseline.json")
+    result = _run("--ci", "--baseline", missing)
+    assert result.returncode == 2
+    assert "No baseline" in result.stdout
+    # CI=true turns it on by default
+    assert _run("--baseline", missing, CI="true").returncode == 2
@@ -0,0 +1,44 @@
+"""Task creation in one transaction, and the bulk endpoints' per-item results."""
+from sqlalchemy import event, func, select
+
+from app.models.agent import Agent
+from app.models.task import Task
+from config.db import SessionLocal, engine
+
+
+def test_create_commits_task_and_agent_once(client, auth_headers):
+    commits = []
+
+    def count(conn):
+        commits.append(1)
+
+    event.listen(engine, "commit", count)
+    try:
+        response = client.post("/tasks/", json={"title": "One commit"}, headers=auth_headers)
+    finally:
+        event.remove(engine, "commit", count)
+    assert response.status_code == 201
+    assert len(commits) == 1
+    with SessionLocal() as db:
+        assert db.scalar(select(func.count(Agent.id)).where(Agent.task_id == response.json()["id"])) == 1
+
+
+def test_bulk_endpoints_report_each_item(client, auth_headers, other_auth_headers):
+    created = client.post("/tasks/bulk", json={"tasks": [{"title": f"Import {i}"} for i in range(3)]},
+                          headers=auth_headers).json()
+    assert (created["succeeded"], created["failed"]) == (3, 0)
+    ids = [item["id"] for item in created["results"]]
+    foreign = client.post("/tasks/", json={"title": "Not yours"}, headers=other_auth_headers).json()["id"]
+
+    updated = client.patch("/tasks/bulk/status", json={"ids": [ids[0], foreign, ids[1]], "status": "completed"},
+                           headers=auth_headers).json()
+    assert [item["ok"] for item in updated["results"]] == [True, False, True]
+    assert updated["results"][1]["id"] == foreign and updated["results"][1]["error"]
+
+    deleted = client.request("DELETE", "/tasks/bulk", json={"ids": ids + [foreign]}, headers=auth_headers).json()
+    assert (deleted["succeeded"], deleted["failed"]) == (3, 1)
+    with SessionLocal() as db:
+        assert db.scalar(select(func.count(Task.id)).where(Task.id.in_(ids))) == 0
+        assert db.scalar(select(func.count(Agent.id)).where(Agent.task_id.in_(ids))) == 0
+        # The other user's task is untouched
+        assert db.get(Task, foreign).status.value == "pending"
@@ -0,0 +1,44 @@
+"""Streaming chat: delta frames as text arrives, then a done frame with the AgentChatResponse fields."""
+import json
+
+import pytest
+
+
+@pytest.fixture
+def task_id(client, auth_headers):
+    response = client.post("/tasks/", json={"title": "Write the report"}, headers=auth_headers)
+    return response.json()["id"]
+
+
+def _check_frames(frames):
+    deltas = [f["delta"] for f in frames if f["type"] == "delta"]
+    done = frames[-1]
+    assert len(deltas) > 1, "the reply should arrive in pieces"
+    assert [f["type"] for f in frames[:-1]] == ["delta"] * len(deltas)
+    assert done["type"] == "done"
+    assert done["response"] == "".join(deltas)
+    assert done["agent_name"] and done["timestamp"]
+
+
+def test_task_chat_streams_ndjson(client, auth_headers, task_id):
+    response = client.post(
+        f"/tasks/{task_id}/chat/stream", params={"format": "ndjson"}, json={"message": "status?"}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert response.headers["x-accel-buffering"] == "no"
+    _check_frames([json.loads(line) for line in response.text.splitlines() if line])
+
+
+def test_app_guide_streams_sse(client, auth_headers):
+    response = client.post("/tasks/app-guide/chat/stream", json={"message": "How do I add a task?"}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    blocks = [block for block in response.text.split("\n\n") if block.strip()]
+    frames = []
+    for block in blocks:
+        event, data = block.split("\n")[-2:]
+        frame = json.loads(data[len("data: "):])
+        assert event == f"event: {frame['type']}"
+        frames.append(frame)
+    _check_frames(frames)
@@ -0,0 +1,72 @@
+"""One conversation per (agent, user): the unique index, the insert race and the migration merge."""
+import asyncio
+import os
+import sys
+
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.migrations.runner import MigrationContext  # noqa: E402
+from app.migrations.versions import _0011_unique_conversation  # noqa: E402
+from app.models import user, task, agent  # noqa: E402,F401  (registers the tables on Base.metadata)
+from app.models.conversation import Conversation, Message  # noqa: E402
+from app.services import conversation_services  # noqa: E402
+from config.db import Base  # noqa: E402
+
+
+def test_concurrent_create_returns_the_existing_conversation(tmp_path, monkeypatch):
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'conv.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        async with sessions() as db:
+            db.add(Conversation(agent_id=1, user_id=1, summarized_through_id=0))
+            await db.commit()
+
+        # The other request inserts between our lookup and our insert
+        real_find = conversation_services._find_conversation
+        calls = []
+
+        async def racing_find(db, agent_id, user_id):
+            calls.append(agent_id)
+            return None if len(calls) == 1 else await real_find(db, agent_id, user_id)
+
+        monkeypatch.setattr(conversation_services, "_find_conversation", racing_find)
+        async with sessions() as db:
+            conversation = await conversation_services.get_or_create_conversation(db, 1, 1)
+            count = len((await db.execute(select(Conversation))).scalars().all())
+        await engine.dispose()
+        return conversation, count
+
+    conversation, count = asyncio.run(scenario())
+    assert conversation is not None and conversation.id == 1
+    assert count == 1
+
+
+def test_migration_merges_duplicate_conversations(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrate.db'}")
+    with engine.connect() as conn:
+        Base.metadata.create_all(conn, tables=[Conversation.__table__, Message.__table__])
+        conn.execute(text("DROP INDEX uq_conversations_agent_user"))
+        conn.execute(text(
+            "INSERT INTO conversations (id, agent_id, user_id, summarized_through_id) VALUES "
+            "(1, 7, 1, 2), (2, 7, 1, 0), (3, 8, 1, 0)"
+        ))
+        conn.execute(text(
+            "INSERT INTO messages (id, conversation_id, role, content, token_count) VALUES "
+            "(1, 1, 'user', 'a', 1), (2, 1, 'assistant', 'b', 1), (3, 2, 'user', 'c', 1), (4, 1, 'user', 'd', 1)"
+        ))
+        conn.commit()
+
+        _0011_unique_conversation(MigrationContext(conn))
+
+        assert conn.execute(text("SELECT id FROM conversations ORDER BY id")).scalars().all() == [1, 3]
+        assert conn.execute(text("SELECT DISTINCT conversation_id FROM messages")).scalars().all() == [1]
+        # Message 3 came from the merged conversation and was never summarized
+        assert conn.execute(text("SELECT summarized_through_id FROM conversations WHERE id = 1")).scalar() == 2
+        indexes = {i["name"]: i for i in inspect(conn).get_indexes("conversations")}
+        assert indexes["uq_conversations_agent_user"]["unique"]
+    engine.dispose()
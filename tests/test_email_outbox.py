@@ -0,0 +1,140 @@
+"""Email outbox against a local aiosmtpd server: claim -> send -> retry with backoff -> sent / failed."""
+import asyncio
+import socket
+from datetime import datetime, timedelta
+
+import pytest
+from aiosmtpd.controller import Controller
+from sqlalchemy import select, update
+
+from app.models.email_outbox import EmailOutbox
+from app.services import email_outbox_services as outbox
+from app.utils import email_utils
+from config.db import SessionLocal
+
+
+class _Sink:
+    """Accepts mail, except for "later@" (451, temporary) and "nobody@" (550, permanent) recipients."""
+
+    def __init__(self):
+        self.delivered = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("later@"):
+            return "451 4.3.0 Try again later"
+        if address.startswith("nobody@"):
+            return "550 5.1.1 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.delivered.extend(envelope.rcpt_tos)
+        return "250 Message accepted"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_sink(client, monkeypatch):
+    # `client` runs the migrations, so the outbox table exists
+    sink = _Sink()
+    controller = Controller(sink, hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    monkeypatch.setattr(email_utils, "MAIL_SERVER", "127.0.0.1")
+    monkeypatch.setattr(email_utils, "MAIL_PORT", controller.port)
+    monkeypatch.setattr(email_utils, "MAIL_STARTTLS", False)
+    monkeypatch.setattr(email_utils, "MAIL_USE_CREDENTIALS", False)
+    monkeypatch.setattr(outbox, "EMAIL_RATE_PER_SECOND", 0)
+    with SessionLocal() as db:
+        # Leave nothing due from other tests in the shared database
+        db.execute(update(EmailOutbox).where(EmailOutbox.status != "sent").values(status="failed"))
+        db.commit()
+    yield sink
+    controller.stop()
+
+
+def _enqueue(*recipients):
+    with SessionLocal() as db:
+        rows = [outbox.enqueue_email(db, r, "Hello", "<p>Hi</p>", "test") for r in recipients]
+        db.commit()
+        return [row.id for row in rows]
+
+
+def _rows(ids):
+    with SessionLocal() as db:
+        rows = db.execute(select(EmailOutbox).where(EmailOutbox.id.in_(ids)).order_by(EmailOutbox.id)).scalars().all()
+        db.expunge_all()
+        return rows
+
+
+def _send_due(worker):
+    async def round_trip():
+        batch = outbox.claim_batch(outbox.EMAIL_BATCH_SIZE)
+        results = await worker._send_batch(batch)
+        outbox.record_results(results)
+        await worker.smtp.close()
+        return batch
+
+    return asyncio.run(round_trip())
+
+
+def test_claim_send_retry_and_fail(smtp_sink):
+    ok, later, nobody = _enqueue("ok@example.com", "later@example.com", "nobody@example.com")
+    worker = outbox.EmailOutboxWorker()
+
+    batch = _send_due(worker)
+    assert sorted(row["id"] for row in batch) == [ok, later, nobody]
+    # Claimed rows are not handed out twice
+    assert outbox.claim_batch(10) == []
+
+    sent, retried, failed = _rows([ok, later, nobody])
+    assert smtp_sink.delivered == ["ok@example.com"]
+    assert sent.status == "sent" and sent.sent_at is not None
+    assert failed.status == "failed" and "550" in failed.last_error
+    assert retried.status == "pending" and retried.attempts == 1 and "451" in retried.last_error
+    delay = (retried.next_attempt_at - datetime.utcnow()).total_seconds()
+    assert 0.5 * outbox.EMAIL_RETRY_BASE_SECONDS - 5 < delay <= outbox.EMAIL_RETRY_BASE_SECONDS
+    assert (worker.sent, worker.retried, worker.failed) == (1, 1, 1)
+
+    # Not due until its backoff has passed
+    assert outbox.claim_batch(10) == []
+    with SessionLocal() as db:
+        db.execute(update(EmailOutbox).where(EmailOutbox.id == later).values(
+            next_attempt_at=datetime.utcnow() - timedelta(seconds=1), attempts=outbox.EMAIL_MAX_ATTEMPTS - 1
+        ))
+        db.commit()
+    _send_due(worker)
+    (gave_up,) = _rows([later])
+    assert gave_up.status == "failed" and gave_up.attempts == outbox.EMAIL_MAX_ATTEMPTS
+
+
+def test_unreachable_server_retries_the_whole_batch(smtp_sink, monkeypatch):
+    first, second = _enqueue("a@example.com", "b@example.com")
+    monkeypatch.setattr(email_utils, "MAIL_PORT", _free_port())
+    _send_due(outbox.EmailOutboxWorker())
+    rows = _rows([first, second])
+    assert [row.status for row in rows] == ["pending", "pending"]
+    assert all(row.attempts == 1 and row.next_attempt_at > datetime.utcnow() for row in rows)
+    assert smtp_sink.delivered == []
+
+
+def test_worker_sends_when_notified(smtp_sink):
+    (row_id,) = _enqueue("ok@example.com")
+
+    async def run_worker():
+        worker = outbox.EmailOutboxWorker()
+        worker.start()
+        worker.notify()
+        for _ in range(100):
+            if smtp_sink.delivered:
+                break
+            await asyncio.sleep(0.05)
+        await worker.stop()
+
+    asyncio.run(run_worker())
+    assert smtp_sink.delivered == ["ok@example.com"]
+    assert _rows([row_id])[0].status == "sent"
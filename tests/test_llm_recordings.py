@@ -0,0 +1,65 @@
+"""Record / replay model backends: recordings are saved off the event loop and replayed from memory."""
+import asyncio
+import builtins
+import json
+import threading
+
+from app.agents import llm_backends
+from app.agents.llm_backends import FakeLLM, FakeLLMTransport, RecordingTransport, ReplayTransport
+
+try:
+    import httpx2 as httpx
+except ImportError:
+    import httpx
+
+URL = "http://llm.test/v1/chat/completions"
+
+
+def _body(stream: bool) -> dict:
+    return {"model": "fake", "stream": stream, "messages": [{"role": "user", "content": "plan my week"}]}
+
+
+async def _complete(transport, stream: bool) -> str:
+    async with httpx.AsyncClient(transport=transport) as client:
+        response = await client.post(URL, json=_body(stream))
+        assert response.status_code == 200
+        return response.text
+
+
+def test_record_then_replay(tmp_path, monkeypatch):
+    saved_on = []
+    save = RecordingTransport._save
+
+    def tracked_save(self, key, recording):
+        saved_on.append(threading.current_thread())
+        save(self, key, recording)
+
+    monkeypatch.setattr(RecordingTransport, "_save", tracked_save)
+    recorder = RecordingTransport(str(tmp_path), upstream=FakeLLMTransport(FakeLLM(latency=0, tokens_per_second=0)))
+    recorded = {stream: asyncio.run(_complete(recorder, stream)) for stream in (False, True)}
+    assert len(saved_on) == 2 and threading.main_thread() not in saved_on
+    assert len(list(tmp_path.glob("*.json"))) == 2
+
+    replay = ReplayTransport(str(tmp_path), speed=0)
+    assert len(replay.recordings) == 2
+
+    def no_files(*args, **kwargs):
+        raise AssertionError("replay opened a file while answering")
+
+    # Everything was loaded at construction: answering reads nothing from disk
+    monkeypatch.setattr(builtins, "open", no_files)
+    for stream in (False, True):
+        assert asyncio.run(_complete(replay, stream)) == recorded[stream]
+
+
+def test_unknown_request_is_a_404(tmp_path):
+    replay = ReplayTransport(str(tmp_path / "missing"), speed=0)
+
+    async def ask():
+        async with httpx.AsyncClient(transport=replay) as client:
+            return await client.post(URL, json=_body(False))
+
+    response = asyncio.run(ask())
+    assert response.status_code == 404
+    assert "No recording" in json.loads(response.text)["error"]["message"]
+    assert llm_backends.load_recordings(str(tmp_path / "missing")) == {}
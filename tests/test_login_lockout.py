@@ -0,0 +1,46 @@
+"""FailureLockout: attempts are reserved before the password check, so bursts can't outrun the count."""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.rate_limiter import FailureLockout  # noqa: E402
+
+
+def _lockout(**kwargs):
+    return FailureLockout(max_failures=3, window=60, base_lockout=10, max_lockout=40, **kwargs)
+
+
+def test_concurrent_burst_gets_no_more_attempts_than_the_failure_budget():
+    lockout = _lockout()
+    granted = [lockout.acquire("a@example.com") == 0.0 for _ in range(40)]
+    assert granted.count(True) == 3
+    for _ in range(3):
+        lockout.release("a@example.com", failed=True)
+    assert lockout.acquire("a@example.com") >= 9  # locked out now
+
+
+def test_lockout_doubles():
+    lockout = _lockout()
+    durations = []
+    for _ in range(3):
+        for _ in range(3):
+            assert lockout.acquire("b") == 0.0
+            started = lockout.release("b", failed=True)
+        durations.append(started)
+        lockout._records["b"].locked_until = time.monotonic()  # skip the wait
+    assert durations == [10, 20, 40]
+
+
+def test_success_and_errors_free_the_reservation():
+    lockout = _lockout()
+    assert lockout.acquire("c") == 0.0
+    lockout.release("c", failed=True)
+    for _ in range(2):
+        assert lockout.acquire("c") == 0.0
+    assert lockout.acquire("c") > 0  # 1 failure + 2 in flight use the budget
+    lockout.release("c", failed=False)  # e.g. the hashing pool was busy
+    lockout.release("c", failed=False)
+    lockout.clear("c")
+    assert [lockout.acquire("c") for _ in range(4)] == [0.0, 0.0, 0.0, 1.0]
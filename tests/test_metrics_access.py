@@ -0,0 +1,23 @@
+"""GET /metrics: closed unless a token is configured (or it is explicitly made public)."""
+from app.services import metrics_services
+
+
+def test_denied_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(metrics_services, "METRICS_TOKEN", None)
+    monkeypatch.setattr(metrics_services, "METRICS_PUBLIC", False)
+    assert client.get("/metrics").status_code == 403
+
+
+def test_token_required_when_set(client, monkeypatch):
+    monkeypatch.setattr(metrics_services, "METRICS_TOKEN", "scrape-secret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert response.status_code == 200
+    assert "http_requests_total" in response.text
+
+
+def test_public_opt_in(client, monkeypatch):
+    monkeypatch.setattr(metrics_services, "METRICS_TOKEN", None)
+    monkeypatch.setattr(metrics_services, "METRICS_PUBLIC", True)
+    assert client.get("/metrics").status_code == 200
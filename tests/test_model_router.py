@@ -0,0 +1,81 @@
+"""Backend scoring and circuit breaking in the model router: hedge losers, recent errors, probes."""
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.agents.model_router import Backend, LatencyWindow, RoutedModel  # noqa: E402
+
+
+def test_lower_bound_never_lowers_the_average():
+    window = LatencyWindow()
+    window.add(3.0)
+    window.add_lower_bound(0.5)
+    assert window.average == 3.0
+    window.add_lower_bound(8.0)
+    assert window.average > 3.0
+    assert list(window.samples) == [3.0]
+
+
+def test_hedge_loser_stays_behind_the_winner():
+    slow, fast = Backend("slow", model=None), Backend("fast", model=None)
+    router = RoutedModel([slow, fast])
+    router._record(slow, "run", "ok", 3.0)
+    router._record(fast, "run", "ok", 0.3)
+    # The slow primary was cancelled 0.5s in when the fast hedge answered
+    router._record(slow, "run", "cancelled", 0.5)
+    assert router._pick("run") is fast
+
+
+def test_failures_raise_the_score():
+    flaky, steady = Backend("flaky", model=None), Backend("steady", model=None, latency_bias=1.0)
+    router = RoutedModel([flaky, steady])
+    assert router._pick("run") is flaky
+    router._record(flaky, "run", "error", error=ConnectionError("refused"))
+    assert flaky.breaker.state == "closed"
+    assert router._pick("run") is steady
+    for _ in range(20):
+        router._record(flaky, "run", "ok", 0.1)
+    assert router._pick("run") is flaky
+
+
+def _half_open(backend):
+    backend.breaker.opened_at = time.monotonic() - backend.breaker.cooldown
+
+
+def test_half_open_backend_takes_a_single_probe():
+    shaky, spare = Backend("shaky", model=None), Backend("spare", model=None, latency_bias=5.0)
+    router = RoutedModel([shaky, spare])
+    _half_open(shaky)
+    # Picked back to back, before either call starts: only the first is the trial call
+    assert router._pick("run") is shaky
+    assert router._pick("run") is spare
+    router._record(shaky, "run", "ok", 0.2)
+    assert shaky.breaker.state == "closed"
+    assert router._pick("run") is shaky
+
+
+class BreaksMidStream:
+    async def stream_response(self, *args, **kwargs):
+        yield "first"
+        raise ConnectionError("connection reset")
+
+
+def test_mid_stream_failure_counts_against_the_backend():
+    backend = Backend("flaky", model=BreaksMidStream())
+    router = RoutedModel([backend])
+
+    async def consume():
+        seen = []
+        with pytest.raises(ConnectionError):
+            async for event in router.stream_response():
+                seen.append(event)
+        return seen
+
+    assert asyncio.run(consume()) == ["first"]
+    assert backend.error_rate > 0
+    assert backend.breaker.consecutive_failures == 1
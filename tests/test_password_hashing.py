@@ -0,0 +1,55 @@
+"""Login rehash and password change: bcrypt in the executor, every SQL statement off the event loop."""
+import asyncio
+import itertools
+
+import pytest
+from sqlalchemy import event
+
+from app.utils import password_hasher
+from config.db import engine
+
+_emails = itertools.count(1)
+
+
+@pytest.fixture
+def on_event_loop():
+    """SQL statements run by the sync engine from a thread with a running event loop."""
+    blocking = []
+
+    def check(conn, cursor, statement, *args):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        blocking.append(statement)
+
+    event.listen(engine, "before_cursor_execute", check)
+    yield blocking
+    event.remove(engine, "before_cursor_execute", check)
+
+
+def _signup(client):
+    email = f"hashing{next(_emails)}@example.com"
+    response = client.post("/auth/signup", json={
+        "email": email, "username": email.split("@")[0], "first_name": "H", "last_name": "P", "password": "Passw0rd!x"
+    })
+    assert response.status_code in (200, 201), response.text
+    return email
+
+
+def test_rehash_on_login_and_password_change(client, monkeypatch, on_event_loop):
+    email = _signup(client)
+    # A cost change: the next login upgrades the stored hash
+    monkeypatch.setattr(password_hasher, "BCRYPT_ROUNDS", password_hasher.BCRYPT_ROUNDS + 1)
+    response = client.post("/auth/login", json={"email": email, "password": "Passw0rd!x"})
+    assert response.status_code == 200, response.text
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    response = client.post("/auth/change-password", json={"old_password": "Passw0rd!x", "new_password": "N3wPassw0rd!"},
+                           headers=headers)
+    assert response.status_code == 200, response.text
+    assert client.get("/auth/me", headers={"Authorization": f"Bearer {response.json()['access_token']}"}).status_code == 200
+    assert client.post("/auth/login", json={"email": email, "password": "N3wPassw0rd!"}).status_code == 200
+
+    # The reloads after each commit happened in worker threads, not on the event loop
+    assert on_event_loop == []
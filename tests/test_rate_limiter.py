@@ -0,0 +1,34 @@
+"""TokenBucketLimiter, in memory and with the shared SQLite store."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.rate_limiter import TokenBucketLimiter  # noqa: E402
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_burst_then_retry_after(tmp_path, shared):
+    limiter = TokenBucketLimiter(rate=1, burst=3, db_path=str(tmp_path / "rl.db") if shared else None)
+    waits = [limiter.acquire("u") for _ in range(4)]
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert 0.9 < waits[3] <= 1.0
+    assert limiter.acquire("other") == 0.0
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_store_is_opened_per_process_and_shared(tmp_path):
+    # gunicorn --preload: the instance is created in the master and used in forked workers
+    limiter = TokenBucketLimiter(rate=0.001, burst=2, db_path=str(tmp_path / "rl.db"))
+    assert limiter.acquire("u") == 0.0
+    parent_db = limiter._db
+    pid = os.fork()
+    if pid == 0:
+        ok = limiter.acquire("u") == 0.0 and limiter._db is not parent_db and limiter.acquire("u") > 0
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    # The child's token came out of the shared bucket
+    assert limiter.acquire("u") > 0
@@ -0,0 +1,35 @@
+"""ResponseCache with the SQLite store."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.response_cache import ResponseCache  # noqa: E402
+
+
+def test_entries_survive_a_new_instance(tmp_path):
+    path = str(tmp_path / "cache.db")
+    ResponseCache(max_entries=10, ttl_seconds=60, db_path=path).set("q", "answer")
+    cache = ResponseCache(max_entries=10, ttl_seconds=60, db_path=path)
+    assert cache.persistent
+    assert cache.get("q") == "answer"
+    assert cache.get("missing") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_store_is_opened_per_process(tmp_path):
+    cache = ResponseCache(max_entries=10, ttl_seconds=60, db_path=str(tmp_path / "cache.db"))
+    cache.set("q", "from parent")
+    parent_db = cache._db
+    pid = os.fork()
+    if pid == 0:
+        cache.clear()  # memory and table, through the child's own connection
+        cache.set("q", "from child")
+        os._exit(0 if cache._db is not parent_db else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    cache._entries.clear()
+    assert cache.get("q") == "from child"
@@ -0,0 +1,58 @@
+"""Frontend build served from memory: cache headers, precompressed variants, ETags and ranges."""
+import gzip
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.utils.static_assets import IMMUTABLE_CACHE_CONTROL, StaticAssets
+
+SCRIPT = b"console.log('hello from the bundle');\n" * 100
+
+
+@pytest.fixture
+def assets(tmp_path):
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "assets" / "index-3f9a1c.js").write_bytes(SCRIPT)
+    (tmp_path / "index.html").write_bytes(b"<!doctype html><div id=root></div>")
+    static = StaticAssets(str(tmp_path))
+    assert static.load() == 2
+    # Everything is in memory: the files on disk are no longer needed
+    for path in tmp_path.rglob("*.*"):
+        path.unlink()
+
+    async def serve(request):
+        return static.response(request, static.get(request.path_params["path"]) or static.index)
+
+    return TestClient(Starlette(routes=[Route("/{path:path}", serve, methods=["GET", "HEAD"])]))
+
+
+def test_hashed_assets_are_immutable_and_precompressed(assets):
+    response = assets.get("/assets/index-3f9a1c.js", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.content == SCRIPT  # decoded by the client
+    assert int(response.headers["content-length"]) == len(gzip.compress(SCRIPT, compresslevel=9, mtime=0))
+
+    identity = assets.get("/assets/index-3f9a1c.js", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers and identity.content == SCRIPT
+
+
+def test_spa_routes_get_index_with_revalidation(assets):
+    response = assets.get("/tasks/42")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-cache"
+    assert b"id=root" in response.content
+    again = assets.get("/tasks/42", headers={"If-None-Match": response.headers["etag"]})
+    assert again.status_code == 304 and again.content == b""
+
+
+def test_byte_ranges(assets):
+    response = assets.get("/assets/index-3f9a1c.js", headers={"Range": "bytes=0-9"})
+    assert response.status_code == 206
+    assert response.content == SCRIPT[:10]
+    assert response.headers["content-range"] == f"bytes 0-9/{len(SCRIPT)}"
+    assert assets.get("/assets/index-3f9a1c.js", headers={"Range": f"bytes={len(SCRIPT)}-"}).status_code == 416
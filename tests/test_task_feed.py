@@ -0,0 +1,61 @@
+"""Live change feed frames: versions must be contiguous, gaps become reset frames."""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import task_feed_services  # noqa: E402
+
+
+def _run(monkeypatch, publish_versions):
+    monkeypatch.setattr(task_feed_services, "_current_version", lambda user_id: 0)
+    monkeypatch.setattr(task_feed_services, "CHANGE_FEED_GAP_GRACE_SECONDS", 0.05)
+    user_id = id(publish_versions)
+
+    async def collect():
+        frames = []
+        feed = task_feed_services.task_change_frames(user_id)
+        frames.append(await feed.__anext__())  # hello, subscribed
+
+        async def publish():
+            for version in publish_versions:
+                task_feed_services.publish_task_change(user_id, version, "deleted", ids=[version])
+                await asyncio.sleep(0)
+
+        publisher = asyncio.create_task(publish())
+        try:
+            while True:
+                frames.append(await asyncio.wait_for(feed.__anext__(), timeout=0.3))
+        except asyncio.TimeoutError:
+            pass
+        await publisher
+        await feed.aclose()
+        return [(frame["type"], frame.get("version")) for frame in frames]
+
+    return asyncio.run(collect())
+
+
+def test_contiguous_and_out_of_order_events_are_delivered_in_order(monkeypatch):
+    frames = _run(monkeypatch, [1, 3, 2])
+    assert frames == [("hello", 0), ("deleted", 1), ("deleted", 2), ("deleted", 3)]
+
+
+def test_gap_from_another_worker_becomes_reset(monkeypatch):
+    # Version 2 was written through another worker and never published here
+    frames = _run(monkeypatch, [1, 3])
+    assert frames == [("hello", 0), ("deleted", 1), ("reset", 3)]
+
+
+def test_idle_connection_notices_newer_db_version_at_heartbeat(monkeypatch):
+    versions = iter([0, 2])  # at subscribe, then at the first heartbeat
+    monkeypatch.setattr(task_feed_services, "_current_version", lambda user_id: next(versions))
+    monkeypatch.setattr(task_feed_services, "CHANGE_FEED_HEARTBEAT_SECONDS", 0.05)
+
+    async def collect():
+        feed = task_feed_services.task_change_frames(-1)
+        frames = [await asyncio.wait_for(feed.__anext__(), timeout=2) for _ in range(3)]
+        await feed.aclose()
+        return [(frame["type"], frame.get("version")) for frame in frames]
+
+    assert asyncio.run(collect()) == [("hello", 0), ("reset", 2), ("ping", None)]
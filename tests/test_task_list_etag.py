@@ -0,0 +1,45 @@
+"""GET /tasks/ ETags: one per page / filter / field selection, never shared between them."""
+
+
+def _create(client, headers, title, status=None):
+    response = client.post("/tasks/", json={"title": title}, headers=headers)
+    assert response.status_code in (200, 201), response.text
+    if status:
+        task_id = response.json()["id"]
+        response = client.put(f"/tasks/{task_id}", json={"status": status}, headers=headers)
+        assert response.status_code == 200, response.text
+
+
+def test_variants_never_revalidate_against_each_other(client, auth_headers):
+    for n in range(3):
+        _create(client, auth_headers, f"task {n}")
+    _create(client, auth_headers, "done", status="completed")
+
+    first = client.get("/tasks/", params={"limit": 2}, headers=auth_headers)
+    next_cursor = first.headers["x-next-cursor"]
+    unfiltered = client.get("/tasks/", headers=auth_headers)
+    etags = {first.headers["etag"], unfiltered.headers["etag"]}
+
+    variants = [
+        {"limit": 2, "cursor": next_cursor},
+        {"status": "completed"},
+        {"task_type": "bug"},
+        {"fields": "id,title"},
+        {"limit": 3},
+    ]
+    for params in variants:
+        for etag in etags:
+            response = client.get("/tasks/", params=params, headers={**auth_headers, "If-None-Match": etag})
+            assert response.status_code == 200, (params, etag)
+        etags.add(response.headers["etag"])
+    assert len(etags) == len(variants) + 2
+
+
+def test_same_query_still_revalidates(client, auth_headers):
+    _create(client, auth_headers, "only")
+    first = client.get("/tasks/?status=pending&limit=5", headers=auth_headers)
+    # Parameter order does not matter
+    again = client.get(
+        "/tasks/?limit=5&status=pending", headers={**auth_headers, "If-None-Match": first.headers["etag"]}
+    )
+    assert again.status_code == 304
@@ -0,0 +1,65 @@
+"""Task search on the SQLite FTS5 index: the MATCH itself is restricted to the searching user's tasks."""
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.migrations.runner import MigrationContext
+from app.migrations.versions import _0012_per_user_task_search
+from app.services import task_search_services
+from app.services.task_search_services import _search_fts5
+
+
+@pytest.fixture(autouse=True)
+def needs_fts5(client):
+    if task_search_services.SEARCH_BACKEND != "fts5":
+        pytest.skip("SQLite built without FTS5")
+
+
+def _search(client, headers, q):
+    response = client.get("/tasks/search", params={"q": q}, headers=headers)
+    assert response.status_code == 200, response.text
+    return [hit["title"] for hit in response.json()["results"]]
+
+
+def test_search_only_sees_own_tasks(client, auth_headers, other_auth_headers):
+    client.post("/tasks/", json={"title": "Zebra budget review"}, headers=auth_headers)
+    # Another user with the same words in their tasks
+    client.post("/tasks/", json={"title": "Quarterly zebra budget"}, headers=other_auth_headers)
+
+    assert _search(client, auth_headers, "zebra budget") == ["Zebra budget review"]
+    assert _search(client, other_auth_headers, "zebra") == ["Quarterly zebra budget"]
+
+
+def test_user_id_is_not_searchable_text(client, auth_headers):
+    client.post("/tasks/", json={"title": "Walk the dog"}, headers=auth_headers)
+    user_id = client.get("/auth/me", headers=auth_headers).json()["id"]
+    assert _search(client, auth_headers, str(user_id)) == []
+
+
+def test_migration_rebuilds_the_shared_index(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    with engine.connect() as conn:
+        conn.execute(text(
+            "CREATE TABLE tasks (id INTEGER PRIMARY KEY, title TEXT, description TEXT, user_id INTEGER, "
+            "status TEXT, task_type TEXT, created_at TEXT)"
+        ))
+        # The index as migration 0008 first created it: no user_id
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE tasks_fts USING fts5(title, description, content='tasks', content_rowid='id')"
+        ))
+        conn.execute(text(
+            "INSERT INTO tasks (title, user_id, status, created_at) VALUES "
+            "('Pack for the trip', 1, 'PENDING', '2026-01-01'), ('Trip photos', 2, 'PENDING', '2026-01-01')"
+        ))
+        conn.execute(text("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')"))
+        conn.commit()
+
+        _0012_per_user_task_search(MigrationContext(conn))
+
+        assert [row["title"] for row in _search_fts5(conn, 1, ["trip"], 10, 0)] == ["Pack for the trip"]
+        # The triggers keep the rebuilt index in sync
+        conn.execute(text(
+            "INSERT INTO tasks (title, user_id, status, created_at) VALUES ('Trip budget', 1, 'PENDING', '2026-01-02')"
+        ))
+        assert len(_search_fts5(conn, 1, ["trip"], 10, 0)) == 2
+        assert len(_search_fts5(conn, 2, ["trip"], 10, 0)) == 1
+    engine.dispose()
@@ -0,0 +1,50 @@
+"""Task summary: per-user counters kept in step with every write, read without scanning tasks."""
+from types import SimpleNamespace
+
+from sqlalchemy import event
+
+from app.services import task_services
+from config.db import SessionLocal, engine
+
+
+def _summary(client, headers):
+    response = client.get("/tasks/summary", headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_counters_follow_writes(client, auth_headers):
+    ids = [client.post("/tasks/", json={"title": f"Task {i}"}, headers=auth_headers).json()["id"] for i in range(4)]
+    client.patch(f"/tasks/{ids[0]}/status", json={"status": "in_progress"}, headers=auth_headers)
+    client.patch(f"/tasks/{ids[1]}/status", json={"status": "completed"}, headers=auth_headers)
+    client.delete(f"/tasks/{ids[2]}", headers=auth_headers)
+    client.post("/tasks/bulk", json={"tasks": [{"title": "Bulk a"}, {"title": "Bulk b"}]}, headers=auth_headers)
+    client.patch("/tasks/bulk/status", json={"ids": [ids[3], ids[0]], "status": "completed"}, headers=auth_headers)
+
+    summary = _summary(client, auth_headers)
+    assert summary == {"total_tasks": 5, "pending": 2, "in_progress": 0, "completed": 3}
+
+    # The counters agree with a GROUP BY over the tasks themselves
+    user_id = client.get("/auth/me", headers=auth_headers).json()["id"]
+    with SessionLocal() as db:
+        assert task_services.count_tasks_by_status(db, user_id) == {
+            key: summary[key] for key in ("pending", "in_progress", "completed")
+        }
+
+
+def test_summary_reads_the_counter_row_only(client, auth_headers):
+    client.post("/tasks/", json={"title": "Counted"}, headers=auth_headers)
+    user_id = client.get("/auth/me", headers=auth_headers).json()["id"]
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        with SessionLocal() as db:
+            summary = task_services.get_task_summary(db, SimpleNamespace(id=user_id))
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert summary["total_tasks"] == 1
+    assert len(statements) == 1 and "task_counters" in statements[0]